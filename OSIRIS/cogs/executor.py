@@ -5,8 +5,9 @@ from discord.ext import commands
 from discord import app_commands, ui, ButtonStyle, Embed, Color
 # import os  # Not used directly
 import asyncio
-import importlib
+import bisect
 import time
+from contextlib import aclosing
 from pathlib import Path
 import logging
 import shlex # For robust command line parsing
@@ -26,6 +27,17 @@ sys.path.append(str(BASE_DIR))
 
 # Import config manager
 from utils.config_manager import config
+from utils.command_registry import command_registry
+from utils.asset_cache import asset_cache
+from utils.saves_index import saves_index
+from utils.content_store import content_store
+from utils.message_scheduler import message_scheduler
+from utils.admission import admission, AdmissionRejected
+from utils.response_cache import response_cache
+from utils.execution_planner import execution_planner, merge_accesses
+from utils.edit_coalescer import edit_coalescer
+from utils.position_engine import position_engine
+from utils.api_governor import api_governor, api_priority, BULK
 
 # --- Constants & Setup ---
 TEMP_DIR = BASE_DIR / "temp"
@@ -42,14 +54,14 @@ UNDO_FILE = FILES_DIR / config.get("spectre.undo_file", "undo.txt")
 # Logger for this cog
 log = logging.getLogger('MyBot.ExecutorCog')
 
-# --- GPT Integration using g4f ---
-from g4f.client import Client
+# --- GPT Integration using the shared LLM backend ---
+from utils.llm_backend import llm_backend
 
 class GPTInstanceExecutor:
-    """ Real GPT instance for executor using g4f client. """
+    """ GPT session for the executor, backed by the shared non-blocking LLM backend. """
     def __init__(self, initial_prompt: str):
-        self.client = Client()
         self.history = [{"role": "system", "content": initial_prompt}]
+        self.timeout = config.get("spectre.timeout", 30)
         log.info(f"Executor GPT initialized with prompt: {initial_prompt[:50]}...")
 
     async def query(self, user_prompt: str) -> str:
@@ -60,17 +72,7 @@ class GPTInstanceExecutor:
         self.history.append({"role": "user", "content": user_prompt})
 
         try:
-            # Make API call to g4f using the exact implementation provided
-            # Use the existing client instance instead of creating a new one each time
-            # Note: g4f doesn't support parameters like temperature, tokens, etc.
-            # Only model and messages are passed, and even model might be ignored
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=self.history
-            )
-
-            # Extract response content
-            response_content = response.choices[0].message.content
+            response_content = await llm_backend.complete(self.history, timeout=self.timeout)
 
             # Add assistant response to history
             self.history.append({"role": "assistant", "content": response_content})
@@ -78,24 +80,54 @@ class GPTInstanceExecutor:
             log.info(f"Executor GPT generated response: {response_content[:50]}...")
             return response_content
 
+        except asyncio.TimeoutError:
+            log.error(f"Timeout error in Executor GPT query after {self.timeout} seconds")
+            return ":x: The AI model took too long to respond. Please try again later."
         except Exception as e:
             log.error(f"Error in Executor GPT query: {e}", exc_info=True)
             return f":x: Error communicating with the AI model: {str(e)}"
 
     async def close(self):
         """Close the GPT instance and clean up resources."""
-        # No actual cleanup needed for g4f client, but method provided for interface consistency
+        # The client is shared, so only the history is released here
+        self.history.clear()
         log.info("Executor GPT instance closed")
 
 async def initialize_gpt_session_executor(instructor_prompt: str) -> GPTInstanceExecutor:
     """Initializes a GPT session using g4f for the executor."""
     return GPTInstanceExecutor(initial_prompt=instructor_prompt)
 
-async def query_gpt_executor(gpt_instance: GPTInstanceExecutor, prompt: str) -> str | None:
-    """Sends a query to an existing GPT session."""
+async def query_gpt_executor(gpt_instance: GPTInstanceExecutor, prompt: str, use_cache: bool = True) -> str | None:
+    """Sends a query to an existing GPT session (in the lowest admission lane).
+
+    With `use_cache`, an identical earlier request (e.g. Undo clicked twice on the
+    same commit) is answered from the response cache.
+    """
+    messages = gpt_instance.history + [{"role": "user", "content": prompt}]
     try:
-        response = await gpt_instance.query(prompt)
+        if use_cache:
+            try:
+                cached = await response_cache.get(messages, llm_backend.model)
+            except Exception as e:
+                # A broken cache mustn't stop the undo; ask the model instead
+                log.error(f"Response cache lookup failed: {e}", exc_info=True)
+                cached = None
+            if cached is not None:
+                gpt_instance.history.extend([messages[-1], {"role": "assistant", "content": cached}])
+                log.info(f"Served Executor GPT query from the response cache: {prompt[:50]}...")
+                return cached
+
+        async with admission.slot():
+            response = await gpt_instance.query(prompt)
+
+        if use_cache and response and not response.startswith(":x:"):
+            try:
+                await response_cache.put(messages, llm_backend.model, response)
+            except Exception as e:
+                log.error(f"Failed to store Executor GPT response in the response cache: {e}", exc_info=True)
         return response
+    except AdmissionRejected:
+        return ":x: The AI model is at capacity right now. Please try the undo again in a minute."
     except Exception as e:
         log.error(f"Error querying Executor GPT: {e}", exc_info=True)
         return ":x: Error communicating with the AI model for undo."
@@ -104,11 +136,12 @@ async def query_gpt_executor(gpt_instance: GPTInstanceExecutor, prompt: str) ->
 
 # --- Helper Functions ---
 
-async def read_file_content(filepath: Path) -> str | None:
+async def read_file_content(filepath: Path, cache: bool = True) -> str | None:
     """Helper to read text files asynchronously.
 
     Args:
         filepath: Path to the file to read
+        cache: Whether to keep the file in the shared asset cache (False for user files)
 
     Returns:
         The file content as a string, None if file not found, or an error message string starting with ':x:'
@@ -118,13 +151,8 @@ async def read_file_content(filepath: Path) -> str | None:
         return ":x: Invalid file path."
 
     try:
-        # Define a function to read the file in a thread
-        def read_file():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
-
-        # Use asyncio's thread to avoid blocking the event loop for file I/O
-        content = await asyncio.to_thread(read_file)
+        # Goes through the shared asset cache; file I/O never runs on the event loop
+        content = await asset_cache.read(filepath, cache=cache)
 
         # Check if content is empty
         if not content or content.strip() == "":
@@ -145,76 +173,30 @@ async def read_file_content(filepath: Path) -> str | None:
         log.error(f"Error reading file {filepath}: {e}", exc_info=True)
         return f":x: Error reading file `{filepath.name}`: {str(e)}"
 
-async def get_user_saves_metadata(user_id: int) -> list[dict]:
-    """Reads all metadata JSON files for a user's personal saves.
+async def read_user_content(user_id: int, uid: str | None) -> str | None:
+    """Reads the content of a saved file or of the user's temporary file.
 
     Args:
         user_id: The Discord user ID
+        uid: UID of the saved file, or None for the temporary file
 
     Returns:
-        A list of metadata dictionaries for the user's saves, sorted by date created (newest first)
+        The content as a string, None if there is none, or an error message string starting with ':x:'
     """
-    user_saves_path = SAVES_DIR / str(user_id)
-    metadata_list = []
-
-    # Ensure the saves directory exists
-    if not SAVES_DIR.exists():
-        try:
-            SAVES_DIR.mkdir(parents=True, exist_ok=True)
-            log.info(f"Created saves directory: {SAVES_DIR}")
-        except Exception as e:
-            log.error(f"Failed to create saves directory: {e}", exc_info=True)
-            return metadata_list
-
-    # Ensure the user's saves directory exists
-    if not user_saves_path.exists():
-        try:
-            user_saves_path.mkdir(parents=True, exist_ok=True)
-            log.info(f"Created user saves directory for user {user_id}: {user_saves_path}")
-            return metadata_list  # Return empty list for newly created directory
-        except Exception as e:
-            log.error(f"Failed to create user saves directory for user {user_id}: {e}", exc_info=True)
-            return metadata_list
-    elif not user_saves_path.is_dir():
-        log.error(f"User saves path exists but is not a directory: {user_saves_path}")
-        return metadata_list
-
+    label = f"{uid}.txt" if uid else f"{user_id}.txt"
     try:
-        for item in user_saves_path.iterdir():
-            if item.is_file() and item.suffix == '.json':
-                try:
-                    # Define a function to read and parse the JSON file
-                    def read_json_file():
-                        with open(item, 'r', encoding='utf-8') as f:
-                            return json.load(f)
-
-                    # Execute in a thread to avoid blocking
-                    data = await asyncio.to_thread(read_json_file)
-
-                    # Validate the metadata has required fields
-                    if not all(key in data for key in ['file_name', 'date_created']):
-                        log.warning(f"Metadata file {item} is missing required fields")
-                        # Try to repair if possible
-                        if 'file_name' not in data:
-                            data['file_name'] = item.stem
-                        if 'date_created' not in data:
-                            data['date_created'] = time.time()
-
-                    # Add file path info if needed, e.g., data['uid'] = item.stem
-                    if 'uid' not in data: # Ensure UID is present from file stem if missing
-                        data['uid'] = item.stem
-
-                    metadata_list.append(data)
-                except json.JSONDecodeError:
-                    log.error(f"Error decoding JSON file: {item}")
-                except Exception as e:
-                    log.error(f"Error reading metadata file {item}: {e}", exc_info=True)
+        content = await (content_store.read_save(user_id, uid) if uid else content_store.read_temp(user_id))
     except Exception as e:
-        log.error(f"Error listing files in user saves directory for user {user_id}: {e}", exc_info=True)
+        log.error(f"Error reading {label} of user {user_id}: {e}", exc_info=True)
+        return f":x: Error reading file `{label}`: {str(e)}"
 
-    # Sort by date created, newest first
-    metadata_list.sort(key=lambda x: x.get('date_created', 0), reverse=True)
-    return metadata_list
+    if content is None:
+        log.warning(f"No content found for {label} of user {user_id}")
+        return None
+    if content.strip() == "":
+        log.warning(f"File is empty: {label} of user {user_id}")
+        return ":x: File is empty."
+    return content
 
 def load_random_lines() -> list[str]:
     """Loads lines from random.txt for use as loading messages.
@@ -257,41 +239,31 @@ async def get_user_tier(user_id: int, uid: str | None = None) -> str:
 
     # First check if we have a UID to look up metadata
     if uid:
-        metadata_path = SAVES_DIR / str(user_id) / f"{uid}.json"
-        if metadata_path.exists():
-            try:
-                # Define a function to read and parse the JSON file
-                def read_json_file():
-                    with open(metadata_path, 'r', encoding='utf-8') as f:
-                        return json.load(f)
-
-                # Execute in a thread to avoid blocking
-                metadata = await asyncio.to_thread(read_json_file)
-
-                # Get tier from metadata with validation
-                tier = metadata.get('tier_used', 'Drifter')
-
-                # Validate tier is one of the allowed values
-                valid_tiers = ['Drifter', 'Abysswalker', 'Voidborn']
-                if tier not in valid_tiers:
-                    log.warning(f"Invalid tier '{tier}' in metadata for user {user_id}, UID {uid}. Defaulting to 'Drifter'.")
-                    tier = 'Drifter'
-
-                log.debug(f"Using tier '{tier}' from metadata file {uid}.json for user {user_id}")
-                return tier
-            except json.JSONDecodeError as e:
-                log.error(f"Invalid JSON in metadata file {metadata_path}: {e}")
-                return 'Drifter' # Default on JSON error
-            except Exception as e:
-                log.error(f"Error reading metadata {metadata_path} for tier: {e}", exc_info=True)
-                return 'Drifter' # Default on error reading metadata
+        try:
+            metadata = await saves_index.get_save(user_id, uid)
+        except Exception as e:
+            log.error(f"Error reading indexed metadata of {uid} for tier: {e}", exc_info=True)
+            return 'Drifter' # Default on error reading metadata
+
+        if metadata:
+            # Get tier from metadata with validation
+            tier = metadata.get('tier_used') or 'Drifter'
+
+            # Validate tier is one of the allowed values
+            valid_tiers = ['Drifter', 'Abysswalker', 'Voidborn']
+            if tier not in valid_tiers:
+                log.warning(f"Invalid tier '{tier}' in metadata for user {user_id}, UID {uid}. Defaulting to 'Drifter'.")
+                tier = 'Drifter'
+
+            log.debug(f"Using tier '{tier}' from indexed metadata of {uid} for user {user_id}")
+            return tier
 
     # If we get here, either no UID was provided or we couldn't get tier from metadata
     log.debug(f"Using default tier 'Drifter' for user {user_id} (temp file or no metadata)")
     return 'Drifter' # Default tier for temp files or if metadata fails
 
 async def get_command_module(command_name: str) -> tuple[object | None, str | None]:
-    """Finds and imports the command logic module.
+    """Finds the command logic module in the command registry.
 
     Args:
         command_name: The name of the command to find
@@ -299,57 +271,8 @@ async def get_command_module(command_name: str) -> tuple[object | None, str | No
     Returns:
         A tuple containing (module_object, tier) if found, or (None, None) if not found or error
     """
-    if not command_name:
-        log.error("Attempted to get command module with empty command name")
-        return None, None
-
-    # Normalize command name to lowercase and remove any special characters
-    normalized_name = ''.join(c for c in command_name.lower() if c.isalnum() or c == '_')
-    if normalized_name != command_name.lower():
-        log.warning(f"Command name '{command_name}' was normalized to '{normalized_name}'")
-
-    # Check if command directories exist
-    if not FREE_COMMANDS_DIR.exists():
-        try:
-            FREE_COMMANDS_DIR.mkdir(parents=True, exist_ok=True)
-            log.info(f"Created free commands directory: {FREE_COMMANDS_DIR}")
-        except Exception as e:
-            log.error(f"Failed to create free commands directory: {e}", exc_info=True)
-            return None, None
-
-    if not PREMIUM_COMMANDS_DIR.exists():
-        try:
-            PREMIUM_COMMANDS_DIR.mkdir(parents=True, exist_ok=True)
-            log.info(f"Created premium commands directory: {PREMIUM_COMMANDS_DIR}")
-        except Exception as e:
-            log.error(f"Failed to create premium commands directory: {e}", exc_info=True)
-            return None, None
-
-    # Prioritize premium, then free? Or check free first? Let's check free first.
-    for directory, tier in [(FREE_COMMANDS_DIR, 'free'), (PREMIUM_COMMANDS_DIR, 'premium')]:
-        module_filename = f"{normalized_name}_command.py"
-        module_path = directory / module_filename
-
-        if module_path.is_file():
-            module_name_import = f"commands.{tier}.{normalized_name}_command"
-            try:
-                # Use importlib to load the module dynamically
-                module = importlib.import_module(module_name_import)
-                # Reload module in case it was updated since bot start (useful for development)
-                module = importlib.reload(module)
-                log.debug(f"Loaded command module '{module_name_import}' for command '{command_name}'")
-                return module, tier
-            except ModuleNotFoundError:
-                 log.error(f"Found command file {module_path}, but failed to import module '{module_name_import}'")
-            except ImportError as e:
-                 log.error(f"Import error for command module {module_name_import}: {e}", exc_info=True)
-            except Exception as e:
-                 log.error(f"Error importing command module {module_name_import}: {e}", exc_info=True)
-            # Only return None if we found the file but failed to import it
-            return None, None # Import error
-
-    log.warning(f"Command logic file not found for command: {command_name}")
-    return None, None # Command not found in either directory
+    # The registry only re-imports a module when its file changed since it was loaded
+    return command_registry.get(command_name)
 
 def parse_command_line(line: str) -> tuple[str | None, dict | None, str | None]:
     """Parses a command line into name and args dict using shlex.
@@ -446,11 +369,11 @@ def parse_command_line(line: str) -> tuple[str | None, dict | None, str | None]:
 # --- Views & Modals ---
 
 class UndoConfirmView(ui.View):
-    def __init__(self, cog_instance: 'ExecutorCog', undone_commands: str, target_file_path: Path, uid: str | None):
+    def __init__(self, cog_instance: 'ExecutorCog', undone_commands: str, file_label: str, uid: str | None):
         super().__init__(timeout=300.0) # 5 min to confirm undo commit
         self.cog_instance = cog_instance
         self.undone_commands = undone_commands
-        self.target_file_path = target_file_path
+        self.file_label = file_label
         self.uid = uid
         self.message = None
 
@@ -468,48 +391,45 @@ class UndoConfirmView(ui.View):
         """Replaces file content and re-executes."""
         await self.disable_buttons()
         await interaction.response.defer(thinking=True, ephemeral=False) # Show public thinking for undo execution
-        log.info(f"User {interaction.user.id} confirmed commit for undo of file {self.target_file_path.name}")
+        log.info(f"User {interaction.user.id} confirmed commit for undo of file {self.file_label}")
+        user_id = interaction.user.id
 
         # Replace file content
         try:
-             # Define a function to write the file in a thread
-             async def write_file():
-                 with open(self.target_file_path, 'w', encoding='utf-8') as f:
-                     f.write(self.undone_commands)
-
-             # Execute file writing in a thread to avoid blocking
-             await asyncio.to_thread(write_file)
-             log.info(f"Replaced content of {self.target_file_path.name} with undone commands.")
+             if self.uid:
+                 await content_store.write_save(user_id, self.uid, self.undone_commands)
+             else:
+                 await content_store.write_temp(user_id, self.undone_commands)
+             log.info(f"Replaced content of {self.file_label} with undone commands.")
         except Exception as e:
-            log.error(f"Failed to write undone commands to {self.target_file_path.name}: {e}", exc_info=True)
+            log.error(f"Failed to write undone commands to {self.file_label}: {e}", exc_info=True)
             await interaction.followup.send(":x: Failed to save undone commands to file. Cannot proceed.", ephemeral=True)
             return
 
         # Determine tier again
-        user_id = interaction.user.id
         tier = await get_user_tier(user_id, self.uid)
 
         # Start new execution task for the undone commands
-        await self.cog_instance.execute_command_file(interaction, self.target_file_path, tier, self.uid, is_undo=True)
+        await self.cog_instance.execute_command_file(interaction, tier, self.uid, is_undo=True)
 
     async def on_timeout(self):
         await self.disable_buttons()
-        log.warning(f"UndoConfirmView timed out for file {self.target_file_path.name}")
+        log.warning(f"UndoConfirmView timed out for file {self.file_label}")
         # Edit the message
         if self.message:
              try:
                  await self.message.edit(content=f"{self.message.content}\n\n*Undo confirmation timed out.*", view=None)
              except discord.NotFound:
-                 log.warning(f"Message not found when timing out UndoConfirmView for {self.target_file_path.name}")
+                 log.warning(f"Message not found when timing out UndoConfirmView for {self.file_label}")
              except Exception as e:
                  log.error(f"Error editing message on UndoConfirmView timeout: {e}")
 
 
 class CommitResultView(ui.View):
-    def __init__(self, cog_instance: 'ExecutorCog', target_file_path: Path, original_content: str, uid: str | None):
+    def __init__(self, cog_instance: 'ExecutorCog', file_label: str, original_content: str, uid: str | None):
         super().__init__(timeout=300.0) # 5 min timeout for undo button
         self.cog_instance = cog_instance
-        self.target_file_path = target_file_path
+        self.file_label = file_label
         self.original_content = original_content
         self.uid = uid
         self.message = None
@@ -528,7 +448,7 @@ class CommitResultView(ui.View):
         """Starts the GPT-based undo process."""
         await self.disable_buttons()
         await interaction.response.defer(thinking=True, ephemeral=True) # Private thinking for GPT part
-        log.info(f"User {interaction.user.id} initiated Undo for file {self.target_file_path.name}")
+        log.info(f"User {interaction.user.id} initiated Undo for file {self.file_label}")
 
         gpt_instance = None
         try:
@@ -547,20 +467,20 @@ class CommitResultView(ui.View):
                 await interaction.followup.send(undone_commands or ":x: Failed to generate undo commands from AI.", ephemeral=True)
                 return
 
-            log.info(f"Received potential undone commands for {self.target_file_path.name}: {undone_commands[:100]}...")
+            log.info(f"Received potential undone commands for {self.file_label}: {undone_commands[:100]}...")
 
             # 3. Show proposed commands and Commit Undo button
             # Truncate for display
             display_commands = undone_commands[:1900] + ('...' if len(undone_commands) > 1900 else '')
             content = f"**Proposed Undo Commands:**\n```\n{display_commands}\n```\nClick 'Commit Undo' to replace the file and execute these commands."
-            confirm_view = UndoConfirmView(self.cog_instance, undone_commands, self.target_file_path, self.uid)
+            confirm_view = UndoConfirmView(self.cog_instance, undone_commands, self.file_label, self.uid)
 
             # Send new message for confirmation (ephemeral or public?) - let's keep it ephemeral
             msg = await interaction.followup.send(content=content, view=confirm_view, ephemeral=True)
             confirm_view.message = msg # Link view to message
 
         except Exception as e:
-             log.error(f"Error during Undo process for {self.target_file_path.name}: {e}", exc_info=True)
+             log.error(f"Error during Undo process for {self.file_label}: {e}", exc_info=True)
              await interaction.followup.send(":x: An unexpected error occurred during the Undo process.", ephemeral=True)
         finally:
              # Ensure GPT instance is closed
@@ -568,7 +488,7 @@ class CommitResultView(ui.View):
 
     async def on_timeout(self):
         await self.disable_buttons()
-        log.warning(f"CommitResultView timed out for file {self.target_file_path.name}")
+        log.warning(f"CommitResultView timed out for file {self.file_label}")
         if self.message:
             try: await self.message.edit(view=None) # Remove buttons
             except: pass
@@ -604,7 +524,6 @@ class CommitSavedSelectView(ui.View):
         """Starts execution for the selected saved file."""
         uid = interaction.data['values'][0]
         user_id = interaction.user.id
-        target_file_path = SAVES_DIR / str(user_id) / f"{uid}.txt"
 
         log.info(f"User {user_id} selected saved file {uid} for commit.")
 
@@ -614,13 +533,13 @@ class CommitSavedSelectView(ui.View):
         # Get tier from metadata
         tier = await get_user_tier(user_id, uid)
 
-        if not target_file_path.exists():
-            log.error(f"Selected file {target_file_path} does not exist despite metadata existing.")
+        if not await content_store.has_save(user_id, uid):
+            log.error(f"Content of selected save {uid} does not exist despite metadata existing.")
             await interaction.followup.send(f":x: Error: Could not find the content file for `{uid}`.", ephemeral=True)
             return
 
         # Start execution task
-        await self.cog_instance.execute_command_file(interaction, target_file_path, tier, uid)
+        await self.cog_instance.execute_command_file(interaction, tier, uid)
 
         # Disable the select menu after starting
         try:
@@ -663,12 +582,11 @@ class CommitSourceView(ui.View):
         """Handles commit for the temporary file."""
         await self.disable_buttons()
         user_id = interaction.user.id
-        target_file_path = TEMP_DIR / f"{user_id}.txt"
         log.info(f"User {user_id} selected temporary file for commit.")
 
         await interaction.response.defer(thinking=True, ephemeral=False) # Public thinking state
 
-        if not target_file_path.exists():
+        if not await content_store.has_temp(user_id):
             await interaction.followup.send(":warning: No temporary file found to execute.", ephemeral=True)
             return
 
@@ -676,7 +594,7 @@ class CommitSourceView(ui.View):
         tier = await get_user_tier(user_id, uid=None) # Should return 'Drifter'
 
         # Start execution task
-        await self.cog_instance.execute_command_file(interaction, target_file_path, tier, uid=None)
+        await self.cog_instance.execute_command_file(interaction, tier, uid=None)
 
     async def saved_callback(self, interaction: discord.Interaction):
         """Handles commit for saved files."""
@@ -685,7 +603,8 @@ class CommitSourceView(ui.View):
         log.info(f"User {user_id} selected saved file option for commit.")
         await interaction.response.defer(ephemeral=True) # Defer ephemerally before showing select
 
-        saved_files_metadata = await get_user_saves_metadata(user_id)
+        # The select menu shows at most 25 options
+        saved_files_metadata = await saves_index.get_user_saves(user_id, limit=25)
 
         if not saved_files_metadata:
              await interaction.followup.send("You have no saved files to choose from. Use `/spectre` to create and save one.", ephemeral=True)
@@ -716,10 +635,6 @@ class ExecutorCog(commands.Cog, name="Executor"):
         self.random_loading_lines = load_random_lines()
         # Store active execution message IDs maybe? For dynamic updates. user_id: message_id
         self.active_executions = {} # user_id: discord.Message
-        # Track sent messages for auto-deletion
-        self.sent_messages = [] # List of (message, timestamp) tuples
-        # Start the message cleanup task
-        self.message_cleanup_task = asyncio.create_task(self.cleanup_old_messages())
         log.info("Executor Cog initialized.")
 
     # Track when maintenance mode was enabled
@@ -815,23 +730,25 @@ class ExecutorCog(commands.Cog, name="Executor"):
          return True # Successfully updated or recoverable error
 
 
-    async def execute_command_file(self, interaction: discord.Interaction, target_file_path: Path, tier: str, uid: str | None, is_undo: bool = False):
-        """Parses and executes commands from a specified file."""
+    async def execute_command_file(self, interaction: discord.Interaction, tier: str, uid: str | None, is_undo: bool = False):
+        """Parses and executes commands from a saved file (uid) or the user's temporary file (uid=None)."""
         user_id = interaction.user.id
         start_time = time.time()
-        log.info(f"Starting execution of {'undo' if is_undo else 'commit'} for {target_file_path} by user {user_id} (Tier: {tier})")
+        # Same names the files had on disk before the content moved to the blob store
+        file_label = f"{uid}.txt" if uid else f"{user_id}.txt"
+        log.info(f"Starting execution of {'undo' if is_undo else 'commit'} for {file_label} by user {user_id} (Tier: {tier})")
 
         # Send initial status message
-        initial_embed = Embed(title="Preparing Execution...", description=f"Reading `{target_file_path.name}`...", color=Color.greyple())
+        initial_embed = Embed(title="Preparing Execution...", description=f"Reading `{file_label}`...", color=Color.greyple())
         # Use followup if interaction was deferred, else send new response (should always be deferred)
         status_message = await interaction.followup.send(embed=initial_embed, wait=True) # Send publicly, wait for message object
         self.active_executions[user_id] = status_message # Store message for updates
         # Track message for auto-deletion
         self.track_message(status_message)
 
-        original_content = await read_file_content(target_file_path)
+        original_content = await read_user_content(user_id, uid)
         if original_content is None:
-             await status_message.edit(embed=Embed(title="Execution Failed", description=f":x: File not found: `{target_file_path.name}`", color=Color.red()), view=None)
+             await status_message.edit(embed=Embed(title="Execution Failed", description=f":x: File not found: `{file_label}`", color=Color.red()), view=None)
              del self.active_executions[user_id]
              return
         if original_content.startswith(":x:"): # Handle read error
@@ -888,74 +805,101 @@ class ExecutorCog(commands.Cog, name="Executor"):
 
         commands_to_run = processed_content
         if not commands_to_run:
-            await status_message.edit(embed=Embed(title="Execution Finished", description=f"File `{target_file_path.name}` is empty or contains no valid commands.", color=Color.green()), view=None)
+            await status_message.edit(embed=Embed(title="Execution Finished", description=f"File `{file_label}` is empty or contains no valid commands.", color=Color.green()), view=None)
             del self.active_executions[user_id]
             return
 
         # Initialize statuses
-        statuses = {'total': len(commands_to_run), 'success': 0, 'failed': 0, 'skipped': 0, 'notices': [], 'filename': target_file_path.name}
-        last_update_time = time.time()
+        statuses = {'total': len(commands_to_run), 'success': 0, 'failed': 0, 'skipped': 0, 'notices': [], 'filename': file_label}
+        notice_entries = []  # (line, order, notice); notices are listed in file order even when lines finish out of order
+
+        def add_notice(line_no: int, notice: str):
+            bisect.insort(notice_entries, (line_no, len(notice_entries), notice))
+            statuses['notices'] = [entry[2] for entry in notice_entries]
 
-        # Execution loop
+        # --- Plan ---
+        # Parse every line and resolve its module up front; lines that can't run are settled right away
+        steps, accesses, modules, ordered = [], [], [], []
         for i, line in enumerate(commands_to_run):
              command_name, args, parse_error = parse_command_line(line)
-
-             # Update progress before processing
-             current_time = time.time()
-             if current_time - last_update_time > 1.0 or command_name == "NOTICE": # Update every second or on notice
-                 update_success = await self.update_progress(status_message, statuses)
-                 if not update_success:
-                     # Message was deleted or otherwise can't be updated
-                     log.warning(f"Stopping execution for user {user_id} as status message can't be updated")
-                     del self.active_executions[user_id]
-                     return
-                 last_update_time = current_time
-
+             module = None
              if parse_error:
-                 log.warning(f"Parse error on line {i+1} of {target_file_path.name}: {parse_error}")
+                 log.warning(f"Parse error on line {i+1} of {file_label}: {parse_error}")
                  statuses['failed'] += 1
-                 statuses['notices'].append(f"Line {i+1}: Parse Error - {parse_error}")
-                 continue # Skip to next command
-
-             if not command_name: # Skip empty/comment lines if parser returns None
-                 continue
+                 add_notice(i, f"Line {i+1}: Parse Error - {parse_error}")
+                 command_name = None
+             elif command_name == "NOTICE":
+                 ordered.append(i) # Shown once the lines before it are done
+             elif command_name:
+                 module, command_tier = await get_command_module(command_name)
+                 if not module:
+                     log.warning(f"Command '{command_name}' not found (Line {i+1}, File {file_label})")
+                     statuses['failed'] += 1
+                     add_notice(i, f"Line {i+1}: Command '{command_name}' not found.")
+                     command_name = None
+                 elif command_tier == 'premium' and tier == 'Drifter':
+                     # Check tier permission
+                     log.warning(f"Skipping premium command '{command_name}' for Drifter tier user {user_id} (Line {i+1}, File {file_label})")
+                     statuses['skipped'] += 1
+                     add_notice(i, f"Line {i+1}: Skipped premium command '{command_name}' (Requires Seeker/Abysswalker).")
+                     command_name, module = None, None
+
+             steps.append((command_name, args))
+             modules.append(module)
+             accesses.append(execution_planner.accesses_of(command_name, args, module, interaction.guild) if module else {})
+
+        # Runs of edits to the same role/channel become one edit, and runs of channel/role moves
+        # one bulk position update; both are made by the first line of the run
+        merged_groups, merged_into = {}, {}
+        for merger in (edit_coalescer, position_engine):
+             for group in merger.groups(steps, modules, accesses):
+                 merged_groups[group[0]] = (merger, group)
+                 for follower in group[1:]:
+                     merged_into[follower] = group[0]
+                     accesses[group[0]] = merge_accesses(accesses[group[0]], accesses[follower])
+                     accesses[follower] = {}
+
+        plan = execution_planner.plan(steps, accesses, ordered=ordered)
+        log.info(f"Planned {len(plan)} line(s) of {file_label}: dependency depth {plan.depth()}, {len(plan.barriers)} barrier(s), "
+                 f"{len(merged_into)} line(s) merged into earlier edits or moves")
+
+        async def run_step(i: int):
+             # Interactive responses go before the file's API calls
+             api_priority.set(BULK)
+             command_name, args = steps[i]
+             module = modules[i]
+             if command_name is None or i in merged_into:
+                 return # Empty/comment line, settled while planning, or applied with an earlier line
+
+             if i in merged_groups:
+                 # Every merged line is still counted on its own
+                 merger, group = merged_groups[i]
+                 log.info(f"Executing lines {', '.join(str(j + 1) for j in group)} as one {'edit' if merger is edit_coalescer else 'position update'} (File {file_label})")
+                 try:
+                     errors = await merger.run(interaction, group, steps, modules)
+                 except Exception as e:
+                     log.error(f"Error executing merged lines (Lines {', '.join(str(j + 1) for j in group)}, File {file_label}): {e}", exc_info=True)
+                     errors = [str(e)] * len(group)
+                 for j, error in zip(group, errors):
+                     if error is None:
+                         statuses['success'] += 1
+                     else:
+                         statuses['failed'] += 1
+                         add_notice(j, f"Line {j+1}: ❌ {steps[j][0]} failed - {error}")
+                 return
 
              # Handle NOTICE directly
              if command_name == "NOTICE":
                  notice_msg = args.get("message", "")
-                 log.info(f"NOTICE from file {target_file_path.name}: {notice_msg}")
-                 statuses['notices'].append(notice_msg)
-                 # Update progress immediately after notice is added
-                 update_success = await self.update_progress(status_message, statuses)
-                 if not update_success:
-                     # Message was deleted or otherwise can't be updated
-                     log.warning(f"Stopping execution for user {user_id} as status message can't be updated")
-                     del self.active_executions[user_id]
-                     return
-                 last_update_time = time.time()
-                 continue # NOTICE isn't counted as success/fail/skip
-
-             # Find command module
-             module, command_tier = await get_command_module(command_name)
-
-             if not module:
-                 log.warning(f"Command '{command_name}' not found (Line {i+1}, File {target_file_path.name})")
-                 statuses['failed'] += 1
-                 statuses['notices'].append(f"Line {i+1}: Command '{command_name}' not found.")
-                 continue
-
-             # Check tier permission
-             if command_tier == 'premium' and tier == 'Drifter':
-                 log.warning(f"Skipping premium command '{command_name}' for Drifter tier user {user_id} (Line {i+1}, File {target_file_path.name})")
-                 statuses['skipped'] += 1
-                 statuses['notices'].append(f"Line {i+1}: Skipped premium command '{command_name}' (Requires Seeker/Abysswalker).")
-                 continue
+                 log.info(f"NOTICE from file {file_label}: {notice_msg}")
+                 add_notice(i, notice_msg)
+                 return # NOTICE isn't counted as success/fail/skip
 
              # Execute command
              try:
                  if hasattr(module, 'execute') and asyncio.iscoroutinefunction(module.execute):
                      # Pass interaction, bot, and args
-                     log.info(f"Executing command '{command_name}' with args {args} (Line {i+1}, File {target_file_path.name})")
+                     log.info(f"Executing command '{command_name}' with args {args} (Line {i+1}, File {file_label})")
                      await module.execute(interaction=interaction, bot=self.bot, args=args)
                      statuses['success'] += 1
                      # Add success notice? Maybe too verbose.
@@ -963,14 +907,31 @@ class ExecutorCog(commands.Cog, name="Executor"):
                  else:
                      log.error(f"Command module {module.__name__} does not have a valid async 'execute' function.")
                      statuses['failed'] += 1
-                     statuses['notices'].append(f"Line {i+1}: Execution error for '{command_name}' (Invalid command file).")
+                     add_notice(i, f"Line {i+1}: Execution error for '{command_name}' (Invalid command file).")
 
              except Exception as e:
-                 log.error(f"Error executing command '{command_name}' (Line {i+1}, File {target_file_path.name}): {e}", exc_info=True)
+                 log.error(f"Error executing command '{command_name}' (Line {i+1}, File {file_label}): {e}", exc_info=True)
                  statuses['failed'] += 1
                  # Get traceback string
                  tb_str = traceback.format_exc().splitlines()[-1] # Get last line of traceback
-                 statuses['notices'].append(f"Line {i+1}: ❌ {command_name} failed - {tb_str}")
+                 add_notice(i, f"Line {i+1}: ❌ {command_name} failed - {tb_str}")
+
+        # Execution loop: independent lines run concurrently, dependent ones in file order
+        last_update_time = 0.0
+        # Bulk calls are paced by the API governor; record how long they were held back
+        with api_governor.track() as api_wait:
+            async with aclosing(execution_planner.run(plan, run_step)) as finished:
+                 async for i in finished:
+                     # Update every second or on notice
+                     current_time = time.time()
+                     if current_time - last_update_time > 1.0 or steps[i][0] == "NOTICE":
+                         update_success = await self.update_progress(status_message, statuses)
+                         if not update_success:
+                             # Message was deleted or otherwise can't be updated; closing the run cancels the lines in flight
+                             log.warning(f"Stopping execution for user {user_id} as status message can't be updated")
+                             del self.active_executions[user_id]
+                             return
+                         last_update_time = current_time
 
 
         # --- Final Status Update ---
@@ -982,22 +943,22 @@ class ExecutorCog(commands.Cog, name="Executor"):
         final_embed = Embed(title=final_title, color=final_color)
         final_status_line = f"✅ {statuses['success']} Succeeded | ❌ {statuses['failed']} Failed | ⚠️ {statuses['skipped']} Skipped"
         final_notices = "\n".join([f"> {('ℹ️' if 'Skipped' not in n and 'failed' not in n else '')} {n}" for n in statuses['notices']])
-        final_embed.description = f"File: `{target_file_path.name}`\n" \
-                                  f"Took {duration:.2f} seconds.\n\n" \
+        final_embed.description = f"File: `{file_label}`\n" \
+                                  f"Took {duration:.2f} seconds ({api_wait.waited:.2f}s waiting on Discord rate limits over {api_wait.calls} API calls).\n\n" \
                                   f"**Summary:** {final_status_line}\n\n" \
                                   f"**Log:**\n{final_notices if final_notices else '*No notices*'}"
 
         # Add Undo button if it wasn't an undo execution already
         result_view = None
         if not is_undo:
-             result_view = CommitResultView(self, target_file_path, original_content, uid)
+             result_view = CommitResultView(self, file_label, original_content, uid)
 
         await status_message.edit(embed=final_embed, view=result_view)
         if result_view: result_view.message = status_message # Link view to message
 
         if user_id in self.active_executions:
             del self.active_executions[user_id] # Remove from active tracking
-        log.info(f"Execution finished for {target_file_path.name}. Success: {statuses['success']}, Failed: {statuses['failed']}, Skipped: {statuses['skipped']}. Took {duration:.2f}s")
+        log.info(f"Execution finished for {file_label}. Success: {statuses['success']}, Failed: {statuses['failed']}, Skipped: {statuses['skipped']}. Took {duration:.2f}s, {api_wait.waited:.2f}s of it waiting on rate limits (max {api_wait.max_wait:.2f}s per call)")
 
 
     # --- Commands ---
@@ -1062,67 +1023,47 @@ class ExecutorCog(commands.Cog, name="Executor"):
 
         log.info(f"Executor maintenance mode set to {status} by {ctx.author}")
 
+    @commands.is_owner()
+    @commands.command(name="rescancommands", aliases=['rescan'])
+    async def rescan_commands(self, ctx: commands.Context):
+        """Forces a rescan of the command module registry (Owner Only)."""
+        report = command_registry.scan()
+        stats = command_registry.stats()
+        summary = f":arrows_counterclockwise: Command registry rescanned. Indexed **{stats['indexed']}** modules " \
+                  f"({stats['free']} free, {stats['premium']} premium).\n" \
+                  f"Loaded: {len(report['loaded'])} | Reloaded: {len(report['reloaded'])} | Removed: {len(report['removed'])} | Failed: {len(report['failed'])}"
+        if report['failed']:
+            summary += f"\n```\n" + "\n".join(report['failed']) + "\n```"
+        message = await ctx.send(summary)
+        # Track message for auto-deletion
+        self.track_message(message)
+        log.info(f"Command registry rescanned by {ctx.author}")
+
+    @commands.is_owner()
+    @commands.command(name="apistats")
+    async def api_stats(self, ctx: commands.Context):
+        """Shows how long Discord API calls waited on rate limits, per priority (Owner Only)."""
+        stats = api_governor.stats()
+        message = await ctx.send(
+            f"**API governor:** {stats['buckets']} buckets tracked | {stats['rate_limited']} rate limited response(s)\n"
+            f"**Interactive:** {stats['interactive_calls']} calls | avg wait {stats['interactive_avg_wait']:.2f}s, max {stats['interactive_max_wait']:.2f}s\n"
+            f"**Bulk:** {stats['bulk_calls']} calls | avg wait {stats['bulk_avg_wait']:.2f}s, max {stats['bulk_max_wait']:.2f}s"
+        )
+        self.track_message(message)
+
     async def cog_load(self):
         """Called when the cog is loaded."""
+        # Index the command modules once so execution doesn't import them per line
+        command_registry.scan()
         log.info(f"ExecutorCog loaded")
 
-    async def cleanup_old_messages(self):
-        """Task that periodically checks for and deletes old messages."""
-        while True:
-            try:
-                current_time = time.time()
-                # Create a new list with messages that are still valid (not old enough to delete)
-                still_valid = []
-
-                for message, timestamp in self.sent_messages:
-                    # Check if message is older than 5000 seconds
-                    if current_time - timestamp > 5000:
-                        try:
-                            # Try to delete the message
-                            await message.delete()
-                            log.info(f"Auto-deleted message {message.id} after 5000 seconds")
-                        except discord.NotFound:
-                            # Message already deleted, just skip
-                            log.debug(f"Message {message.id} already deleted")
-                        except discord.Forbidden:
-                            # Bot doesn't have permission to delete
-                            log.warning(f"No permission to delete message {message.id}")
-                        except Exception as e:
-                            log.error(f"Error deleting message {message.id}: {e}")
-                    else:
-                        # Message not old enough yet, keep it in the list
-                        still_valid.append((message, timestamp))
-
-                # Update the list with only valid messages
-                self.sent_messages = still_valid
-
-                # Sleep for a minute before checking again
-                await asyncio.sleep(60)
-            except asyncio.CancelledError:
-                # Task was cancelled, exit cleanly
-                log.info("Message cleanup task cancelled")
-                break
-            except Exception as e:
-                log.error(f"Error in message cleanup task: {e}", exc_info=True)
-                # Sleep a bit before retrying
-                await asyncio.sleep(60)
-
     # Helper method to track messages for auto-deletion
     def track_message(self, message):
-        """Add a message to the tracking list for auto-deletion."""
-        if message and hasattr(message, 'id'):
-            self.sent_messages.append((message, time.time()))
-            log.debug(f"Tracking message {message.id} for auto-deletion")
+        """Schedule a message for auto-deletion by the bot-wide scheduler."""
+        message_scheduler.schedule(message)
 
     async def cog_unload(self):
         """Called when the cog is unloaded."""
-        # Cancel the message cleanup task
-        if hasattr(self, 'message_cleanup_task') and self.message_cleanup_task:
-            self.message_cleanup_task.cancel()
-            try:
-                await self.message_cleanup_task
-            except asyncio.CancelledError:
-                pass
         log.info(f"ExecutorCog unloaded")
 
 # --- Setup Function ---
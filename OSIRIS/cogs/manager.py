@@ -8,6 +8,8 @@ import json
 import asyncio
 import aiosqlite
 import math
+import re
+from collections import OrderedDict
 import sys
 from pathlib import Path
 from discord.ext import commands
@@ -139,15 +141,19 @@ sys.path.append(str(BASE_DIR))
 
 # Import config manager
 from utils.config_manager import config
+from utils.asset_cache import asset_cache
+from utils.database import market_db
+from utils.listing_index import listing_index, Debouncer
+from utils.saves_index import saves_index
+from utils.counter_buffer import market_counters
+from utils.trending import trending
+from utils.content_store import content_store
+from utils.message_scheduler import message_scheduler
 
 # --- Constants & Setup ---
 SAVES_DIR = BASE_DIR / "saves"
 TEMP_DIR = BASE_DIR / "temp"
 
-# Get database config
-db_config = config.get_database_config()
-DB_PATH = BASE_DIR / db_config.get("path", "market.db")
-
 # Logger for this cog
 log = logging.getLogger('MyBot.ManagerCog')
 
@@ -157,19 +163,42 @@ ui_config = config.get_ui_config()
 # Items per page for paginated views
 ITEMS_PER_PAGE = config.get("vault.max_saves_per_page", 5)
 
+# How much of a relic's saved text is stored for full-text search
+SEARCH_SNIPPET_CHARS = config.get("market.search_snippet_chars", 500)
+
+# ORDER BY clauses for the Bazaar sort options
+SORT_ORDERS = {
+    'date': 'ml.date_listed DESC, ml.uid DESC',
+    'saves': 'ml.saves_count DESC, ml.date_listed DESC, ml.uid DESC',
+    'stars': 'ml.stars_count DESC, ml.date_listed DESC, ml.uid DESC',
+    # Precomputed hot score (utils/trending.py), read from market_trending
+    'trending': 'mt.score DESC, mt.uid DESC',
+    # Only valid together with a search; name matches weigh more than description and content matches
+    'relevance': 'bm25(market_listings_fts, 10.0, 5.0, 1.0), ml.date_listed DESC',
+}
+
+# Seek keys for keyset pagination as (result column, SQL expression), matching the sort indexes
+# (uid breaks remaining ties)
+KEYSET_COLUMNS = {
+    'date': (('date_listed', 'ml.date_listed'), ('uid', 'ml.uid')),
+    'saves': (('saves_count', 'ml.saves_count'), ('date_listed', 'ml.date_listed'), ('uid', 'ml.uid')),
+    'stars': (('stars_count', 'ml.stars_count'), ('date_listed', 'ml.date_listed'), ('uid', 'ml.uid')),
+    'trending': (('trending_score', 'mt.score'), ('uid', 'mt.uid')),
+}
+
+# Rendered Bazaar pages kept per paginator
+MARKET_PAGE_CACHE_SIZE = config.get("market.page_cache_size", 8)
+
+# Seconds to wait for further keystrokes before answering /indulge autocomplete
+AUTOCOMPLETE_DEBOUNCE = config.get("market.autocomplete_debounce", 0.1)
+
 # --- Helper Functions ---
 
-async def read_file_content(filepath: Path) -> str | None:
+async def read_file_content(filepath: Path, cache: bool = True) -> str | None:
     """Helper to read text files asynchronously."""
     try:
-        # Define a function to read the file in a thread
-        def read_file():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
-
-        # Use asyncio's thread to avoid blocking the event loop for file I/O
-        content = await asyncio.to_thread(read_file)
-        return content
+        # Goes through the shared asset cache (cache=False for one-off user files)
+        return await asset_cache.read(filepath, cache=cache)
     except FileNotFoundError:
         log.error(f"File not found: {filepath}")
         return f":warning: Error: Required file `{filepath.name}` not found. Please inform the bot owner."
@@ -179,102 +208,159 @@ async def read_file_content(filepath: Path) -> str | None:
 
 # --- Database Helper Functions ---
 
-async def db_connect() -> aiosqlite.Connection:
-    """Establishes connection to the SQLite database."""
-    # Create and return the connection directly
-    conn = await aiosqlite.connect(DB_PATH)
-    return conn
-
-async def get_user_saves_metadata(user_id: int) -> list[dict]:
-    """Reads all metadata JSON files for a user's personal saves."""
-    user_saves_path = SAVES_DIR / str(user_id)
-    metadata_list = []
-    if not user_saves_path.is_dir():
-        return metadata_list # No saves directory for this user
-
-    for item in user_saves_path.iterdir():
-        if item.is_file() and item.suffix == '.json':
-            try:
-                # Define a function to read and parse the JSON file
-                def read_json_file():
-                    with open(item, 'r', encoding='utf-8') as f:
-                        return json.load(f)
-
-                # Execute in a thread to avoid blocking
-                data = await asyncio.to_thread(read_json_file)
-                # Add file path info if needed, e.g., data['uid'] = item.stem
-                if 'uid' not in data: # Ensure UID is present from file stem if missing
-                    data['uid'] = item.stem
-                metadata_list.append(data)
-            except json.JSONDecodeError:
-                log.error(f"Error decoding JSON file: {item}")
-            except Exception as e:
-                log.error(f"Error reading metadata file {item}: {e}", exc_info=True)
-    # Sort by date created, newest first
-    metadata_list.sort(key=lambda x: x.get('date_created', 0), reverse=True)
-    return metadata_list
-
-async def get_user_market_saves_info(user_id: int) -> list[aiosqlite.Row]:
+async def get_user_market_saves_info(user_id: int) -> list[dict]:
     """Gets details of market items saved by the user."""
-    db = await db_connect()
-    try:
-        db.row_factory = aiosqlite.Row # Return rows as dict-like objects
-        async with db.execute('''
-            SELECT ml.* FROM market_listings ml
-            JOIN user_market_saves ums ON ml.uid = ums.uid
-            WHERE ums.user_id = ?
-            ORDER BY ums.date_saved DESC
-        ''', (user_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return rows if rows else []
-    finally:
-        await db.close()
-
-async def get_market_listing(uid: str) -> aiosqlite.Row | None:
+    rows = await market_db.fetchall('''
+        SELECT ml.* FROM market_listings ml
+        JOIN user_market_saves ums ON ml.uid = ums.uid
+        WHERE ums.user_id = ?
+        ORDER BY ums.date_saved DESC
+    ''', (user_id,))
+    return market_counters.apply_all(rows)
+
+async def get_market_listing(uid: str) -> dict | None:
     """Fetches a specific listing from market_listings."""
-    db = await db_connect()
-    try:
-        db.row_factory = aiosqlite.Row
-        async with db.execute('SELECT * FROM market_listings WHERE uid = ?', (uid,)) as cursor:
-            row = await cursor.fetchone()
-            return row
-    finally:
-        await db.close()
-
-async def get_all_market_listings(sort_by: str = 'date', search_term: str | None = None) -> list[aiosqlite.Row]:
-    """Fetches all listings, with optional sorting and searching."""
-    query = 'SELECT * FROM market_listings'
-    params = []
-
-    if search_term:
-        query += ' WHERE file_name LIKE ? OR description LIKE ?'
-        params.extend([f'%{search_term}%', f'%{search_term}%'])
-
-    if sort_by == 'saves':
-        query += ' ORDER BY saves_count DESC, date_listed DESC'
-    elif sort_by == 'stars':
-         query += ' ORDER BY stars_count DESC, date_listed DESC'
-    else: # Default sort by date (newest first)
-        query += ' ORDER BY date_listed DESC'
-
-    db = await db_connect()
+    return market_counters.apply(await market_db.fetchone('SELECT * FROM market_listings WHERE uid = ?', (uid,)))
+
+def build_search_query(search_term: str) -> str | None:
+    """Turns user input into an FTS5 query: every word must match, as a prefix. None if there are no words."""
+    tokens = re.findall(r"\w+", search_term.lower())
+    if not tokens:
+        return None
+    # Quoting keeps FTS5 operators in user input (AND, NEAR, "-", ...) from being interpreted
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def listing_source(sort_by: str, searching: bool) -> tuple[str, str]:
+    """Returns the SELECT column list and FROM clause for a sort, optionally restricted by full-text search."""
+    if sort_by == 'trending':
+        # Drive the join from market_trending so the score index supplies the order
+        columns = 'ml.*, mt.score AS trending_score'
+        source = 'market_trending mt JOIN market_listings ml ON ml.uid = mt.uid'
+    else:
+        columns, source = 'ml.*', 'market_listings ml'
+    if searching:
+        source += ' JOIN market_listings_fts ON market_listings_fts.rowid = ml.rowid'
+    return columns, source
+
+async def get_all_market_listings(sort_by: str = 'date', search_term: str | None = None) -> list[dict]:
+    """Fetches all listings, with optional sorting and full-text searching."""
+    match = build_search_query(search_term) if search_term else None
+    if search_term and not match:
+        return []
+    if sort_by == 'relevance' and not match:
+        sort_by = 'date'
+
+    columns, source = listing_source(sort_by, bool(match))
+    where = 'WHERE market_listings_fts MATCH ?' if match else ''
+    order = SORT_ORDERS.get(sort_by, SORT_ORDERS['date'])
+    rows = await market_db.fetchall(f'SELECT {columns} FROM {source} {where} ORDER BY {order}', (match,) if match else ())
+    return market_counters.apply_all(rows)
+
+async def count_market_listings(search_term: str | None = None) -> int:
+    """Counts the listings, or the listings matching a search."""
+    if not search_term:
+        return await market_db.fetchval('SELECT COUNT(*) FROM market_listings', default=0)
+    match = build_search_query(search_term)
+    if not match:
+        return 0
+    return await market_db.fetchval(
+        'SELECT COUNT(*) FROM market_listings_fts WHERE market_listings_fts MATCH ?', (match,), default=0
+    )
+
+async def search_market_listings(search_term: str | None, limit: int = 25) -> list[dict]:
+    """Fetches the best matching listings for a search (the newest listings if there is no search term)."""
+    match = build_search_query(search_term) if search_term else None
+    if not match:
+        return await market_db.fetchall('SELECT uid, file_name FROM market_listings ORDER BY date_listed DESC LIMIT ?', (limit,))
+    return await market_db.fetchall(f'''
+        SELECT ml.uid, ml.file_name FROM market_listings_fts
+        JOIN market_listings ml ON ml.rowid = market_listings_fts.rowid
+        WHERE market_listings_fts MATCH ?
+        ORDER BY {SORT_ORDERS['relevance']}
+        LIMIT ?
+    ''', (match, limit))
+
+async def fetch_market_page(sort_by: str, search_term: str | None, limit: int, cursor: tuple | None = None,
+                            backwards: bool = False, offset: int = 0) -> list[dict]:
+    """Fetches one page of listings.
+
+    The date/saves/stars sorts seek past `cursor` (the sort key of the last row on the previous page,
+    or of the first row on the next page when `backwards`), so only `limit` rows are read from the index.
+    The relevance sort has no stable key and pages with `offset` instead.
+
+    Returns:
+        The listings in display order
+    """
+    match = build_search_query(search_term) if search_term else None
+    if search_term and not match:
+        return []
+    if sort_by == 'relevance' and not match:
+        sort_by = 'date'
+
+    if sort_by not in SORT_ORDERS:
+        sort_by = 'date'
+    select, source = listing_source(sort_by, bool(match))
+    conditions, params = (['market_listings_fts MATCH ?'], [match]) if match else ([], [])
+
+    if sort_by == 'relevance':
+        where = f"WHERE {' AND '.join(conditions)}"
+        return await market_db.fetchall(
+            f'SELECT {select} FROM {source} {where} ORDER BY {SORT_ORDERS["relevance"]} LIMIT ? OFFSET ?',
+            (*params, limit, offset)
+        )
+
+    columns = [expression for _, expression in KEYSET_COLUMNS[sort_by]]
+    if cursor is not None:
+        # Row-value comparison: everything sorts descending, so "after" means smaller
+        conditions.append(f"({', '.join(columns)}) {'>' if backwards else '<'} ({', '.join('?' * len(columns))})")
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    direction = 'ASC' if backwards else 'DESC'
+    order = ', '.join(f"{c} {direction}" for c in columns)
+
+    rows = await market_db.fetchall(
+        f'SELECT {select} FROM {source} {where} ORDER BY {order} LIMIT ? OFFSET ?',
+        (*params, limit, offset)
+    )
+    if backwards:
+        rows.reverse()
+    return rows
+
+async def read_content_snippet(owner_id: int, uid: str) -> str:
+    """Reads the start of a relic's saved text for the search index ('' if the content is missing)."""
     try:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
-            return rows if rows else []
-    finally:
-        await db.close()
+        content = await content_store.read_save(owner_id, uid)
+    except Exception as e:
+        log.error(f"Error reading content of relic {uid} for the search index: {e}")
+        return ""
+    return (content or "")[:SEARCH_SNIPPET_CHARS]
+
+async def backfill_content_snippets(batch_size: int = 200) -> int:
+    """Fills content_snippet for listings created before it existed. Returns the number of listings updated."""
+    updated = 0
+    while True:
+        rows = await market_db.fetchall(
+            'SELECT uid, owner_id FROM market_listings WHERE content_snippet IS NULL LIMIT ?', (batch_size,)
+        )
+        if not rows:
+            break
+        snippets = [(await read_content_snippet(row['owner_id'], row['uid']), row['uid']) for row in rows]
+        await market_db.executemany('UPDATE market_listings SET content_snippet = ? WHERE uid = ?', snippets)
+        updated += len(rows)
+    if updated:
+        log.info(f"Indexed saved content for {updated} existing market listing(s)")
+    return updated
 
 async def add_market_listing(uid: str, owner_id: int, file_name: str, description: str | None) -> bool:
     """Adds a new listing to the market."""
-    db = await db_connect()
     try:
-        await db.execute('''
-            INSERT INTO market_listings (uid, owner_id, file_name, description, date_listed, saves_count, stars_count)
-            VALUES (?, ?, ?, ?, ?, 0, 0)
-        ''', (uid, owner_id, file_name, description, time.time()))
-        await db.commit()
+        content_snippet = await read_content_snippet(owner_id, uid)
+        date_listed = time.time()
+        await market_db.execute('''
+            INSERT INTO market_listings (uid, owner_id, file_name, description, date_listed, saves_count, stars_count, content_snippet)
+            VALUES (?, ?, ?, ?, ?, 0, 0, ?)
+        ''', (uid, owner_id, file_name, description, date_listed, content_snippet))
+        listing_index.add(uid, file_name, date_listed)
         return True
     except aiosqlite.IntegrityError:
          log.warning(f"Attempted to list item with duplicate UID: {uid}")
@@ -282,106 +368,74 @@ async def add_market_listing(uid: str, owner_id: int, file_name: str, descriptio
     except Exception as e:
         log.error(f"Error adding market listing for UID {uid}: {e}", exc_info=True)
         return False
-    finally:
-        await db.close()
 
 async def remove_market_listing(uid: str) -> bool:
     """Removes a listing from the market."""
-    db = await db_connect()
     try:
-        cursor = await db.execute('DELETE FROM market_listings WHERE uid = ?', (uid,))
-        await db.commit()
-        return cursor.rowcount > 0 # Return True if a row was deleted
+        deleted = await market_db.execute('DELETE FROM market_listings WHERE uid = ?', (uid,))
+        listing_index.remove(uid)
+        market_counters.discard(uid)
+        return deleted > 0 # Return True if a row was deleted
     except Exception as e:
         log.error(f"Error removing market listing for UID {uid}: {e}", exc_info=True)
         return False
-    finally:
-        await db.close()
 
-async def increment_market_saves(uid: str) -> bool:
-    """Increments the saves_count for a listing."""
-    db = await db_connect()
-    try:
-        await db.execute('UPDATE market_listings SET saves_count = saves_count + 1 WHERE uid = ?', (uid,))
-        await db.commit()
+async def save_market_item(user_id: int, uid: str) -> bool | None:
+    """Records that a user saved a market item and increments its saves_count.
+
+    The save record is written transactionally (so a repeated click can't double-count);
+    the counter increment is buffered and written in a batch by `market_counters`.
+
+    Returns:
+        True if the item was saved, False if the user had already saved it, None if the listing doesn't exist
+    """
+    async def operation(conn: aiosqlite.Connection) -> bool | None:
+        # Inserting from market_listings makes the existence check part of the same statement
+        cursor = await conn.execute('''
+            INSERT OR IGNORE INTO user_market_saves (user_id, uid, date_saved)
+            SELECT ?, uid, ? FROM market_listings WHERE uid = ?
+        ''', (user_id, time.time(), uid))
+        if cursor.rowcount == 0:
+            async with conn.execute('SELECT 1 FROM market_listings WHERE uid = ?', (uid,)) as check:
+                return False if await check.fetchone() else None
         return True
-    except Exception as e:
-        log.error(f"Error incrementing saves for UID {uid}: {e}", exc_info=True)
-        return False
-    finally:
-        await db.close()
 
-async def increment_market_stars(uid: str) -> bool:
-    """Increments the stars_count for a listing."""
-    db = await db_connect()
-    try:
-        await db.execute('UPDATE market_listings SET stars_count = stars_count + 1 WHERE uid = ?', (uid,))
-        await db.commit()
+    saved = await market_db.transaction(operation)
+    if saved:
+        market_counters.increment(uid, 'saves_count')
+    return saved
+
+async def award_market_item(user_id: int, uid: str) -> bool | None:
+    """Records that a user awarded a star to a market item and increments its stars_count (buffered, see save_market_item).
+
+    Returns:
+        True if the star was awarded, False if the user had already awarded one, None if the listing doesn't exist
+    """
+    async def operation(conn: aiosqlite.Connection) -> bool | None:
+        cursor = await conn.execute('''
+            INSERT OR IGNORE INTO user_market_awards (user_id, uid)
+            SELECT ?, uid FROM market_listings WHERE uid = ?
+        ''', (user_id, uid))
+        if cursor.rowcount == 0:
+            async with conn.execute('SELECT 1 FROM market_listings WHERE uid = ?', (uid,)) as check:
+                return False if await check.fetchone() else None
         return True
-    except Exception as e:
-        log.error(f"Error incrementing stars for UID {uid}: {e}", exc_info=True)
-        return False
-    finally:
-        await db.close()
 
-async def add_user_market_save(user_id: int, uid: str) -> bool:
-    """Adds a record indicating a user saved a market item."""
-    db = await db_connect()
-    try:
-        await db.execute('INSERT INTO user_market_saves (user_id, uid, date_saved) VALUES (?, ?, ?)', (user_id, uid, time.time()))
-        await db.commit()
-        return True
-    except aiosqlite.IntegrityError:
-        log.info(f"User {user_id} already saved item {uid}.")
-        return False # User likely already saved this item
-    except Exception as e:
-        log.error(f"Error adding user market save for user {user_id}, UID {uid}: {e}", exc_info=True)
-        return False
-    finally:
-        await db.close()
-
-async def add_user_market_award(user_id: int, uid: str) -> bool:
-    """Adds a record indicating a user awarded a market item."""
-    db = await db_connect()
-    try:
-        await db.execute('INSERT INTO user_market_awards (user_id, uid) VALUES (?, ?)', (user_id, uid))
-        await db.commit()
-        return True
-    except aiosqlite.IntegrityError:
-        log.info(f"User {user_id} already awarded item {uid}.")
-        return False # User likely already awarded this item
-    except Exception as e:
-         log.error(f"Error adding user market award for user {user_id}, UID {uid}: {e}", exc_info=True)
-         return False
-    finally:
-        await db.close()
-
-async def check_user_market_award(user_id: int, uid: str) -> bool:
-    """Checks if a user has already awarded stars to a specific market item."""
-    db = await db_connect()
-    try:
-        async with db.execute('SELECT 1 FROM user_market_awards WHERE user_id = ? AND uid = ?', (user_id, uid)) as cursor:
-            result = await cursor.fetchone()
-            return result is not None
-    finally:
-        await db.close() # Return True if an award record exists
+    awarded = await market_db.transaction(operation)
+    if awarded:
+        market_counters.increment(uid, 'stars_count')
+    return awarded
 
-async def get_user_relics(owner_id: int) -> list[aiosqlite.Row]:
+async def get_user_relics(owner_id: int) -> list[dict]:
     """Fetches market listings owned by a specific user."""
-    db = await db_connect()
-    try:
-        db.row_factory = aiosqlite.Row
-        async with db.execute('SELECT * FROM market_listings WHERE owner_id = ? ORDER BY date_listed DESC', (owner_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return rows if rows else []
-    finally:
-        await db.close()
+    rows = await market_db.fetchall('SELECT * FROM market_listings WHERE owner_id = ? ORDER BY date_listed DESC', (owner_id,))
+    return market_counters.apply_all(rows)
 
 # --- Views & Modals ---
 
 class VaultPaginator(Paginator):
     """ Custom Paginator for the Vault command. """
-    def __init__(self, user_creations: list[dict], market_saves: list[aiosqlite.Row], user: discord.User, cog_instance: 'ManagerCog', items_per_page: int = ITEMS_PER_PAGE):
+    def __init__(self, user_creations: list[dict], market_saves: list[dict], user: discord.User, cog_instance: 'ManagerCog', items_per_page: int = ITEMS_PER_PAGE, has_temp: bool = False):
         # Call parent class's __init__
         super().__init__(timeout=180.0)
 
@@ -402,9 +456,8 @@ class VaultPaginator(Paginator):
             self.page_indicator.label = f"Page 1/{self.total_pages}"
 
         # Add View Temp File button - independent of pagination items
-        temp_file_path = TEMP_DIR / f"{user.id}.txt"
         view_temp_button = ui.Button(label="View Temp File", style=ButtonStyle.secondary, emoji="📄", custom_id="view_temp")
-        view_temp_button.disabled = not temp_file_path.exists()
+        view_temp_button.disabled = not has_temp # Checked by the caller (content_store.has_temp)
         view_temp_button.callback = self.view_temp_callback
 
         # Call super init *after* calculating total pages
@@ -497,37 +550,44 @@ class VaultPaginator(Paginator):
         """Callback for the 'View Temp File' button."""
         await interaction.response.defer(ephemeral=True)
         user_id = interaction.user.id
-        temp_file_path = TEMP_DIR / f"{user_id}.txt"
-        if temp_file_path.exists():
+        if await content_store.has_temp(user_id):
             try:
-                content = await read_file_content(temp_file_path)
-                if content and not content.startswith(":"):
+                content = await content_store.read_temp(user_id)
+                if content:
                     # Truncate long content
                     display_content = content[:1900] + ('...' if len(content) > 1900 else '')
                     await interaction.followup.send(f"**Temporary File Content:**\n```\n{display_content}\n```", ephemeral=True)
                 else:
                     await interaction.followup.send(content or ":warning: Could not read temporary file.", ephemeral=True)
             except Exception as e:
-                log.error(f"Error reading temp file {temp_file_path} in vault: {e}")
+                log.error(f"Error reading temp file of user {user_id} in vault: {e}")
                 await interaction.followup.send(":x: Error accessing temporary file.", ephemeral=True)
         else:
             await interaction.followup.send(":warning: Temporary file not found.", ephemeral=True)
 
 
 class MarketPaginator(Paginator):
-    """ Custom Paginator for The Bazaar view. """
-    def __init__(self, listings: list[aiosqlite.Row], user: discord.User, cog_instance: 'ManagerCog', sort_by: str, search_term: str | None, items_per_page: int = ITEMS_PER_PAGE):
-        self.listings = listings
+    """ Custom Paginator for The Bazaar view. Pages are fetched from the database as they are shown. """
+    def __init__(self, total_listings: int, user: discord.User, cog_instance: 'ManagerCog', sort_by: str, search_term: str | None, items_per_page: int = ITEMS_PER_PAGE):
+        self.total_listings = total_listings
         self.user = user
         self.cog_instance = cog_instance
         self.items_per_page = items_per_page
-        self.total_pages = math.ceil(len(self.listings) / self.items_per_page)
-        if self.total_pages == 0: self.total_pages = 1
 
-        self.sort_by = sort_by
+        # Relevance needs a search; without one fall back to the default sort
+        self.sort_by = 'date' if sort_by == 'relevance' and not search_term else sort_by
         self.search_term = search_term
+        # page number: (sort key of its first row, sort key of its last row), used to seek to neighbouring pages
+        self.page_bounds: dict[int, tuple[tuple, tuple]] = {}
+        self.page_cache: OrderedDict[int, discord.Embed] = OrderedDict()
 
         super().__init__(pages=[], timeout=300.0, show_disabled=True, show_indicator=True) # Longer timeout for Browse
+        # The base class sizes the buttons from `pages`, which is unused here
+        self.total_pages = max(math.ceil(self.total_listings / self.items_per_page), 1)
+        self.page_indicator.label = f"Page 1/{self.total_pages}"
+        self.next_page_button.disabled = self.total_pages <= 1
+        self.last_page_button.disabled = self.total_pages <= 1
+
         # Add Sort/Search buttons to the paginator's view
         sort_button = ui.Button(label="Sort", style=ButtonStyle.secondary, emoji="↕️", custom_id="market_sort")
         sort_button.callback = self.sort_callback
@@ -549,10 +609,46 @@ class MarketPaginator(Paginator):
             await self.send(interaction, ephemeral=ephemeral)
 
 
+    @classmethod
+    async def create(cls, user: discord.User, cog_instance: 'ManagerCog', sort_by: str, search_term: str | None) -> 'MarketPaginator':
+        """Builds a paginator for a sort/search, counting the matching listings first."""
+        total = await count_market_listings(search_term)
+        return cls(total, user, cog_instance, sort_by, search_term)
+
+    def _row_key(self, row: dict) -> tuple:
+        return tuple(row[column] for column, _ in KEYSET_COLUMNS.get(self.sort_by, KEYSET_COLUMNS['date']))
+
+    async def fetch_page(self, page_num: int) -> list[dict]:
+        """Fetches the listings of one page, seeking from a neighbouring page whenever its bounds are known."""
+        limit = self.items_per_page
+        if self.sort_by == 'relevance':
+            return await fetch_market_page(self.sort_by, self.search_term, limit, offset=(page_num - 1) * limit)
+
+        if page_num == 1:
+            return await fetch_market_page(self.sort_by, self.search_term, limit)
+        if page_num - 1 in self.page_bounds:
+            return await fetch_market_page(self.sort_by, self.search_term, limit, cursor=self.page_bounds[page_num - 1][1])
+        if page_num + 1 in self.page_bounds:
+            return await fetch_market_page(self.sort_by, self.search_term, limit, cursor=self.page_bounds[page_num + 1][0], backwards=True)
+        if page_num == self.total_pages:
+            # Read the tail of the sort order backwards; the last page holds whatever is left over
+            last_size = self.total_listings - (self.total_pages - 1) * limit
+            return await fetch_market_page(self.sort_by, self.search_term, max(last_size, 1), backwards=True)
+
+        # No neighbouring page seen yet (not reachable with the navigation buttons)
+        rows = await fetch_market_page(self.sort_by, self.search_term, page_num * limit)
+        return rows[(page_num - 1) * limit:]
+
     async def format_page(self, page_num: int) -> discord.Embed:
+        cached = self.page_cache.get(page_num)
+        if cached is not None:
+            self.page_cache.move_to_end(page_num)
+            return cached
+
         start_index = (page_num - 1) * self.items_per_page
-        end_index = start_index + self.items_per_page
-        current_listings = self.listings[start_index:end_index]
+        current_listings = await self.fetch_page(page_num)
+        if current_listings and self.sort_by != 'relevance':
+            self.page_bounds[page_num] = (self._row_key(current_listings[0]), self._row_key(current_listings[-1]))
 
         embed = Embed(title="The Bazaar - Market Listings", color=Color.gold())
         embed.set_footer(text=f"Page {page_num}/{self.total_pages} | Sorted by: {self.sort_by.capitalize()} " + (f"| Searching for: '{self.search_term}'" if self.search_term else ""))
@@ -563,7 +659,8 @@ class MarketPaginator(Paginator):
 
         list_str = ""
 
-        for i, item in enumerate(current_listings):
+        # Page bounds above use the stored counts; the displayed ones include unflushed saves/stars
+        for i, item in enumerate(market_counters.apply_all(current_listings)):
             uid = item['uid']
             name = item['file_name']
             owner_id = item['owner_id']
@@ -572,9 +669,11 @@ class MarketPaginator(Paginator):
             desc = item.get('description', '*No description.*')
             date_ts = item.get('date_listed', 0)
             date_str = f"<t:{int(date_ts)}:R>" if date_ts else "Unknown date"
+            # Only present when sorted by trending
+            heat = f" | 🔥 {trending.current_score(item['trending_score']):.1f}" if 'trending_score' in item else ""
 
             list_str += f"**{i+1+start_index}. {name}** (`{uid}`)\n" \
-                         f"> Owner: <@{owner_id}> | ⭐ {stars} | 💾 {saves}\n" \
+                         f"> Owner: <@{owner_id}> | ⭐ {stars} | 💾 {saves}{heat}\n" \
                          f"> Listed: {date_str}\n" \
                          f"> {desc}\n\n"
 
@@ -587,19 +686,20 @@ class MarketPaginator(Paginator):
         # Add Indulge command hint
         embed.add_field(name="Actions", value="Use `/indulge <uid>` to view details, save, or award stars.", inline=False)
 
+        self.page_cache[page_num] = embed
+        if len(self.page_cache) > MARKET_PAGE_CACHE_SIZE:
+            self.page_cache.popitem(last=False)
         return embed
 
     async def sort_callback(self, interaction: discord.Interaction):
         """ Callback for the Sort button. """
-        view = SortChoiceView(current_sort=self.sort_by)
+        view = SortChoiceView(current_sort=self.sort_by, include_relevance=bool(self.search_term))
         await interaction.response.send_message("Select sorting criteria:", view=view, ephemeral=True)
         # Wait for the SortChoiceView interaction
         await view.wait()
         if hasattr(view, 'selected_sort') and view.selected_sort:
-             # Re-fetch and update the paginator
-             new_listings = await get_all_market_listings(sort_by=view.selected_sort, search_term=self.search_term)
-             # Create a *new* paginator instance with the updated data
-             new_paginator = MarketPaginator(new_listings, self.user, self.cog_instance, view.selected_sort, self.search_term)
+             # Create a *new* paginator for the new sort order (it fetches only its first page)
+             new_paginator = await MarketPaginator.create(self.user, self.cog_instance, view.selected_sort, self.search_term)
              await self.message.edit(embed=await new_paginator.format_page(1), view=new_paginator)
              self.stop() # Stop the old paginator
 
@@ -611,15 +711,19 @@ class MarketPaginator(Paginator):
         await modal.wait()
         if hasattr(modal, 'search_term'): # Check if search term was submitted
              new_search = modal.search_term if modal.search_term else None # Use None if cleared
-             # Re-fetch and update
-             new_listings = await get_all_market_listings(sort_by=self.sort_by, search_term=new_search)
-             new_paginator = MarketPaginator(new_listings, self.user, self.cog_instance, self.sort_by, new_search)
+             # A new search shows the best matches first; clearing it drops the relevance sort
+             if new_search:
+                 new_sort = 'relevance'
+             else:
+                 new_sort = 'date' if self.sort_by == 'relevance' else self.sort_by
+             # Re-count and update (the new paginator fetches only its first page)
+             new_paginator = await MarketPaginator.create(self.user, self.cog_instance, new_sort, new_search)
              await self.message.edit(embed=await new_paginator.format_page(1), view=new_paginator)
              self.stop()
 
 
 class SortChoiceView(ui.View):
-    def __init__(self, current_sort: str):
+    def __init__(self, current_sort: str, include_relevance: bool = False):
         super().__init__(timeout=60.0)
         self.selected_sort = None
 
@@ -627,7 +731,11 @@ class SortChoiceView(ui.View):
             discord.SelectOption(label="Date Listed (Newest)", value="date", emoji="📅", default=current_sort=='date'),
             discord.SelectOption(label="Saves Count (Highest)", value="saves", emoji="💾", default=current_sort=='saves'),
             discord.SelectOption(label="Stars Count (Highest)", value="stars", emoji="⭐", default=current_sort=='stars'),
+            discord.SelectOption(label="Trending (Recent Saves & Stars)", value="trending", emoji="🔥", default=current_sort=='trending'),
         ]
+        if include_relevance:
+            # Only meaningful while a search is active
+            options.insert(0, discord.SelectOption(label="Best Match", value="relevance", emoji="🔍", default=current_sort=='relevance'))
         self.select_menu = ui.Select(placeholder="Choose sorting...", options=options, custom_id="sort_select")
         self.select_menu.callback = self.select_callback
         self.add_item(self.select_menu)
@@ -663,7 +771,7 @@ class SearchModal(ui.Modal, title="Search Bazaar Listings"):
 
 
 class MyRelicsView(ui.View):
-    def __init__(self, cog_instance: 'ManagerCog', owner_id: int, listed_relics: list[aiosqlite.Row]):
+    def __init__(self, cog_instance: 'ManagerCog', owner_id: int, listed_relics: list[dict]):
         super().__init__(timeout=300.0)
         self.cog_instance = cog_instance
         self.owner_id = owner_id
@@ -692,10 +800,8 @@ class MyRelicsView(ui.View):
     async def list_creation_callback(self, interaction: discord.Interaction):
         """Shows a dropdown of unlisted creations to list."""
         await interaction.response.defer(ephemeral=True)
-        user_creations = await get_user_saves_metadata(self.owner_id)
-        listed_uids = {relic['uid'] for relic in self.listed_relics}
-
-        unlisted_creations = [c for c in user_creations if c['uid'] not in listed_uids]
+        # The select menu shows at most 25 options
+        unlisted_creations = await saves_index.get_user_saves(self.owner_id, limit=25, unlisted_only=True)
 
         if not unlisted_creations:
              await interaction.followup.send("You have no unlisted creations in your saves to list.", ephemeral=True)
@@ -760,8 +866,7 @@ class ListCreationSelectView(ui.View):
         await interaction.response.defer(ephemeral=True)
 
         # Fetch metadata for the selected UID
-        user_creations = await get_user_saves_metadata(interaction.user.id)
-        creation_data = next((c for c in user_creations if c['uid'] == uid_to_list), None)
+        creation_data = await saves_index.get_save(interaction.user.id, uid_to_list)
 
         if not creation_data:
             await interaction.followup.send(":x: Could not find metadata for the selected creation.", ephemeral=True)
@@ -785,7 +890,7 @@ class ListCreationSelectView(ui.View):
 
 
 class IndulgeView(ui.View):
-    def __init__(self, cog_instance: 'ManagerCog', listing_data: aiosqlite.Row, current_user_id: int):
+    def __init__(self, cog_instance: 'ManagerCog', listing_data: dict, current_user_id: int):
         super().__init__(timeout=180.0)
         self.cog_instance = cog_instance
         self.listing_data = listing_data
@@ -820,27 +925,22 @@ class IndulgeView(ui.View):
         user_id = interaction.user.id
         uid = self.uid
 
-        # Check if already saved
-        async with db_connect() as db:
-             async with db.execute("SELECT 1 FROM user_market_saves WHERE user_id = ? AND uid = ?", (user_id, uid)) as cursor:
-                 already_saved = await cursor.fetchone()
-
-        if already_saved:
-             await interaction.followup.send(":information_source: You have already saved this relic.", ephemeral=True)
-             return
-
-        # Add to user saves and increment count
-        save_added = await add_user_market_save(user_id, uid)
-        count_incremented = False
-        if save_added:
-             count_incremented = await increment_market_saves(uid)
+        # The save record commits right away (a repeated click can't double-count); the count is buffered
+        try:
+            saved = await save_market_item(user_id, uid)
+        except Exception as e:
+            log.error(f"Error saving market item {uid} for user {user_id}: {e}", exc_info=True)
+            await interaction.followup.send(":x: Failed to save relic. Please try again.", ephemeral=True)
+            return
 
-        if save_added and count_incremented:
+        if saved:
              log.info(f"User {user_id} saved market item {uid}")
              await interaction.followup.send(":white_check_mark: Relic saved to your `/vault`!", ephemeral=True)
              # Optionally update the displayed saves count? Requires re-fetching and editing embed.
+        elif saved is False:
+             await interaction.followup.send(":information_source: You have already saved this relic.", ephemeral=True)
         else:
-             await interaction.followup.send(":x: Failed to save relic. Please try again.", ephemeral=True)
+             await interaction.followup.send(":x: This relic is no longer listed on the Exchange.", ephemeral=True)
 
 
     async def award_star_callback(self, interaction: discord.Interaction):
@@ -849,24 +949,22 @@ class IndulgeView(ui.View):
         user_id = interaction.user.id
         uid = self.uid
 
-        # Check if already awarded
-        already_awarded = await check_user_market_award(user_id, uid)
-        if already_awarded:
-            await interaction.followup.send(":information_source: You have already awarded a star to this relic.", ephemeral=True)
+        # The award record commits right away; the count is buffered
+        try:
+            awarded = await award_market_item(user_id, uid)
+        except Exception as e:
+            log.error(f"Error awarding star to market item {uid} for user {user_id}: {e}", exc_info=True)
+            await interaction.followup.send(":x: Failed to award star. Please try again.", ephemeral=True)
             return
 
-        # Add award record and increment count
-        award_added = await add_user_market_award(user_id, uid)
-        count_incremented = False
-        if award_added:
-            count_incremented = await increment_market_stars(uid)
-
-        if award_added and count_incremented:
+        if awarded:
             log.info(f"User {user_id} awarded star to market item {uid}")
             await interaction.followup.send(":star: Star awarded! Thank you for your appreciation.", ephemeral=True)
             # Optionally update the displayed stars count? Requires re-fetching and editing embed.
+        elif awarded is False:
+            await interaction.followup.send(":information_source: You have already awarded a star to this relic.", ephemeral=True)
         else:
-            await interaction.followup.send(":x: Failed to award star. Please try again.", ephemeral=True)
+            await interaction.followup.send(":x: This relic is no longer listed on the Exchange.", ephemeral=True)
 
     async def on_timeout(self):
         await self.disable_buttons()
@@ -878,10 +976,7 @@ class ManagerCog(commands.Cog, name="Manager"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.maintenance_mode = False
-        # Track sent messages for auto-deletion after 5000 seconds
-        self.sent_messages = [] # List of (message, timestamp) tuples
-        # Start the message cleanup task
-        self.message_cleanup_task = asyncio.create_task(self.cleanup_old_messages())
+        self.autocomplete_debouncer = Debouncer(AUTOCOMPLETE_DEBOUNCE)
         log.info("Manager Cog initialized.")
 
     # Track when maintenance mode was enabled
@@ -916,7 +1011,7 @@ class ManagerCog(commands.Cog, name="Manager"):
         except Exception as e:
             log.error(f"Error in maintenance timeout task: {e}", exc_info=True)
 
-    async def format_my_relics_embed(self, relics: list[aiosqlite.Row]) -> Embed:
+    async def format_my_relics_embed(self, relics: list[dict]) -> Embed:
         """Formats the embed for the 'My Relics' view."""
         embed = Embed(title="My Relics on the Market", color=Color.blue())
         if not relics:
@@ -945,14 +1040,15 @@ class ManagerCog(commands.Cog, name="Manager"):
         await interaction.response.defer(ephemeral=True) # Make vault view private
 
         user_id = interaction.user.id
-        user_creations = await get_user_saves_metadata(user_id)
+        user_creations = await saves_index.get_user_saves(user_id)
         market_saves = await get_user_market_saves_info(user_id)
 
+        has_temp = await content_store.has_temp(user_id)
+
         if not user_creations and not market_saves:
             # Add temp file check here too before saying completely empty
-            temp_file_path = TEMP_DIR / f"{user_id}.txt"
             view_temp_button = ui.Button(label="View Temp File", style=ButtonStyle.secondary, emoji="📄", custom_id="view_temp")
-            view_temp_button.disabled = not temp_file_path.exists()
+            view_temp_button.disabled = not has_temp
             # Need a dummy callback or reuse vault's
             async def temp_callback(inter: discord.Interaction): await VaultPaginator([], [], interaction.user, self).view_temp_callback(inter)
             view_temp_button.callback = temp_callback
@@ -964,7 +1060,7 @@ class ManagerCog(commands.Cog, name="Manager"):
             return
 
         # Use the custom paginator
-        paginator = VaultPaginator(user_creations, market_saves, interaction.user, self)
+        paginator = VaultPaginator(user_creations, market_saves, interaction.user, self, has_temp=has_temp)
         await paginator.respond(interaction, ephemeral=True)
 
 
@@ -990,12 +1086,11 @@ class ManagerCog(commands.Cog, name="Manager"):
         async def bazaar_callback(inter: discord.Interaction):
              """Callback for The Bazaar button."""
              await inter.response.defer(ephemeral=True) # Keep Browse private? Or public? Let's try public
-             listings = await get_all_market_listings(sort_by='date') # Default sort
-             if not listings:
+             paginator = await MarketPaginator.create(inter.user, self, 'date', None) # Default sort
+             if not paginator.total_listings:
                   await inter.followup.send("The Bazaar is currently empty.", ephemeral=True)
                   return
 
-             paginator = MarketPaginator(listings, inter.user, self, 'date', None)
              # Respond non-ephemerally for Bazaar Browse
              await paginator.respond(inter, ephemeral=False) # Send public message for Browse
 
@@ -1048,17 +1143,32 @@ class ManagerCog(commands.Cog, name="Manager"):
         """Autocompletes UIDs for the indulge command.
 
         Args:
-            interaction: The Discord interaction (required by Discord API but not used)
+            interaction: The Discord interaction (used to debounce per user)
             current: The current input string
 
         Returns:
             A list of autocomplete choices
         """
 
-        listings = await get_all_market_listings(search_term=current if current else None)
+        # A newer keystroke from the same user makes this request obsolete
+        if not await self.autocomplete_debouncer.settle(interaction.user.id):
+            return []
+
+        # UID and name prefixes come from the in-memory index; when that leaves room (or the index
+        # isn't loaded), full-text search adds description, content and out-of-order word matches
+        matches = listing_index.search(current or "", limit=25) if listing_index.loaded else []
+        if len(matches) < 25 and ((current or "").strip() or not listing_index.loaded):
+            try:
+                found = {uid for uid, _ in matches}
+                for listing in await search_market_listings(current if current else None, limit=25):
+                    if listing['uid'] not in found and len(matches) < 25:
+                        matches.append((listing['uid'], listing['file_name']))
+            except Exception as e:
+                log.error(f"Error searching listings for autocomplete: {e}", exc_info=True)
+
         choices = []
-        for listing in listings[:25]: # Limit choices
-            choices.append(app_commands.Choice(name=f"{listing['file_name']} ({listing['uid'][:6]}...)", value=listing['uid']))
+        for uid, file_name in matches: # Limit choices
+            choices.append(app_commands.Choice(name=f"{file_name} ({uid[:6]}...)"[:100], value=uid))
         return choices
 
     @commands.is_owner()
@@ -1084,68 +1194,84 @@ class ManagerCog(commands.Cog, name="Manager"):
 
         log.info(f"Manager maintenance mode set to {status} by {ctx.author}")
 
+    @commands.is_owner()
+    @commands.command(name="savescheck")
+    async def saves_check(self, ctx: commands.Context, repair: bool = False):
+        """Compares the saves index with the save files on disk; `savescheck true` repairs it (Owner Only)."""
+        try:
+            report = await saves_index.check_consistency(repair=repair)
+        except Exception as e:
+            log.error(f"Saves index consistency check failed: {e}", exc_info=True)
+            message = await ctx.send(f":x: Saves index check failed: {e}")
+            self.track_message(message)
+            return
+
+        problems = report['unindexed'] + report['mismatched'] + report['orphaned']
+        status = ":white_check_mark:" if not problems else (":wrench:" if repair else ":warning:")
+        message = await ctx.send(
+            f"{status} Saves index: {report['indexed']} indexed, {report['sidecars']} sidecar(s) on disk. "
+            f"Unindexed: {report['unindexed']}, mismatched: {report['mismatched']}, orphaned: {report['orphaned']}"
+            + (" (repaired)" if repair and problems else "")
+        )
+        self.track_message(message)
+
+    @commands.is_owner()
+    @commands.command(name="savesmigrate")
+    async def saves_migrate(self, ctx: commands.Context, limit: int = 1000):
+        """Moves saves still stored as .txt files into the blob store, up to `limit` per call (Owner Only)."""
+        try:
+            result = await content_store.migrate_legacy_saves(limit=limit)
+        except Exception as e:
+            log.error(f"Legacy save migration failed: {e}", exc_info=True)
+            message = await ctx.send(f":x: Save migration failed: {e}")
+            self.track_message(message)
+            return
+        message = await ctx.send(
+            f":package: Moved {result['migrated']} save(s) into the blob store. "
+            f"Missing content: {result['missing']}, failed: {result['failed']}"
+        )
+        self.track_message(message)
+
+    @commands.is_owner()
+    @commands.command(name="contentgc")
+    async def content_gc(self, ctx: commands.Context):
+        """Expires old temporary files and deletes unreferenced blobs (Owner Only)."""
+        try:
+            result = await content_store.collect_garbage()
+        except Exception as e:
+            log.error(f"Content garbage collection failed: {e}", exc_info=True)
+            message = await ctx.send(f":x: Garbage collection failed: {e}")
+            self.track_message(message)
+            return
+        message = await ctx.send(
+            f":wastebasket: Removed {result['removed']} blob(s) ({result['bytes_freed'] / 1024:.1f} KB), kept {result['kept']}. "
+            f"Expired temp outputs: {result['expired_temp_outputs']}, legacy temp files: {result['expired_temp_files']}"
+        )
+        self.track_message(message)
+
 
     async def cog_load(self):
         """Called when the cog is loaded."""
-        log.info(f"ManagerCog loaded")
+        # Build the autocomplete index from the current listings
+        try:
+            listing_index.load(await market_db.fetchall('SELECT uid, file_name, date_listed FROM market_listings'))
+        except Exception as e:
+            log.error(f"Error loading the market listing index: {e}", exc_info=True)
 
-    async def cleanup_old_messages(self):
-        """Task that periodically checks for and deletes old messages."""
-        while True:
-            try:
-                current_time = time.time()
-                # Create a new list with messages that are still valid (not old enough to delete)
-                still_valid = []
-
-                for message, timestamp in self.sent_messages:
-                    # Check if message is older than 5000 seconds
-                    if current_time - timestamp > 5000:
-                        try:
-                            # Try to delete the message
-                            await message.delete()
-                            log.info(f"Auto-deleted message {message.id} after 5000 seconds")
-                        except discord.NotFound:
-                            # Message already deleted, just skip
-                            log.debug(f"Message {message.id} already deleted")
-                        except discord.Forbidden:
-                            # Bot doesn't have permission to delete
-                            log.warning(f"No permission to delete message {message.id}")
-                        except Exception as e:
-                            log.error(f"Error deleting message {message.id}: {e}")
-                    else:
-                        # Message not old enough yet, keep it in the list
-                        still_valid.append((message, timestamp))
-
-                # Update the list with only valid messages
-                self.sent_messages = still_valid
-
-                # Sleep for a minute before checking again
-                await asyncio.sleep(60)
-            except asyncio.CancelledError:
-                # Task was cancelled, exit cleanly
-                log.info("Message cleanup task cancelled")
-                break
-            except Exception as e:
-                log.error(f"Error in message cleanup task: {e}", exc_info=True)
-                # Sleep a bit before retrying
-                await asyncio.sleep(60)
+        # Listings created before full-text search have no content snippet yet (one-off)
+        try:
+            await backfill_content_snippets()
+        except Exception as e:
+            log.error(f"Error indexing saved content of market listings: {e}", exc_info=True)
+        log.info(f"ManagerCog loaded")
 
     # Helper method to track messages for auto-deletion
     def track_message(self, message):
-        """Add a message to the tracking list for auto-deletion."""
-        if message and hasattr(message, 'id'):
-            self.sent_messages.append((message, time.time()))
-            log.debug(f"Tracking message {message.id} for auto-deletion")
+        """Schedule a message for auto-deletion by the bot-wide scheduler."""
+        message_scheduler.schedule(message)
 
     async def cog_unload(self):
         """Called when the cog is unloaded."""
-        # Cancel the message cleanup task
-        if hasattr(self, 'message_cleanup_task') and self.message_cleanup_task:
-            self.message_cleanup_task.cancel()
-            try:
-                await self.message_cleanup_task
-            except asyncio.CancelledError:
-                pass
         log.info(f"ManagerCog unloaded")
 
 # --- Setup Function ---
@@ -23,6 +23,15 @@ sys.path.append(str(BASE_DIR))
 
 # Import config manager
 from utils.config_manager import config
+from utils.asset_cache import asset_cache
+from utils.saves_index import saves_index
+from utils.content_store import content_store
+from utils.rate_limiter import rate_limiter
+from utils.message_scheduler import message_scheduler
+from utils.admission import admission, AdmissionRejected
+from utils.response_cache import response_cache
+from utils.refine_jobs import refine_jobs
+from utils.session_store import session_store
 
 # Define paths
 FILES_DIR = BASE_DIR
@@ -43,14 +52,8 @@ log = logging.getLogger('MyBot.SpectreCog')
 async def read_file_content(filepath: Path) -> str | None:
     """Helper to read text files asynchronously."""
     try:
-        # Define a function to read the file in a thread
-        def read_file():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read()
-
-        # Use asyncio's thread to avoid blocking the event loop for file I/O
-        content = await asyncio.to_thread(read_file)
-        return content
+        # Served from the shared asset cache; only read from disk when the file changed
+        return await asset_cache.read(filepath)
     except FileNotFoundError:
         log.error(f"File not found: {filepath}")
         return f":warning: Error: Required file `{filepath.name}` not found. Please inform the bot owner."
@@ -90,6 +93,55 @@ def truncate_code_block(code: str, max_length: int = 1800) -> str:
     # If we need to truncate, add an ellipsis to indicate truncation
     return f"```\n{code[:max_length]}...\n```"
 
+class ProgressiveEditor:
+    """Edits a message with a partial AI response, at most once per `min_interval` seconds."""
+    def __init__(self, message: discord.Message, header: str = "**AI Response:**", min_interval: float = 1.2, loading_lines: list | None = None):
+        self.message = message
+        self.header = header
+        self.min_interval = min_interval
+        self.loading_lines = loading_lines or []
+        self.last_edit = 0.0
+        self.edits = 0
+        self.first_edit_at = None
+        self.started = time.monotonic()
+        self.original_content = message.content
+
+    async def restore(self):
+        """Puts back the message content from before streaming started (used when the query failed)."""
+        if not self.edits:
+            return
+        try:
+            await self.message.edit(content=self.original_content)
+        except discord.HTTPException as e:
+            log.debug(f"Could not restore message {self.message.id} after a failed stream: {e}")
+
+    async def queued(self, position: int):
+        """Shows the user's place in the model queue while the request waits for a slot."""
+        line = random.choice(self.loading_lines) if self.loading_lines else "..."
+        content = f":hourglass: The void is busy. You are **#{position}** in line.\n\n```{line}```"
+        try:
+            await self.message.edit(content=content)
+            self.edits += 1
+        except discord.HTTPException as e:
+            log.debug(f"Skipped queue position edit for message {self.message.id}: {e}")
+
+    async def update(self, partial: str):
+        """Shows the text received so far if the last edit is old enough; otherwise skips it."""
+        now = time.monotonic()
+        if now - self.last_edit < self.min_interval:
+            return
+        self.last_edit = now
+        content = truncate_message(f"{self.header}\n{truncate_code_block(partial + ' ▌', 1800)}\n\n*Generating...*", 1900)
+        try:
+            await self.message.edit(content=content)
+            self.edits += 1
+            if self.first_edit_at is None:
+                self.first_edit_at = now - self.started
+                log.info(f"First streamed output shown after {self.first_edit_at:.2f}s")
+        except discord.HTTPException as e:
+            # A missed preview edit is harmless; the final edit shows the full response
+            log.debug(f"Skipped streaming edit for message {self.message.id}: {e}")
+
 async def safe_send_message(interaction: discord.Interaction, content: str, ephemeral: bool = True, delete_after: int = None):
     """Safely sends a message, handling the case where the interaction has expired."""
     try:
@@ -106,105 +158,89 @@ async def safe_send_message(interaction: discord.Interaction, content: str, ephe
         except Exception as e:
             log.error(f"Failed to send message after interaction expired: {e}")
 
-# --- GPT Integration using g4f ---
-from g4f.client import Client
+# --- GPT Integration using the shared LLM backend ---
+from utils.llm_backend import llm_backend
+from utils.guild_snapshot import guild_snapshots
+
+from utils.conversation_history import ConversationHistory
+
+# Responses shorter than this are treated as failed and retried
+MIN_RESPONSE_LENGTH = 5
 
 class GPTInstance:
-    """ Real GPT instance using g4f client. """
-    def __init__(self, initial_prompt: str):
-        self.client = Client()
-        self.history = [{"role": "system", "content": initial_prompt}]
+    """ GPT session whose requests go through the shared, non-blocking LLM backend. """
+    def __init__(self, initial_prompt: str, max_context_tokens: int = 4096, tier: str | None = None):
+        self.history = ConversationHistory(initial_prompt, max_tokens=max_context_tokens)
+        self.tier = tier  # Priority lane in the model admission queue
         self.timeout = config.get("spectre.timeout", 30)  # Default timeout of 30 seconds (reduced from 60)
-        log.info(f"GPT initialized with prompt: {initial_prompt[:50]}...")
+        log.info(f"GPT initialized with prompt: {initial_prompt[:50]}... (budget: {max_context_tokens} tokens)")
 
     async def close(self):
         """Close the GPT instance and clean up resources."""
-        # Suppress any warnings during cleanup
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            # Clear the history to help with garbage collection
-            if hasattr(self, 'history'):
-                self.history.clear()
-            # Set client to None to help with garbage collection
-            if hasattr(self, 'client'):
-                self.client = None
+        # The client is shared by all sessions, so only the history is released here
+        if hasattr(self, 'history'):
+            self.history.clear()
         log.info("GPT instance closed")
 
-    async def query(self, user_prompt: str) -> str:
-        """ Sends a query to the GPT model. """
-        log.info(f"GPT received query: {user_prompt[:50]}...")
-
-        # Add user message to history
-        self.history.append({"role": "user", "content": user_prompt})
+    async def query(self, user_prompt: str, context: str | None = None, on_delta=None) -> str:
+        """ Sends a query to the GPT model.
 
-        # Filter out curl_cffi warnings
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", message="Curlm already closed! quitting from process_data")
-            warnings.filterwarnings("ignore", category=UserWarning)
+        The turn is only added to the history once a usable response arrived, so a
+        retried query is never recorded twice. If `on_delta` is given the response is
+        streamed and the coroutine is awaited with the text received so far.
+        """
+        log.info(f"GPT received query: {user_prompt[:50]}...")
 
-        # Create a task for the request that we can cancel if needed
-        request_task = None
+        # Only the latest server context is kept and sent
+        self.history.set_context(context)
+        messages = self.history.fit(user_prompt)
+        log.info(f"Sending {len(messages)} messages (~{self.history.last_request_tokens}/{self.history.max_tokens} tokens, {self.history.evicted_turns} turns evicted)")
 
         try:
-            # Make API call to g4f using the exact implementation provided
-            async def _make_request():
-                try:
-                    # Use the existing client instance instead of creating a new one each time
-                    # Note: g4f doesn't support parameters like temperature, tokens, etc.
-                    # Only model and messages are passed, and even model might be ignored
-                    response = self.client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=self.history
-                    )
-                    return response
-                except Exception as e:
-                    log.error(f"Error in _make_request: {e}")
-                    raise
-
-            # Create a task for the request
-            request_task = asyncio.create_task(_make_request())
-
-            # Execute with timeout
-            response = await asyncio.wait_for(request_task, timeout=self.timeout)
-
-            # Extract response content
-            response_content = response.choices[0].message.content
+            # The backend never blocks the event loop, and a timeout cancels the request itself
+            if on_delta is None:
+                response_content = await llm_backend.complete(messages, timeout=self.timeout)
+            else:
+                parts = []
+                async for delta in llm_backend.stream(messages, timeout=self.timeout):
+                    parts.append(delta)
+                    await on_delta(''.join(parts))
+                response_content = ''.join(parts)
 
-            # Add assistant response to history
-            self.history.append({"role": "assistant", "content": response_content})
+            if len(response_content.strip()) >= MIN_RESPONSE_LENGTH:
+                self.history.commit(user_prompt, response_content)
 
             log.info(f"GPT generated response: {response_content[:50]}...")
             return response_content
 
         except asyncio.TimeoutError:
-            # Cancel the task if it's still running
-            if request_task and not request_task.done():
-                request_task.cancel()
-                log.warning(f"Cancelled stuck GPT request after {self.timeout} seconds")
-
             log.error(f"Timeout error in GPT query after {self.timeout} seconds")
             return f":x: The AI model took too long to respond. Please try again with a simpler query or try later."
         except Exception as e:
-            # Cancel the task if it's still running
-            if request_task and not request_task.done():
-                request_task.cancel()
-                log.warning("Cancelled GPT request due to error")
-
             log.error(f"Error in GPT query: {e}", exc_info=True)
             return f":x: Error communicating with the AI model: {str(e)}. Please try again later."
 
-    # The close() method is already defined above
-
-async def initialize_gpt_session(instructor_prompt: str) -> GPTInstance:
-    """Initializes a GPT session using g4f."""
-    return GPTInstance(initial_prompt=instructor_prompt)
+async def initialize_gpt_session(instructor_prompt: str, tier: str | None = None) -> GPTInstance:
+    """Initializes a GPT session using g4f, with the context budget of the given tier."""
+    max_context_tokens = config.get_tier_limits(tier)['max_context_length'] if tier else 4096
+    return GPTInstance(initial_prompt=instructor_prompt, max_context_tokens=max_context_tokens, tier=tier)
 
-async def query_gpt(gpt_instance: GPTInstance, prompt: str) -> str | None:
+async def query_gpt(gpt_instance: GPTInstance, prompt: str, context: str | None = None, on_delta=None, on_queued=None,
+                    use_cache: bool = True) -> str | None:
     """Sends a query to an existing GPT session with retry logic.
 
+    Each attempt waits for a slot from the shared admission controller, in the lane
+    of the session's tier; the retry backoff doesn't hold a slot. A request the model
+    has already answered (same system prompt, history and prompt) is served from the
+    response cache and recorded in the history as if it had been sent.
+
     Args:
         gpt_instance: The GPT instance to query
         prompt: The prompt to send to the GPT model
+        context: Optional server context; replaces the context sent with earlier prompts
+        on_delta: Optional coroutine function called with the partial response while streaming
+        on_queued: Optional coroutine function called with the queue position while waiting for a slot
+        use_cache: Serve and store the response through the response cache
 
     Returns:
         The response from the GPT model, or an error message starting with ':x:'
@@ -217,17 +253,32 @@ async def query_gpt(gpt_instance: GPTInstance, prompt: str) -> str | None:
         log.warning("Attempted to query GPT with empty prompt")
         return ":x: Cannot process empty prompt."
 
+    cache_messages = None
+    if use_cache:
+        gpt_instance.history.set_context(context)
+        cache_messages = gpt_instance.history.build(prompt)
+        try:
+            cached = await response_cache.get(cache_messages, llm_backend.model)
+        except Exception as e:
+            log.error(f"Response cache lookup failed: {e}", exc_info=True)
+            cached = None
+        if cached is not None:
+            gpt_instance.history.commit(prompt, cached)
+            log.info(f"Served GPT query from the response cache: {prompt[:50]}...")
+            return cached
+
     max_retries = 2
     retry_count = 0
     backoff_time = 2  # Start with 2 seconds
 
     while retry_count <= max_retries:
         try:
-            # Send the query to the GPT model
-            response = await gpt_instance.query(prompt)
+            # Send the query to the GPT model once a slot is free
+            async with admission.slot(gpt_instance.tier, on_position=on_queued):
+                response = await gpt_instance.query(prompt, context=context, on_delta=on_delta)
 
             # Check if response is empty or too short
-            if not response or len(response.strip()) < 5:
+            if not response or len(response.strip()) < MIN_RESPONSE_LENGTH:
                 log.warning(f"GPT returned very short response: '{response}'")
                 if retry_count < max_retries:
                     retry_count += 1
@@ -238,7 +289,15 @@ async def query_gpt(gpt_instance: GPTInstance, prompt: str) -> str | None:
                 else:
                     return ":x: The AI model returned an unusually short response. Please try again."
 
+            if cache_messages is not None and not response.startswith(":x:"):
+                try:
+                    await response_cache.put(cache_messages, llm_backend.model, response)
+                except Exception as e:
+                    log.error(f"Failed to store GPT response in the response cache: {e}", exc_info=True)
             return response
+        except AdmissionRejected as e:
+            # Shed instead of queueing behind requests that would time out anyway
+            return f":x: Spectre is at capacity right now ({e.queued} requests waiting). Please try again in a minute."
         except asyncio.TimeoutError:
             retry_count += 1
             if retry_count <= max_retries:
@@ -298,143 +357,8 @@ class PromptModal(ui.Modal):
         # --- Get Focused Server Structure Info ---
         server_info = ""
         if interaction.guild:
-            guild = interaction.guild
-            server_info = f"\n\n=== SERVER STRUCTURE ===\n"
-
-            # Basic Server Information
-            server_info += f"Server Name: {guild.name}\n"
-            server_info += f"Total Members: {guild.member_count}\n"
-
-            # Role Hierarchy (focused on position and permissions)
-            server_info += f"\n--- ROLES ---\n"
-            for role in sorted(guild.roles, key=lambda r: r.position, reverse=True):
-                server_info += f"Role: {role.name} (Position: {role.position})\n"
-                # Only include key permissions that affect channel access
-                key_perms = []
-                if role.permissions.administrator:
-                    key_perms.append("administrator")
-                if role.permissions.manage_channels:
-                    key_perms.append("manage_channels")
-                if role.permissions.manage_roles:
-                    key_perms.append("manage_roles")
-                if role.permissions.manage_guild:
-                    key_perms.append("manage_guild")
-                if role.permissions.view_channel:
-                    key_perms.append("view_channel")
-                if role.permissions.send_messages:
-                    key_perms.append("send_messages")
-                if role.permissions.connect:
-                    key_perms.append("connect")
-                if role.permissions.speak:
-                    key_perms.append("speak")
-
-                if key_perms:
-                    server_info += f"  Key Permissions: {', '.join(key_perms)}\n"
-
-            # Channel Structure (focused on hierarchy and permissions)
-            server_info += f"\n--- CHANNEL STRUCTURE ---\n"
-
-            # First list channels without categories
-            no_category_channels = [c for c in guild.channels if not c.category]
-            if no_category_channels:
-                server_info += "Channels without category:\n"
-                for channel in sorted(no_category_channels, key=lambda c: c.position):
-                    server_info += f"Channel: {channel.name} (Type: {channel.type}, Position: {channel.position})\n"
-
-                    # Only include permission overwrites for roles (not individual members)
-                    if hasattr(channel, 'overwrites') and channel.overwrites:
-                        role_overwrites = {target: overwrite for target, overwrite in channel.overwrites.items()
-                                          if hasattr(target, "members")}
-                        if role_overwrites:
-                            server_info += f"  Role Access:\n"
-                            for role, overwrite in role_overwrites.items():
-                                # Focus on view/access permissions
-                                access_info = []
-
-                                # Check for view_channel permission
-                                if any(perm[0] == 'view_channel' and perm[1] for perm in overwrite.allow):
-                                    access_info.append("can view")
-                                elif any(perm[0] == 'view_channel' and perm[1] for perm in overwrite.deny):
-                                    access_info.append("cannot view")
-
-                                # Check for send_messages permission for text channels
-                                if hasattr(channel, 'type') and str(channel.type) == 'text':
-                                    if any(perm[0] == 'send_messages' and perm[1] for perm in overwrite.allow):
-                                        access_info.append("can send messages")
-                                    elif any(perm[0] == 'send_messages' and perm[1] for perm in overwrite.deny):
-                                        access_info.append("cannot send messages")
-
-                                # Check for connect permission for voice channels
-                                if hasattr(channel, 'type') and str(channel.type) == 'voice':
-                                    if any(perm[0] == 'connect' and perm[1] for perm in overwrite.allow):
-                                        access_info.append("can connect")
-                                    elif any(perm[0] == 'connect' and perm[1] for perm in overwrite.deny):
-                                        access_info.append("cannot connect")
-
-                                if access_info:
-                                    server_info += f"    {role.name}: {', '.join(access_info)}\n"
-
-            # Now list categories and their channels
-            categories = {cat: [] for cat in guild.categories}
-
-            # Group channels by category
-            for channel in guild.channels:
-                if channel.category and channel.category in categories:
-                    categories[channel.category].append(channel)
-
-            # Add categorized channels with focused information
-            for category, channels in categories.items():
-                server_info += f"Category: {category.name} (Position: {category.position})\n"
-
-                # Category role access
-                if hasattr(category, 'overwrites') and category.overwrites:
-                    role_overwrites = {target: overwrite for target, overwrite in category.overwrites.items()
-                                      if hasattr(target, "members")}
-                    if role_overwrites:
-                        server_info += f"  Category Role Access:\n"
-                        for role, overwrite in role_overwrites.items():
-                            # Focus on view permission
-                            if any(perm[0] == 'view_channel' and perm[1] for perm in overwrite.allow):
-                                server_info += f"    {role.name}: can view all channels\n"
-                            elif any(perm[0] == 'view_channel' and perm[1] for perm in overwrite.deny):
-                                server_info += f"    {role.name}: cannot view channels\n"
-
-                # Channels in this category
-                for channel in sorted(channels, key=lambda c: c.position):
-                    server_info += f"  Channel: {channel.name} (Type: {channel.type}, Position: {channel.position})\n"
-
-                    # Only include permission overwrites that differ from category
-                    if hasattr(channel, 'overwrites') and channel.overwrites:
-                        role_overwrites = {target: overwrite for target, overwrite in channel.overwrites.items()
-                                          if hasattr(target, "members")}
-                        if role_overwrites:
-                            server_info += f"    Channel-specific Role Access:\n"
-                            for role, overwrite in role_overwrites.items():
-                                # Focus on view/access permissions
-                                access_info = []
-
-                                # Check for view_channel permission
-                                if any(perm[0] == 'view_channel' and perm[1] for perm in overwrite.allow):
-                                    access_info.append("can view")
-                                elif any(perm[0] == 'view_channel' and perm[1] for perm in overwrite.deny):
-                                    access_info.append("cannot view")
-
-                                # Check for send_messages permission for text channels
-                                if hasattr(channel, 'type') and str(channel.type) == 'text':
-                                    if any(perm[0] == 'send_messages' and perm[1] for perm in overwrite.allow):
-                                        access_info.append("can send messages")
-                                    elif any(perm[0] == 'send_messages' and perm[1] for perm in overwrite.deny):
-                                        access_info.append("cannot send messages")
-
-                                # Check for connect permission for voice channels
-                                if hasattr(channel, 'type') and str(channel.type) == 'voice':
-                                    if any(perm[0] == 'connect' and perm[1] for perm in overwrite.allow):
-                                        access_info.append("can connect")
-                                    elif any(perm[0] == 'connect' and perm[1] for perm in overwrite.deny):
-                                        access_info.append("cannot connect")
-
-                                if access_info:
-                                    server_info += f"      {role.name}: {', '.join(access_info)}\n"
+            # Cached per guild and kept current from gateway events
+            server_info = guild_snapshots.get(interaction.guild)
 
             # Current interaction context
             server_info += f"\n--- CURRENT CONTEXT ---\n"
@@ -450,11 +374,30 @@ class PromptModal(ui.Modal):
         # --- Query GPT ---
         # Add server info to prompt if enabled in config
         include_server_info = config.get("spectre.include_server_info", True)  # Default to True now
-        full_prompt = prompt + server_info if include_server_info else prompt
-        gpt_response = await query_gpt(self.session_data['gpt_instance'], full_prompt)
+
+        # Show the queue position, then stream the response, in the session message
+        editor = None
+        if interaction_valid and self.interaction_view.message is not None:
+            editor = ProgressiveEditor(
+                self.interaction_view.message,
+                min_interval=config.get("spectre.stream_edit_interval", 1.2),
+                loading_lines=self.cog_instance.random_loading_lines
+            )
+        stream = editor is not None and config.get("spectre.stream_responses", True)
+
+        gpt_response = await query_gpt(
+            self.session_data['gpt_instance'],
+            prompt,
+            context=server_info if include_server_info and server_info else None,
+            on_delta=editor.update if stream else None,
+            on_queued=editor.queued if editor else None,
+            use_cache=False  # Conversation replies are never reused
+        )
 
         if not gpt_response or gpt_response.startswith(":x:"):
             error_message = gpt_response or ":x: Failed to get response from AI."
+            if editor:
+                await editor.restore()
 
             if interaction_valid:
                 # If the interaction is still valid, use followup
@@ -476,6 +419,8 @@ class PromptModal(ui.Modal):
         replies_left = self.session_data['replies_left']
         tier_limit = TIER_LIMITS[self.session_data['tier']]['replies']
         reply_info = f"Replies left: {replies_left}/{tier_limit}" if tier_limit != -1 else "Replies left: Unlimited"
+        # Checkpoint the new turn and keep the session from going idle
+        session_store.touch(user_id)
 
         # --- Display Response & Buttons ---
         # Edit the original interaction message if possible, or send new one
@@ -501,10 +446,8 @@ class PromptModal(ui.Modal):
                 else:
                     # Edit the existing message
                     await self.interaction_view.message.edit(content=content, view=self.interaction_view)
-                    # Send an empty followup to dismiss the "thinking" state from the modal submission
-                    await interaction.followup.send("Response generated.", ephemeral=True)
-                    await asyncio.sleep(2) # Give user time to read
-                    await interaction.delete_original_response() # Delete the ephemeral confirmation
+                    # Dismiss the "thinking" state from the modal submission
+                    await interaction.delete_original_response()
             else:
                 # If interaction expired, send a new message to the channel
                 message = await channel.send(content=f"{user.mention}\n{content}", view=self.interaction_view)
@@ -543,12 +486,11 @@ class PromptModal(ui.Modal):
 
 
 class MetadataModal(ui.Modal, title="Save File Metadata"):
-    def __init__(self, cog_instance: 'SpectreCog', user_id: int, uid: str, gpt_response: str, tier: str):
+    def __init__(self, cog_instance: 'SpectreCog', user_id: int, uid: str, tier: str):
         super().__init__(timeout=300.0)
         self.cog_instance = cog_instance
         self.user_id = user_id
-        self.uid = uid
-        self.gpt_response = gpt_response # Final GPT response for the file content
+        self.uid = uid # UID of the queued refinement job (and of the save)
         self.tier = tier
 
         self.file_name_input = ui.TextInput(
@@ -569,12 +511,10 @@ class MetadataModal(ui.Modal, title="Save File Metadata"):
         self.add_item(self.description_input)
 
     async def on_submit(self, interaction: discord.Interaction):
-        """Saves metadata and file content."""
+        """Hands the file details to the refinement job; the save is committed once both are in."""
         # Store important information before deferring in case the interaction times out
         file_name = self.file_name_input.value
         description = self.description_input.value
-        user_saves_dir = SAVES_DIR / str(self.user_id)
-        user_saves_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists
 
         # Try to defer the response, but handle the case where the interaction has expired
         try:
@@ -585,93 +525,67 @@ class MetadataModal(ui.Modal, title="Save File Metadata"):
             # Continue with the save process even if the interaction expired
             # We'll handle the response differently at the end
 
-        # --- Refinement Step with forever1.txt ---
-        log.info(f"Starting refinement step for UID {self.uid} (User: {self.user_id})")
-        refinement_gpt_instance = None
-        final_content = self.gpt_response # Start with the already refined content
-        try:
-            forever1_prompt = await read_file_content(FILES_DIR / "forever1.txt")
-            if forever1_prompt and not forever1_prompt.startswith(":"): # Check for read errors
-                # Initialize a *new* GPT instance for this step
-                refinement_gpt_instance = await initialize_gpt_session(forever1_prompt)
-                # Send the content refined by 'forever.txt' to this new instance
-                refined_content_step2 = await query_gpt(refinement_gpt_instance, self.gpt_response)
-
-                if refined_content_step2 and not refined_content_step2.startswith(":x:"):
-                    final_content = refined_content_step2 # Use the doubly refined content
-                    log.info(f"Successfully refined content with forever1.txt for UID {self.uid}")
-                else:
-                     log.warning(f"Failed to get refinement from forever1.txt for UID {self.uid}. Using previous version.")
-            else:
-                 log.warning(f"Could not read or invalid content in forever1.txt. Skipping final refinement.")
-
-        except Exception as e:
-            log.error(f"Error during forever1.txt refinement for UID {self.uid}: {e}", exc_info=True)
-            # Use the content refined by forever.txt as fallback
-        finally:
-            if refinement_gpt_instance:
-                 # Ensure cleanup of the temporary GPT instance
-                 await refinement_gpt_instance.close()
-
-        # --- Save Final Content ---
-        file_path = user_saves_dir / f"{self.uid}.txt"
-        try:
-            # Define a regular (non-async) function to write the file in a thread
-            def write_file():
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(final_content)
-
-            # Execute file writing in a thread to avoid blocking
-            await asyncio.to_thread(write_file)
-            log.info(f"Saved final content to {file_path}")
-        except Exception as e:
-            log.error(f"Failed to save final content to {file_path}: {e}", exc_info=True)
-            await interaction.followup.send(f":x: Critical error saving file content for `{file_name}`.", ephemeral=True)
-            # Don't proceed with metadata if file save failed
-            await self.cog_instance.cleanup_session(self.user_id)
-            return
+        # The session must stay in memory (not be suspended or evicted) until the save is accounted for
+        with session_store.pinned(self.user_id):
+            await self.commit_save(interaction, file_name, description)
 
-        # --- Save Metadata ---
-        metadata_path = user_saves_dir / f"{self.uid}.json"
+    async def commit_save(self, interaction: discord.Interaction, file_name: str, description: str):
+        """Attaches the file details, charges the save and waits for the refinement job to commit it."""
+        # --- Attach Metadata ---
+        # The refinement (forever.txt, then forever1.txt) has been running since the Forever click
         metadata = {
             "file_name": file_name,
             "description": description,
-            "saves": 0, # Start count at 0 as clarified
-            "tier_used": self.tier,
             "date_created": time.time(), # Store as Unix timestamp
-            "uid": self.uid # Include UID for easier reference
         }
         try:
-            # Define a regular (non-async) function to write the metadata file in a thread
-            def write_metadata():
-                with open(metadata_path, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, indent=4)
-
-            # Execute metadata writing in a thread to avoid blocking
-            await asyncio.to_thread(write_metadata)
-            log.info(f"Saved metadata to {metadata_path}")
+            await refine_jobs.attach_metadata(self.uid, metadata)
         except Exception as e:
-            log.error(f"Failed to save metadata to {metadata_path}: {e}", exc_info=True)
-            await interaction.followup.send(f":x: Error saving metadata for `{file_name}`, but content was saved.", ephemeral=True)
-            # Content saved, but metadata failed. Still cleanup.
+            log.error(f"Failed to attach metadata to refinement job {self.uid}: {e}", exc_info=True)
+            await interaction.followup.send(f":x: Error saving metadata for `{file_name}`.", ephemeral=True)
             await self.cog_instance.cleanup_session(self.user_id)
             return
 
-        # --- Decrement Save Count & Finalize ---
-        # Decrement save count in the main session data
-        if TIER_LIMITS[self.tier]['saves'] != -1:
-            self.cog_instance.active_sessions[self.user_id]['saves_left'] -= 1
+        # --- Decrement Save Count ---
+        # Charged before the wait; a session suspended while the modal was open is ended below all the same
+        session = self.cog_instance.active_sessions.get(self.user_id)
+        charged = TIER_LIMITS[self.tier]['saves'] != -1 and session is not None
+        if charged:
+            session['saves_left'] -= 1
+
+        # --- Wait for the Commit ---
+        status = await refine_jobs.wait(self.uid, timeout=config.get("spectre.refine_wait_seconds", 120))
+        if status == "failed":
+            if charged:
+                session['saves_left'] += 1  # Nothing was saved
+            await interaction.followup.send(f":x: Critical error saving file content for `{file_name}`.", ephemeral=True)
+            await self.cog_instance.cleanup_session(self.user_id)
+            return
 
-        await interaction.followup.send(
-            f":white_check_mark: Successfully saved '{file_name}' (`{self.uid}`).\n"
-            f"You can access it later using `/vault` or `/commit`.",
-            ephemeral=True
-        )
-        log.info(f"User {self.user_id} permanently saved file {self.uid} ('{file_name}') using tier {self.tier}")
+        if status == "committed":
+            await interaction.followup.send(
+                f":white_check_mark: Successfully saved '{file_name}' (`{self.uid}`).\n"
+                f"You can access it later using `/vault` or `/commit`.",
+                ephemeral=True
+            )
+            log.info(f"User {self.user_id} permanently saved file {self.uid} ('{file_name}') using tier {self.tier}")
+        else:
+            # Still refining; the job commits the save on its own when it finishes
+            await interaction.followup.send(
+                f":hourglass: '{file_name}' (`{self.uid}`) is still being processed. "
+                f"It will appear in `/vault` and `/commit` as soon as it is ready.",
+                ephemeral=True
+            )
+            log.info(f"User {self.user_id} submitted details for {self.uid} ('{file_name}'); refinement still {status}")
 
         # Apply cooldown and cleanup session
-        await self.cog_instance.apply_cooldown(interaction)
-        await self.cog_instance.cleanup_session(self.user_id, interaction) # Pass interaction to edit original message
+        if self.user_id in self.cog_instance.active_sessions:
+            await self.cog_instance.apply_cooldown(interaction)
+            await self.cog_instance.cleanup_session(self.user_id, interaction) # Pass interaction to edit original message
+        else:
+            # Suspended before the details came in: the save still ends it, so it can't be resumed
+            rate_limiter.record(self.user_id, self.tier)
+            await session_store.discard(self.user_id)
 
     async def on_error(self, interaction: discord.Interaction, error: Exception):
         log.error(f"Error in MetadataModal for user {interaction.user.id}: {error}", exc_info=True)
@@ -761,24 +675,17 @@ class SubmitChoiceView(ui.View):
         except Exception as e:
              log.error(f"Error during temp.txt refinement for user {user_id}: {e}", exc_info=True)
 
-        # --- Save to temp file ---
-        temp_file_path = TEMP_DIR / f"{user_id}.txt"
+        # --- Save temporary output ---
         try:
-            TEMP_DIR.mkdir(exist_ok=True) # Ensure temp dir exists
-            # Define a regular (non-async) function to write the file in a thread
-            def write_temp_file():
-                with open(temp_file_path, 'w', encoding='utf-8') as f:
-                    f.write(final_content)
-
-            # Execute file writing in a thread to avoid blocking
-            await asyncio.to_thread(write_temp_file)
-            log.info(f"Saved temporary file for user {user_id} to {temp_file_path}")
+            # Replaces the user's previous temporary output; expires after vault.temp_ttl_hours
+            blob_key = await content_store.write_temp(user_id, final_content)
+            log.info(f"Saved temporary output for user {user_id} as blob {blob_key}")
             await interaction.followup.send(
                 f":white_check_mark: Saved output temporarily. You can execute it using `/commit` (select Temporary File).",
                 ephemeral=True
             ) #
         except Exception as e:
-            log.error(f"Failed to save temporary file {temp_file_path}: {e}", exc_info=True)
+            log.error(f"Failed to save temporary output for user {user_id}: {e}", exc_info=True)
             await interaction.followup.send(":x: Failed to save temporary file.", ephemeral=True)
 
         # --- Finalize ---
@@ -824,49 +731,30 @@ class SubmitChoiceView(ui.View):
             await self.cog_instance.cleanup_session(user_id)
             return
 
-        # --- Refine with forever.txt ---
-        refined_content = last_reply # Start with the last AI reply
-        try:
-            forever_prompt = await read_file_content(FILES_DIR / "forever.txt")
-            if forever_prompt and not forever_prompt.startswith(":"):
-                refined_content_step1 = await query_gpt(gpt_instance, forever_prompt)
-                if refined_content_step1 and not refined_content_step1.startswith(":x:"):
-                    refined_content = refined_content_step1
-                    log.info(f"Refined permanent content for user {user_id} using forever.txt")
-                else:
-                    log.warning(f"Failed to refine permanent content for user {user_id}. Using last reply.")
-            else:
-                 log.warning(f"Could not read or invalid content in forever.txt for user {user_id}.")
-
-        except Exception as e:
-             log.error(f"Error during forever.txt refinement for user {user_id}: {e}", exc_info=True)
-
-
-        # --- Save Initial Content & Get Metadata ---
-        # We need to save the *first* refined content temporarily before the second refinement
-        # The second refinement happens *after* metadata modal submission
-
+        # --- Queue refinement (forever.txt, then forever1.txt) ---
+        # Runs in the background while the user fills in the file details
         uid = str(uuid.uuid4())
-        user_saves_dir = SAVES_DIR / str(user_id)
-        user_saves_dir.mkdir(parents=True, exist_ok=True)
-        initial_save_path = user_saves_dir / f"{uid}.txt"
+        forever_request = None
+        forever_prompt = await read_file_content(FILES_DIR / "forever.txt")
+        if forever_prompt and not forever_prompt.startswith(":"):
+            forever_request = gpt_instance.history.build(forever_prompt)
+        else:
+            log.warning(f"Could not read or invalid content in forever.txt for user {user_id}.")
 
         try:
-             # Define a regular (non-async) function to write the file in a thread
-             def write_file():
-                 with open(initial_save_path, 'w', encoding='utf-8') as f:
-                     f.write(refined_content)
-
-             # Execute file writing in a thread to avoid blocking
-             await asyncio.to_thread(write_file)
-             log.info(f"Saved initial permanent content for UID {uid} to {initial_save_path}")
+            await refine_jobs.submit(uid, user_id, tier, last_reply, forever_request)
+        except Exception as e:
+            log.error(f"Failed to queue refinement for user {user_id}, UID {uid}: {e}", exc_info=True)
+            await interaction.followup.send(":x: Failed to start the permanent save. Please try again.", ephemeral=True)
+            return
 
+        try:
              # Create a new interaction for the modal since we already deferred this one
              # We need to inform the user about what's happening
              await interaction.followup.send("Preparing permanent save. Please provide file details in the popup window.", ephemeral=True)
 
              # Create the metadata modal
-             modal = MetadataModal(self.cog_instance, user_id, uid, refined_content, tier)
+             modal = MetadataModal(self.cog_instance, user_id, uid, tier)
 
              # We can't use send_modal on a deferred interaction, so we'll create a new button for the user to click
              # that will open the modal
@@ -946,6 +834,7 @@ class InteractionView(ui.View):
              return
 
         log.info(f"User {user_id} chose Whisper. Replies left: {replies_left}")
+        session_store.touch(user_id)
         # Open the prompt modal again for follow-up
         modal = PromptModal(title="Whisper to the Void", session_data=self.session_data, interaction_view=self)
         await interaction.response.send_modal(modal)
@@ -1018,8 +907,8 @@ class InteractionView(ui.View):
         user_id = self.session_data.get('user_id', 'Unknown') # Get user ID if stored
         log.warning(f"InteractionView timed out for user {user_id}, message {self.message.id if self.message else 'Unknown'}")
         await self.disable_all_buttons()
-        # Auto-cleanup session on timeout? Yes.
-        await self.cog_instance.cleanup_session(user_id)
+        # Keep the conversation resumable with /spectre instead of ending it
+        await self.cog_instance.suspend_session(user_id)
 
 
 class EmbraceView(ui.View):
@@ -1146,17 +1035,11 @@ class TierSelectView(ui.View):
 class SpectreCog(commands.Cog, name="Spectre"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.active_sessions = {} # user_id: {gpt_instance, tier, replies_left, saves_left, last_gpt_reply, interaction_message}
+        # user_id: {gpt_instance, tier, replies_left, saves_left, last_gpt_reply, interaction_message}, checkpointed to SQLite
+        self.active_sessions = session_store
+        session_store.on_evict = self.on_session_evicted
         self.maintenance_mode = False
         self.random_loading_lines = load_random_lines()
-        # Track Drifter tier usage for custom cooldown
-        self.drifter_usage = {}
-        # Track sent messages for auto-deletion after 5000 seconds
-        self.sent_messages = [] # List of (message, timestamp) tuples
-        # Start the message cleanup task
-        self.message_cleanup_task = asyncio.create_task(self.cleanup_old_messages())
-        # Cooldown mapping: 1 use per X seconds per user
-        self.cooldown_mapping = commands.CooldownMapping.from_cooldown(1, 10, commands.BucketType.user) # Default 10s, override per tier
 
         log.info("Spectre Cog initialized.")
         log.info(f"Loaded {len(self.random_loading_lines)} random loading lines.")
@@ -1210,66 +1093,21 @@ class SpectreCog(commands.Cog, name="Spectre"):
                 except Exception as e:
                     log.error(f"Error terminating session for user {user_id}: {e}")
 
-    # Store usage timestamps for Drifter tier cooldown tracking
-    drifter_usage = {} # user_id: [timestamp1, timestamp2, ...]
+        # Suspended sessions can't be resumed either
+        try:
+            removed = await session_store.clear()
+            log.info(f"Removed {removed} checkpointed Spectre session(s) due to maintenance timeout")
+        except Exception as e:
+            log.error(f"Error removing checkpointed Spectre sessions: {e}")
 
     async def apply_cooldown(self, interaction: discord.Interaction):
-        """Applies the appropriate cooldown based on the user's session tier."""
+        """Records a finished session against the user's tier limits (cooldown_uses per cooldown_window)."""
         user_id = interaction.user.id
         if user_id in self.active_sessions:
             tier = self.active_sessions[user_id]['tier']
-
-            # Special handling for Drifter tier (10-minute cooldown after 3 uses in 5 minutes)
-            if tier == "Drifter":
-                current_time = time.time()
-
-                # Initialize user's usage tracking if not exists
-                if user_id not in self.drifter_usage:
-                    self.drifter_usage[user_id] = []
-
-                # Add current usage timestamp
-                self.drifter_usage[user_id].append(current_time)
-
-                # Keep only timestamps from the last 5 minutes
-                five_minutes_ago = current_time - 300  # 300 seconds = 5 minutes
-                self.drifter_usage[user_id] = [ts for ts in self.drifter_usage[user_id] if ts > five_minutes_ago]
-
-                # Check if this is the 3rd or more usage in 5 minutes
-                if len(self.drifter_usage[user_id]) >= 3:
-                    # Apply 10-minute cooldown
-                    cooldown_duration = TIER_LIMITS[tier]['cooldown']
-                    # Create a custom message-like object for cooldown tracking
-                    class DummyMessage:
-                        def __init__(self, author):
-                            self.author = author
-
-                    # Create a dummy message with the user as author
-                    dummy_message = DummyMessage(interaction.user)
-
-                    try:
-                        bucket = self.cooldown_mapping.get_bucket(dummy_message)
-                        bucket.update_rate_limit()
-                        log.info(f"Applied {cooldown_duration}s cooldown for Drifter user {user_id} (3+ uses in 5 minutes)")
-                    except Exception as e:
-                        log.error(f"Error applying cooldown for user {user_id}: {e}", exc_info=True)
-
-            # Standard cooldown for other tiers
-            elif TIER_LIMITS[tier]['cooldown'] > 0:
-                cooldown_duration = TIER_LIMITS[tier]['cooldown']
-                # Create a custom message-like object for cooldown tracking
-                class DummyMessage:
-                    def __init__(self, author):
-                        self.author = author
-
-                # Create a dummy message with the user as author
-                dummy_message = DummyMessage(interaction.user)
-
-                try:
-                    bucket = self.cooldown_mapping.get_bucket(dummy_message)
-                    bucket.update_rate_limit()
-                    log.info(f"Applied {cooldown_duration}s cooldown for user {user_id} (Tier: {tier})")
-                except Exception as e:
-                    log.error(f"Error applying cooldown for user {user_id}: {e}", exc_info=True)
+            cooldown_duration = rate_limiter.record(user_id, tier)
+            if cooldown_duration:
+                log.info(f"Applied {cooldown_duration:.0f}s cooldown for user {user_id} (Tier: {tier})")
 
     async def cleanup_session(self, user_id: int, interaction: discord.Interaction | None = None, retreated: bool = False):
          """Cleans up a user's active session data and optionally edits the interaction message."""
@@ -1307,6 +1145,90 @@ class SpectreCog(commands.Cog, name="Spectre"):
          else:
             log.warning(f"Attempted to cleanup session for user {user_id}, but no active session found.")
 
+    async def suspend_session(self, user_id: int):
+        """Checkpoints an idle session and drops it from memory; `/spectre` resumes it."""
+        try:
+            session = await session_store.suspend(user_id)
+        except Exception as e:
+            log.error(f"Error suspending session for user {user_id}, ending it instead: {e}", exc_info=True)
+            await self.cleanup_session(user_id)
+            return
+        if session:
+            log.info(f"Suspended idle session for user {user_id}")
+            await self.on_session_evicted(user_id, session)
+
+    async def on_session_evicted(self, user_id: int, session: dict):
+        """Tells the user an idle session left memory and how to resume it."""
+        message = session.get('interaction_message')
+        if not message:
+            return
+        try:
+            last_reply = session.get('last_gpt_reply')
+            idle_note = "*Session idle. Use `/spectre` to resume it.*"
+            content = f"**AI Response:**\n{truncate_code_block(last_reply, 1800)}\n\n{idle_note}" if last_reply else idle_note
+            await message.edit(content=truncate_message(content, 1900), view=None)
+        except discord.NotFound:
+            log.info(f"Message of suspended session for user {user_id} no longer exists")
+        except Exception as e:
+            log.error(f"Error editing message of suspended session for user {user_id}: {e}")
+
+    async def resume_session(self, interaction: discord.Interaction, user_id: int, record: dict):
+        """Rebuilds a checkpointed session and shows it again where the user left off."""
+        tier = record.get('tier')
+        if tier not in TIER_LIMITS:
+            log.warning(f"Discarding checkpointed session of user {user_id} with unknown tier {tier}")
+            await session_store.discard(user_id)
+            await interaction.response.send_message(":warning: Your previous session could not be resumed. Please run `/spectre` again.", ephemeral=True)
+            return
+
+        gpt_instructor_prompt = await read_file_content(FILES_DIR / "gpt_instructor.txt")
+        if not gpt_instructor_prompt or gpt_instructor_prompt.startswith(":"):
+            await interaction.response.send_message(gpt_instructor_prompt or ":x: Failed to load AI configuration.", ephemeral=True)
+            return
+        gpt_instance = await initialize_gpt_session(gpt_instructor_prompt, tier)
+        gpt_instance.history = session_store.restore_history(record, gpt_instructor_prompt)
+
+        session = {
+            "user_id": user_id,
+            "gpt_instance": gpt_instance,
+            "tier": tier,
+            "replies_left": record.get('replies_left', TIER_LIMITS[tier]['replies']),
+            "saves_left": record.get('saves_left', TIER_LIMITS[tier]['saves']),
+            "last_gpt_reply": record.get('last_gpt_reply'),
+            "interaction_message": None
+        }
+        self.active_sessions[user_id] = session
+        log.info(f"Resumed session for user {user_id} (Tier: {tier}, {len(gpt_instance.history.turns)} turns). Replies: {session['replies_left']}, Saves: {session['saves_left']}")
+
+        # The buttons of the old message died with the session
+        channel = self.bot.get_channel(record['channel_id']) if record.get('channel_id') else None
+        if channel is not None and record.get('message_id'):
+            try:
+                await channel.get_partial_message(record['message_id']).edit(view=None)
+            except Exception as e:
+                log.debug(f"Could not clear the old session message for user {user_id}: {e}")
+
+        last_reply = session['last_gpt_reply']
+        if last_reply:
+            tier_limit = TIER_LIMITS[tier]['replies']
+            reply_info = f"Replies left: {session['replies_left']}/{tier_limit}" if tier_limit != -1 else "Replies left: Unlimited"
+            view = InteractionView(self, session)
+            content = truncate_message(f"**AI Response:**\n{truncate_code_block(last_reply, 1800)}\n\n{reply_info}\n*Session resumed.*", 1900)
+        else:
+            # Suspended before the first prompt
+            view = EmbraceView(self, session)
+            content = f"*Session resumed ({tier} Tier).*"
+
+        try:
+            await interaction.response.send_message(content, view=view)
+            message = await interaction.original_response()
+            view.message = message
+            session['interaction_message'] = message
+            self.track_message(message)
+        except Exception as e:
+            log.error(f"Error presenting resumed session for user {user_id}: {e}", exc_info=True)
+            await self.cleanup_session(user_id)
+
 
     async def initialize_user_session(self, interaction: discord.Interaction, user_id: int, tier: str):
         """Reads instructions, initializes GPT, and presents the Embrace button."""
@@ -1324,7 +1246,7 @@ class SpectreCog(commands.Cog, name="Spectre"):
             await self.cleanup_session(user_id)
             return
 
-        gpt_instance = await initialize_gpt_session(gpt_instructor_prompt)
+        gpt_instance = await initialize_gpt_session(gpt_instructor_prompt, tier)
         if not gpt_instance: # Handle potential init failure
              await interaction.followup.send(":x: Failed to initialize AI session. Please try again later.", ephemeral=True)
              await self.cleanup_session(user_id)
@@ -1364,38 +1286,6 @@ class SpectreCog(commands.Cog, name="Spectre"):
 
 
     # --- Commands ---
-    # Custom cooldown function for the spectre command
-    def get_spectre_cooldown(self, interaction):
-        # Custom cooldown check for Drifter tier (3 uses in 5 minutes, then 10 min cooldown)
-        user_id = interaction.user.id
-
-        # Get user's tier - default to Drifter if not in active sessions
-        tier = self.active_sessions.get(user_id, {}).get('tier', 'Drifter')
-
-        if tier == "Drifter":
-            # Check if user has usage history
-            if hasattr(self, 'drifter_usage') and user_id in self.drifter_usage:
-                current_time = time.time()
-                five_minutes_ago = current_time - 300  # 5 minutes
-
-                # Filter to only include uses in the last 5 minutes
-                recent_uses = [ts for ts in self.drifter_usage[user_id] if ts > five_minutes_ago]
-
-                # If 3+ uses in last 5 minutes, apply 10-minute cooldown
-                if len(recent_uses) >= 3:
-                    oldest_use = min(recent_uses)
-                    ten_minutes = 600  # 10 minutes in seconds
-                    cooldown_end = oldest_use + ten_minutes
-
-                    # If cooldown period hasn't expired
-                    if current_time < cooldown_end:
-                        retry_after = cooldown_end - current_time
-                        return commands.Cooldown(1, retry_after)
-
-        # For other tiers, use standard cooldown
-        cooldown_seconds = TIER_LIMITS.get(tier, TIER_LIMITS['Drifter'])['cooldown']
-        return commands.Cooldown(1, cooldown_seconds)
-
     @app_commands.command(name="spectre", description="Initiate a session with the AI.")
     @app_commands.checks.cooldown(1, 10, key=lambda i: i.user.id)
     async def spectre(self, interaction: discord.Interaction):
@@ -1409,34 +1299,21 @@ class SpectreCog(commands.Cog, name="Spectre"):
              await interaction.response.send_message(":warning: You already have an active Spectre session. Please finish or `/spectre retreat` that one first.", ephemeral=True)
              return
 
-        # Check cooldown based on *potential* tier (assume lowest for initial check or track last used tier?)
-        # For simplicity, we apply cooldown *after* a session ends (Retreat/Submit).
-        # Check initial cooldown using the default mapping
-        # Create a custom message-like object for cooldown tracking
-        class DummyMessage:
-            def __init__(self, author):
-                self.author = author
-
-        # Create a dummy message with the user as author
-        dummy_message = DummyMessage(interaction.user)
+        # Pick up a session that was suspended, evicted or interrupted by a restart
+        record = await session_store.restore(user_id)
+        if record:
+            log.info(f"'/spectre' resuming checkpointed session of user {user_id}")
+            await self.resume_session(interaction, user_id, record)
+            return
 
-        try:
-            bucket = self.cooldown_mapping.get_bucket(dummy_message)
-            retry_after = bucket.update_rate_limit()
-        except Exception as e:
-            log.error(f"Error checking cooldown for user {interaction.user.id}: {e}", exc_info=True)
-            # Default to no cooldown if there's an error
-            retry_after = 0
+        # Cooldowns start when a session ends (Submit/Retreat), using that session's tier limits
+        retry_after = rate_limiter.retry_after(user_id)
         if retry_after:
              await interaction.response.send_message(f":hourglass: You are on cooldown. Please wait {retry_after:.2f} seconds.", ephemeral=True)
              return
 
         log.info(f"'/spectre' command invoked by user {user_id}")
 
-        # Track usage for Drifter tier cooldown
-        if user_id not in self.drifter_usage:
-            self.drifter_usage[user_id] = []
-        self.drifter_usage[user_id].append(time.time())
         # Read spectre.txt
         spectre_intro = await read_file_content(FILES_DIR / "spectre.txt")
         if not spectre_intro or spectre_intro.startswith(":"):
@@ -1450,6 +1327,8 @@ class SpectreCog(commands.Cog, name="Spectre"):
         view.message = message # Link the view to the message it's attached to
         # Track message for auto-deletion
         self.track_message(message)
+        # Build the server structure snapshot while the user picks a tier
+        guild_snapshots.prefetch(interaction.guild)
 
     @commands.command(name="spectreretreat") # Prefix command as fallback/alternative
     @commands.cooldown(1, 5, commands.BucketType.user)
@@ -1462,6 +1341,10 @@ class SpectreCog(commands.Cog, name="Spectre"):
              # Track message for auto-deletion
              self.track_message(message)
              log.info(f"User {user_id} ended session via prefix retreat command.")
+        elif await session_store.discard(user_id):
+             message = await ctx.send("Suspended session ended via retreat command.")
+             self.track_message(message)
+             log.info(f"User {user_id} ended suspended session via prefix retreat command.")
         else:
             message = await ctx.send("You don't have an active Spectre session.")
             # Track message for auto-deletion
@@ -1492,67 +1375,91 @@ class SpectreCog(commands.Cog, name="Spectre"):
 
         log.info(f"Spectre maintenance mode set to {status} by {ctx.author}")
 
+    @commands.is_owner()
+    @commands.command(name="llmcache")
+    async def llm_cache(self, ctx: commands.Context, action: str = None):
+        """Shows the model response cache, admission and session stats, or clears the cache with `clear` (Owner Only)."""
+        if action == "clear":
+            removed = await response_cache.clear()
+            message = await ctx.send(f":wastebasket: Cleared **{removed}** cached response(s).")
+            self.track_message(message)
+            log.info(f"Response cache cleared by {ctx.author}")
+            return
+
+        cache = await response_cache.stats()
+        load = admission.stats()
+        sessions = await session_store.stats()
+        message = await ctx.send(
+            f"**Response cache:** {cache['entries']} entries | hit rate {cache['hit_rate']:.0%} "
+            f"({cache['hits']} hits / {cache['misses']} misses) | {cache['stores']} stored, {cache['evictions']} evicted\n"
+            f"**Admission:** {load['active']} running, {load['queued']} queued | {load['admitted']} admitted, "
+            f"{load['rejected']} shed | avg wait {load['avg_wait']:.1f}s, max {load['max_wait']:.1f}s\n"
+            f"**Sessions:** {sessions['live']} live ({sessions['bytes'] / 1024:.1f} KiB), {sessions['dormant']} suspended | "
+            f"{sessions['checkpoints']} checkpoints, {sessions['evictions']} evicted, {sessions['restores']} resumed"
+        )
+        self.track_message(message)
+
+    @commands.is_owner()
+    @commands.command(name="assetcache")
+    async def asset_cache_stats(self, ctx: commands.Context, action: str = None):
+        """Shows the prompt and text file cache stats, or empties it with `clear` (Owner Only)."""
+        if action == "clear":
+            removed = asset_cache.stats()['entries']
+            asset_cache.invalidate()
+            message = await ctx.send(f":wastebasket: Dropped **{removed}** cached file(s); they are read from disk on next use.")
+            self.track_message(message)
+            log.info(f"Asset cache cleared by {ctx.author}")
+            return
+
+        assets = asset_cache.stats()
+        message = await ctx.send(
+            f"**Assets:** {assets['entries']} files ({assets['bytes'] / 1024:.1f} KiB) | "
+            f"{assets['hits']} hits / {assets['misses']} misses | {assets['reloads']} reloaded"
+        )
+        self.track_message(message)
+
     async def cog_load(self):
         """Called when the cog is loaded."""
         log.info(f"SpectreCog loaded")
 
-    async def cleanup_old_messages(self):
-        """Task that periodically checks for and deletes old messages."""
-        while True:
-            try:
-                current_time = time.time()
-                # Create a new list with messages that are still valid (not old enough to delete)
-                still_valid = []
-
-                for message, timestamp in self.sent_messages:
-                    # Check if message is older than 5000 seconds
-                    if current_time - timestamp > 5000:
-                        try:
-                            # Try to delete the message
-                            await message.delete()
-                            log.info(f"Auto-deleted message {message.id} after 5000 seconds")
-                        except discord.NotFound:
-                            # Message already deleted, just skip
-                            log.debug(f"Message {message.id} already deleted")
-                        except discord.Forbidden:
-                            # Bot doesn't have permission to delete
-                            log.warning(f"No permission to delete message {message.id}")
-                        except Exception as e:
-                            log.error(f"Error deleting message {message.id}: {e}")
-                    else:
-                        # Message not old enough yet, keep it in the list
-                        still_valid.append((message, timestamp))
-
-                # Update the list with only valid messages
-                self.sent_messages = still_valid
-
-                # Sleep for a minute before checking again
-                await asyncio.sleep(60)
-            except asyncio.CancelledError:
-                # Task was cancelled, exit cleanly
-                log.info("Message cleanup task cancelled")
-                break
-            except Exception as e:
-                log.error(f"Error in message cleanup task: {e}", exc_info=True)
-                # Sleep a bit before retrying
-                await asyncio.sleep(60)
-
     # Helper method to track messages for auto-deletion
     def track_message(self, message):
-        """Add a message to the tracking list for auto-deletion."""
-        if message and hasattr(message, 'id'):
-            self.sent_messages.append((message, time.time()))
-            log.debug(f"Tracking message {message.id} for auto-deletion")
+        """Schedule a message for auto-deletion by the bot-wide scheduler."""
+        message_scheduler.schedule(message)
+
+    # --- Guild structure snapshot upkeep ---
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        guild_snapshots.patch_role(role)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        guild_snapshots.patch_role(after, refresh_overwrites=before.name != after.name)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        guild_snapshots.remove_role(role)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        guild_snapshots.patch_channel(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        # Also covers permission overwrite changes, which arrive as channel updates
+        guild_snapshots.patch_channel(after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        guild_snapshots.remove_channel(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        guild_snapshots.drop(guild.id)
 
     async def cog_unload(self):
         """Called when the cog is unloaded."""
-        # Cancel the message cleanup task
-        if hasattr(self, 'message_cleanup_task') and self.message_cleanup_task:
-            self.message_cleanup_task.cancel()
-            try:
-                await self.message_cleanup_task
-            except asyncio.CancelledError:
-                pass
         log.info(f"SpectreCog unloaded")
 
 
@@ -11,6 +11,8 @@ import logging
 import json
 from typing import List, Dict, Any, Optional, Union
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.CategoryManager')
 
 async def execute(interaction, bot, args):
@@ -223,8 +225,8 @@ async def move_category(interaction, category, position, reason):
         # Get the old position
         old_position = category.position
 
-        # Move the category
-        await category.edit(position=position, reason=reason)
+        # Move the category with one bulk position update
+        await position_engine.move_channel(category, position, reason=reason)
 
         await interaction.followup.send(f":white_check_mark: Category `{category.name}` moved from position {old_position} to {position}.", ephemeral=True)
         return True
@@ -234,6 +236,9 @@ async def move_category(interaction, category, position, reason):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to move category: {e}", ephemeral=True)
         return False
+    except ValueError as e:
+        await interaction.followup.send(f":warning: {e}", ephemeral=True)
+        return False
 
 async def list_categories(interaction):
     """Lists all categories in the server."""
@@ -341,3 +346,27 @@ async def category_info(interaction, category):
 
     await interaction.followup.send(embed=embed, ephemeral=True)
     return True
+
+
+def position_target(args):
+    """Returns the kind of objects this command moves, or None if it doesn't only move things."""
+    if args.get('operation', '').lower() == 'move' and args.get('position'):
+        return 'channels'
+    return None
+
+def plan_positions(layout, args):
+    """Applies a category move to a position layout. Raises ValueError if it can't be applied."""
+    guild = layout.guild
+    category_name_or_id = args.get('category', '')
+    position_str = args.get('position', '')
+
+    if category_name_or_id.isdigit():
+        category = guild.get_channel(int(category_name_or_id))
+    else:
+        category = discord.utils.get(guild.categories, name=category_name_or_id)
+    if not isinstance(category, discord.CategoryChannel):
+        raise ValueError(f"Category not found: {category_name_or_id}")
+    if not position_str.lstrip('-').isdigit():
+        raise ValueError(f"Invalid position: {position_str}. Must be a number.")
+
+    layout.move_channel(category, int(position_str))
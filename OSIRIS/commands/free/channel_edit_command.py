@@ -8,6 +8,8 @@ This module provides functionality to edit a channel's properties.
 import discord
 import logging
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.ChannelEdit')
 
 async def execute(interaction, bot, args):
@@ -96,15 +98,16 @@ async def execute(interaction, bot, args):
             edit_params['name'] = new_name
         if topic != '':  # Allow empty topic to clear it
             edit_params['topic'] = topic
-        if position is not None:
-            edit_params['position'] = position
         if slowmode is not None:
             edit_params['slowmode_delay'] = slowmode
-        if reason:
-            edit_params['reason'] = reason
 
         # Edit the channel
-        await target_channel.edit(**edit_params)
+        if edit_params:
+            await target_channel.edit(**edit_params, reason=reason)
+
+        # Move it with one bulk position update
+        if position is not None:
+            await position_engine.move_channel(target_channel, position, reason=reason)
 
         # Prepare a message about what was changed
         changes = []
@@ -126,3 +129,48 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to edit channel: {e}", ephemeral=True)
         return False
+    except ValueError as e:
+        await interaction.followup.send(f":warning: {e}", ephemeral=True)
+        return False
+
+
+EDIT_TARGET = 'channel'
+
+def edit_fields(args):
+    """Returns the channel.edit() fields of this command, or None if it must run on its own."""
+    if args.get('position'):
+        return None  # Position changes move other objects too
+    fields = {}
+    if args.get('name'):
+        fields['name'] = args['name']
+    if args.get('topic', '') != '':
+        fields['topic'] = args['topic']
+    if args.get('slowmode'):
+        if not args['slowmode'].isdigit() or int(args['slowmode']) > 21600:
+            return None
+        fields['slowmode_delay'] = int(args['slowmode'])
+    return fields or None
+
+
+def position_target(args):
+    """Returns the kind of objects this command moves, or None if it doesn't only move things."""
+    if not args.get('position') or args.get('name') or args.get('topic', '') != '' or args.get('slowmode'):
+        return None
+    return 'channels'
+
+def plan_positions(layout, args):
+    """Applies a channel move to a position layout. Raises ValueError if it can't be applied."""
+    guild = layout.guild
+    channel_name_or_id = args.get('channel', '')
+    position_str = args.get('position', '')
+
+    if channel_name_or_id.isdigit():
+        target_channel = guild.get_channel(int(channel_name_or_id))
+    else:
+        target_channel = discord.utils.get(guild.channels, name=channel_name_or_id)
+    if not target_channel:
+        raise ValueError(f"Channel '{channel_name_or_id}' not found")
+    if not position_str.lstrip('-').isdigit():
+        raise ValueError(f"Invalid position: {position_str}. Must be a number.")
+
+    layout.move_channel(target_channel, int(position_str))
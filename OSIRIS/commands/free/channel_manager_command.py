@@ -12,6 +12,8 @@ import logging
 import asyncio
 from typing import List, Optional, Union, Dict, Any
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.ChannelManager')
 
 async def execute(interaction, bot, args):
@@ -231,15 +233,16 @@ async def edit_channel(interaction, channel, name, topic, position, slowmode, re
             edit_params['name'] = name
         if topic != '':  # Allow empty topic to clear it
             edit_params['topic'] = topic
-        if position is not None:
-            edit_params['position'] = position
         if slowmode is not None:
             edit_params['slowmode_delay'] = slowmode
-        if reason:
-            edit_params['reason'] = reason
 
         # Edit the channel
-        await channel.edit(**edit_params)
+        if edit_params:
+            await channel.edit(**edit_params, reason=reason)
+
+        # Move it with one bulk position update
+        if position is not None:
+            await position_engine.move_channel(channel, position, reason=reason)
 
         # Prepare a message about what was changed
         changes = []
@@ -261,6 +264,9 @@ async def edit_channel(interaction, channel, name, topic, position, slowmode, re
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to edit channel: {e}", ephemeral=True)
         return False
+    except ValueError as e:
+        await interaction.followup.send(f":warning: {e}", ephemeral=True)
+        return False
 
 async def move_channel(interaction, channel, category, position, reason):
     """Moves a channel to a different category and/or position."""
@@ -275,17 +281,8 @@ async def move_channel(interaction, channel, category, position, reason):
     await interaction.response.defer(ephemeral=True)
 
     try:
-        # Prepare the edit parameters
-        edit_params = {}
-        if category:
-            edit_params['category'] = category
-        if position is not None:
-            edit_params['position'] = position
-        if reason:
-            edit_params['reason'] = reason
-
-        # Move the channel
-        await channel.edit(**edit_params)
+        # Move the channel with one bulk position update
+        await position_engine.move_channel(channel, position, category, reason=reason)
 
         # Prepare a message about what was changed
         changes = []
@@ -303,6 +300,9 @@ async def move_channel(interaction, channel, category, position, reason):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to move channel: {e}", ephemeral=True)
         return False
+    except ValueError as e:
+        await interaction.followup.send(f":warning: {e}", ephemeral=True)
+        return False
 
 async def clone_channel(interaction, channel, name, reason):
     """Clones a channel."""
@@ -8,6 +8,8 @@ This module provides functionality to move a channel to a different category and
 import discord
 import logging
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.ChannelMove')
 
 async def execute(interaction, bot, args):
@@ -87,17 +89,8 @@ async def execute(interaction, bot, args):
     await interaction.response.defer(ephemeral=True)
 
     try:
-        # Prepare the edit parameters
-        edit_params = {}
-        if category:
-            edit_params['category'] = category
-        if position is not None:
-            edit_params['position'] = position
-        if reason:
-            edit_params['reason'] = reason
-
-        # Move the channel
-        await target_channel.edit(**edit_params)
+        # Move the channel with one bulk position update
+        await position_engine.move_channel(target_channel, position, category, reason=reason)
 
         # Prepare a message about what was changed
         changes = []
@@ -115,3 +108,42 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to move channel: {e}", ephemeral=True)
         return False
+    except ValueError as e:
+        await interaction.followup.send(f":warning: {e}", ephemeral=True)
+        return False
+
+
+def position_target(args):
+    """Returns the kind of objects this command moves."""
+    return 'channels'
+
+def plan_positions(layout, args):
+    """Applies this command's move to a position layout. Raises ValueError if it can't be applied."""
+    guild = layout.guild
+    channel_name_or_id = args.get('channel', '')
+    category_name_or_id = args.get('category', '')
+    position_str = args.get('position', '')
+
+    if channel_name_or_id.isdigit():
+        target_channel = guild.get_channel(int(channel_name_or_id))
+    else:
+        target_channel = discord.utils.get(guild.channels, name=channel_name_or_id)
+    if not target_channel:
+        raise ValueError(f"Channel '{channel_name_or_id}' not found")
+
+    category = None
+    if category_name_or_id:
+        if category_name_or_id.isdigit():
+            category = guild.get_channel(int(category_name_or_id))
+        else:
+            category = discord.utils.get(guild.categories, name=category_name_or_id)
+        if not category:
+            raise ValueError(f"Category '{category_name_or_id}' not found")
+
+    if position_str and not position_str.lstrip('-').isdigit():
+        raise ValueError(f"Invalid position: {position_str}. Must be a number.")
+    position = int(position_str) if position_str else None
+    if not category and position is None:
+        raise ValueError("Either category or position must be specified for moving")
+
+    layout.move_channel(target_channel, position, category)
@@ -10,6 +10,8 @@ import discord
 import logging
 from typing import List, Optional, Union
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.ChannelReorder')
 
 async def execute(interaction, bot, args):
@@ -34,6 +36,35 @@ async def execute(interaction, bot, args):
         log.warning(f"Bot lacks permission to manage channels in {interaction.guild.name}")
         return False
 
+    try:
+        layout = position_engine.layout(interaction.guild)
+        plan_positions(layout, args)
+        changed, _ = await position_engine.apply(layout)
+
+        log.info(f"Reordered channels in {args.get('category') or interaction.guild.name} ({changed} position(s) changed)")
+        return True
+    except ValueError as e:
+        log.error(f"Cannot reorder channels: {e}")
+        return False
+    except discord.Forbidden:
+        log.error(f"Forbidden: Bot lacks permission to reorder channels")
+        return False
+    except discord.HTTPException as e:
+        log.error(f"HTTP error reordering channels: {e}")
+        return False
+    except Exception as e:
+        log.error(f"Error reordering channels: {e}", exc_info=True)
+        return False
+
+
+def position_target(args):
+    """Returns the kind of objects this command moves."""
+    return 'channels'
+
+def plan_positions(layout, args):
+    """Applies the new channel order to a position layout. Raises ValueError if it can't be applied."""
+    guild = layout.guild
+
     # Get parameters
     channels_str = args.get('channels', '')
     category_name_or_id = args.get('category', '')
@@ -45,24 +76,23 @@ async def execute(interaction, bot, args):
     if category_name_or_id:
         try:
             category_id = int(category_name_or_id)
-            category = interaction.guild.get_channel(category_id)
+            category = guild.get_channel(category_id)
         except (ValueError, TypeError):
             # Not an ID, try to find by name
-            category = discord.utils.get(interaction.guild.categories, name=category_name_or_id)
+            category = discord.utils.get(guild.categories, name=category_name_or_id)
 
         if not category:
-            log.error(f"Category '{category_name_or_id}' not found")
-            return False
+            raise ValueError(f"Category '{category_name_or_id}' not found")
 
     # Get the channels to reorder
     channels_to_reorder = []
 
     if category:
         # Get all channels in the category
-        channels_to_reorder = category.channels
+        channels_to_reorder = layout.channels_in(category)
     else:
         # Get all channels in the guild
-        channels_to_reorder = [ch for ch in interaction.guild.channels if not isinstance(ch, discord.CategoryChannel)]
+        channels_to_reorder = sorted((ch for ch in guild.channels if not isinstance(ch, discord.CategoryChannel)), key=layout.channel_position)
 
     # Sort channels if alphabetical is specified
     if alphabetical:
@@ -81,7 +111,7 @@ async def execute(interaction, bot, args):
             channel = None
             try:
                 channel_id = int(name_or_id)
-                channel = interaction.guild.get_channel(channel_id)
+                channel = guild.get_channel(channel_id)
             except (ValueError, TypeError):
                 # Not an ID, try to find by name
                 channel = discord.utils.get(channels_to_reorder, name=name_or_id)
@@ -98,19 +128,5 @@ async def execute(interaction, bot, args):
         # Just reverse the current order
         channels_to_reorder.reverse()
 
-    # Reorder the channels
-    try:
-        for i, channel in enumerate(channels_to_reorder):
-            await channel.edit(position=i)
-
-        log.info(f"Reordered {len(channels_to_reorder)} channels in {category.name if category else interaction.guild.name}")
-        return True
-    except discord.Forbidden:
-        log.error(f"Forbidden: Bot lacks permission to reorder channels")
-        return False
-    except discord.HTTPException as e:
-        log.error(f"HTTP error reordering channels: {e}")
-        return False
-    except Exception as e:
-        log.error(f"Error reordering channels: {e}", exc_info=True)
-        return False
+    # The channels swap places among themselves; only the ones that end up elsewhere are sent
+    layout.arrange_channels(channels_to_reorder)
@@ -86,3 +86,13 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to set slowmode: {e}", ephemeral=True)
         return False
+
+
+EDIT_TARGET = 'channel'
+
+def edit_fields(args):
+    """Returns the channel.edit() fields of this command, or None if it must run on its own."""
+    slowmode_str = args.get('slowmode', '')
+    if not slowmode_str.isdigit() or int(slowmode_str) > 21600:
+        return None
+    return {'slowmode_delay': int(slowmode_str)}
@@ -79,3 +79,11 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to unlock channel: {e}", ephemeral=True)
         return False
+
+
+EDIT_TARGET = 'channel'
+
+def edit_fields(args):
+    """Returns the channel.edit() fields of this command, or None if it must run on its own."""
+    # Applied to the current @everyone overwrite (reset to neutral)
+    return {'everyone_overwrite': {'send_messages': None}}
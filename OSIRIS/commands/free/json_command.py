@@ -1,7 +1,6 @@
 # commands/free/json_command.py
 import json
 import logging
-import importlib
 from pathlib import Path
 import sys
 
@@ -9,9 +8,7 @@ import sys
 BASE_DIR = Path(__file__).parent.parent.parent
 sys.path.append(str(BASE_DIR))
 
-# Define paths
-FREE_COMMANDS_DIR = BASE_DIR / "commands" / "free"
-PREMIUM_COMMANDS_DIR = BASE_DIR / "commands" / "premium"
+from utils.command_registry import command_registry
 
 # Logger
 log = logging.getLogger('MyBot.ExecutorCog.JsonCommand')
@@ -47,22 +44,7 @@ async def execute(interaction, bot, args):
         log.info(f"JSON command handler executing: {command_name}")
         
         # Find the command module
-        module = None
-        for directory in [FREE_COMMANDS_DIR, PREMIUM_COMMANDS_DIR]:
-            module_filename = f"{command_name}_command.py"
-            module_path = directory / module_filename
-            if module_path.is_file():
-                module_name_import = f"commands.{'free' if directory == FREE_COMMANDS_DIR else 'premium'}.{command_name}_command"
-                try:
-                    # Use importlib to load the module dynamically
-                    module = importlib.import_module(module_name_import)
-                    # Reload module in case it was updated since bot start
-                    module = importlib.reload(module)
-                    break
-                except Exception as e:
-                    log.error(f"Error importing command module {module_name_import}: {e}")
-                    return
-        
+        module, _ = command_registry.get(command_name)
         if not module:
             log.error(f"Command module not found for {command_name}")
             return
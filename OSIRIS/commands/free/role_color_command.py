@@ -100,3 +100,14 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to change role color: {e}", ephemeral=True)
         return False
+
+
+EDIT_TARGET = 'role'
+
+def edit_fields(args):
+    """Returns the role.edit() fields of this command, or None if it must run on its own."""
+    color_str = args.get('color', '').lstrip('#')
+    try:
+        return {'color': discord.Color(int(color_str, 16))} if color_str else None
+    except ValueError:
+        return None
@@ -10,6 +10,8 @@ import discord
 import logging
 import re
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.RoleCreate')
 
 async def execute(interaction, bot, args):
@@ -83,8 +85,8 @@ async def execute(interaction, bot, args):
         # Set position if specified
         if position is not None:
             try:
-                await role.edit(position=position)
-            except (discord.Forbidden, discord.HTTPException) as e:
+                await position_engine.move_role(role, position, reason=f"Created by {interaction.user} via BISHOP bot")
+            except (discord.Forbidden, discord.HTTPException, ValueError) as e:
                 log.warning(f"Could not set role position: {e}")
 
         log.info(f"Created role {role.name} ({role.id}) in {interaction.guild.name}")
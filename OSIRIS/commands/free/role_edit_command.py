@@ -9,6 +9,8 @@ import discord
 import logging
 import json
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.RoleEdit')
 
 async def execute(interaction, bot, args):
@@ -114,8 +116,8 @@ async def execute(interaction, bot, args):
     if position_str:
         try:
             position = int(position_str)
-            if position < 0 or position >= len(interaction.guild.roles):
-                await interaction.response.send_message(f":warning: Invalid position: {position}. Must be between 0 and {len(interaction.guild.roles) - 1}.", ephemeral=True)
+            if position < 1 or position >= len(interaction.guild.roles):
+                await interaction.response.send_message(f":warning: Invalid position: {position}. Must be between 1 and {len(interaction.guild.roles) - 1}.", ephemeral=True)
                 return False
         except ValueError:
             await interaction.response.send_message(f":warning: Invalid position: {position_str}. Must be a number.", ephemeral=True)
@@ -161,15 +163,14 @@ async def execute(interaction, bot, args):
             edit_params['mentionable'] = mentionable
         if permissions is not None:
             edit_params['permissions'] = permissions
-        if reason:
-            edit_params['reason'] = reason
 
         # Edit the role
-        await target_role.edit(**edit_params)
+        if edit_params:
+            await target_role.edit(**edit_params, reason=reason)
 
-        # Handle position separately if specified
+        # Handle position separately if specified (one bulk position update)
         if position is not None:
-            await target_role.edit(position=position, reason=reason)
+            await position_engine.move_role(target_role, position, reason=reason)
 
         # Prepare a message about what was changed
         changes = []
@@ -195,3 +196,58 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to edit role: {e}", ephemeral=True)
         return False
+    except ValueError as e:
+        await interaction.followup.send(f":warning: {e}", ephemeral=True)
+        return False
+
+
+EDIT_TARGET = 'role'
+
+def edit_fields(args):
+    """Returns the role.edit() fields of this command, or None if it must run on its own."""
+    if args.get('position'):
+        return None  # Position changes move other objects too
+    fields = {}
+    flags = {'true': True, 'yes': True, '1': True, 'false': False, 'no': False, '0': False}
+    try:
+        if args.get('name'):
+            fields['name'] = args['name']
+        if args.get('color'):
+            fields['color'] = discord.Color(int(args['color'].lstrip('#'), 16))
+        for flag in ('hoist', 'mentionable'):
+            if args.get(flag):
+                fields[flag] = flags[args[flag].lower()]
+        if args.get('permissions'):
+            permissions = discord.Permissions()
+            for perm_name, perm_value in json.loads(args['permissions']).items():
+                if not hasattr(permissions, perm_name):
+                    return None
+                setattr(permissions, perm_name, bool(perm_value))
+            fields['permissions'] = permissions
+    except (ValueError, KeyError, AttributeError):
+        return None
+    return fields or None
+
+
+def position_target(args):
+    """Returns the kind of objects this command moves, or None if it doesn't only move things."""
+    if not args.get('position') or any(args.get(key) for key in ('name', 'color', 'hoist', 'mentionable', 'permissions')):
+        return None
+    return 'roles'
+
+def plan_positions(layout, args):
+    """Applies a role move to a position layout. Raises ValueError if it can't be applied."""
+    guild = layout.guild
+    role_name_or_id = args.get('role', '')
+    position_str = args.get('position', '')
+
+    if role_name_or_id.isdigit():
+        target_role = guild.get_role(int(role_name_or_id))
+    else:
+        target_role = discord.utils.get(guild.roles, name=role_name_or_id)
+    if not target_role:
+        raise ValueError(f"Role '{role_name_or_id}' not found")
+    if not position_str.isdigit() or not 1 <= int(position_str) < len(guild.roles):
+        raise ValueError(f"Invalid position: {position_str}. Must be between 1 and {len(guild.roles) - 1}.")
+
+    layout.move_role(target_role, int(position_str))
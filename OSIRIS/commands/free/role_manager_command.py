@@ -12,6 +12,8 @@ import asyncio
 from typing import List, Optional, Union, Dict, Any
 import json
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.RoleManager')
 
 async def execute(interaction, bot, args):
@@ -189,8 +191,8 @@ async def create_role(interaction, name, color, hoist, mentionable, permissions,
         # Set position if specified
         if position is not None:
             try:
-                await role.edit(position=position)
-            except discord.HTTPException as e:
+                await position_engine.move_role(role, position)
+            except (discord.HTTPException, ValueError) as e:
                 log.warning(f"Failed to set role position: {e}")
 
         await interaction.followup.send(f":white_check_mark: Role {role.mention} created successfully.", ephemeral=True)
@@ -265,8 +267,8 @@ async def edit_role(interaction, role, name, color, hoist, mentionable, permissi
         # Set position if specified (needs to be done separately)
         if position is not None:
             try:
-                await role.edit(position=position)
-            except discord.HTTPException as e:
+                await position_engine.move_role(role, position)
+            except (discord.HTTPException, ValueError) as e:
                 log.warning(f"Failed to set role position: {e}")
 
         # Prepare a message about what was changed
@@ -95,3 +95,15 @@ async def execute(interaction, bot, args):
     except discord.HTTPException as e:
         await interaction.followup.send(f":x: Failed to change role mentionable status: {e}", ephemeral=True)
         return False
+
+
+EDIT_TARGET = 'role'
+
+def edit_fields(args):
+    """Returns the role.edit() fields of this command, or None if it must run on its own."""
+    value = args.get('mentionable', '').lower()
+    if value in ('true', 'yes', '1'):
+        return {'mentionable': True}
+    if value in ('false', 'no', '0'):
+        return {'mentionable': False}
+    return None
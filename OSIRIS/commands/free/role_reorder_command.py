@@ -10,6 +10,8 @@ import discord
 import logging
 from typing import List, Optional
 
+from utils.position_engine import position_engine
+
 log = logging.getLogger('MyBot.Commands.RoleReorder')
 
 async def execute(interaction, bot, args):
@@ -35,6 +37,35 @@ async def execute(interaction, bot, args):
         log.warning(f"Bot lacks permission to manage roles in {interaction.guild.name}")
         return False
 
+    try:
+        layout = position_engine.layout(interaction.guild)
+        plan_positions(layout, args)
+        _, changed = await position_engine.apply(layout)
+
+        log.info(f"Reordered roles in {interaction.guild.name} ({changed} position(s) changed)")
+        return True
+    except ValueError as e:
+        log.error(f"Cannot reorder roles: {e}")
+        return False
+    except discord.Forbidden:
+        log.error(f"Forbidden: Bot lacks permission to reorder roles")
+        return False
+    except discord.HTTPException as e:
+        log.error(f"HTTP error reordering roles: {e}")
+        return False
+    except Exception as e:
+        log.error(f"Error reordering roles: {e}", exc_info=True)
+        return False
+
+
+def position_target(args):
+    """Returns the kind of objects this command moves."""
+    return 'roles'
+
+def plan_positions(layout, args):
+    """Applies the new role order to a position layout. Raises ValueError if it can't be applied."""
+    guild = layout.guild
+
     # Get parameters
     roles_str = args.get('roles', '')
     alphabetical = args.get('alphabetical', 'false').lower() == 'true'
@@ -47,22 +78,22 @@ async def execute(interaction, bot, args):
     if above_role_name_or_id:
         try:
             role_id = int(above_role_name_or_id)
-            above_role = interaction.guild.get_role(role_id)
+            above_role = guild.get_role(role_id)
         except (ValueError, TypeError):
             # Not an ID, try to find by name
-            above_role = discord.utils.get(interaction.guild.roles, name=above_role_name_or_id)
+            above_role = discord.utils.get(guild.roles, name=above_role_name_or_id)
 
     below_role = None
     if below_role_name_or_id:
         try:
             role_id = int(below_role_name_or_id)
-            below_role = interaction.guild.get_role(role_id)
+            below_role = guild.get_role(role_id)
         except (ValueError, TypeError):
             # Not an ID, try to find by name
-            below_role = discord.utils.get(interaction.guild.roles, name=below_role_name_or_id)
+            below_role = discord.utils.get(guild.roles, name=below_role_name_or_id)
 
     # Get all roles except @everyone
-    roles_to_reorder = [role for role in interaction.guild.roles if role.name != "@everyone"]
+    roles_to_reorder = layout.roles()
 
     # Sort roles if alphabetical is specified
     if alphabetical:
@@ -81,7 +112,7 @@ async def execute(interaction, bot, args):
             role = None
             try:
                 role_id = int(name_or_id)
-                role = interaction.guild.get_role(role_id)
+                role = guild.get_role(role_id)
             except (ValueError, TypeError):
                 # Not an ID, try to find by name
                 role = discord.utils.get(roles_to_reorder, name=name_or_id)
@@ -102,35 +133,19 @@ async def execute(interaction, bot, args):
     start_position = 1  # Default to just above @everyone
 
     if above_role:
-        start_position = above_role.position
+        start_position = layout.role_position(above_role)
     elif below_role:
-        start_position = below_role.position - len(roles_to_reorder)
+        start_position = layout.role_position(below_role) - len(roles_to_reorder)
 
     # Ensure start_position is at least 1 (above @everyone)
     start_position = max(1, start_position)
 
-    # Reorder the roles
-    try:
-        # Create a list of (role, position) tuples
-        role_positions = []
-        for i, role in enumerate(roles_to_reorder):
-            # Skip roles that are higher than the bot's highest role
-            if role.position >= interaction.guild.me.top_role.position:
-                continue
-            role_positions.append((role, start_position + i))
-
-        # Update all roles at once
-        if role_positions:
-            await interaction.guild.edit_role_positions(positions=role_positions)
-
-        log.info(f"Reordered {len(role_positions)} roles in {interaction.guild.name}")
-        return True
-    except discord.Forbidden:
-        log.error(f"Forbidden: Bot lacks permission to reorder roles")
-        return False
-    except discord.HTTPException as e:
-        log.error(f"HTTP error reordering roles: {e}")
-        return False
-    except Exception as e:
-        log.error(f"Error reordering roles: {e}", exc_info=True)
-        return False
+    # Roles higher than the bot's highest role are skipped
+    limit = layout.role_position(guild.me.top_role) if not guild.me.top_role.is_default() else 0
+    role_positions = {}
+    for i, role in enumerate(roles_to_reorder):
+        if layout.role_position(role) >= limit:
+            continue
+        role_positions[role] = start_position + i
+
+    layout.place_roles(role_positions)
@@ -35,6 +35,19 @@ sys.path.append(str(BASE_DIR))
 
 # Import config manager
 from utils.config_manager import config
+from utils.llm_backend import llm_backend
+from utils.asset_cache import asset_cache
+from utils.database import market_db
+from utils.migrations import run_migrations
+from utils.saves_index import saves_index
+from utils.counter_buffer import market_counters
+from utils.trending import trending
+from utils.content_store import content_store
+from utils.rate_limiter import rate_limiter
+from utils.message_scheduler import message_scheduler
+from utils.refine_jobs import refine_jobs
+from utils.session_store import session_store
+from utils.api_governor import api_governor
 
 # Load environment variables from .env file
 dotenv.load_dotenv()
@@ -136,11 +149,14 @@ last_mention_response = {}
 class MyBot(commands.Bot):
     def __init__(self):
         # Disable voice support to avoid PyNaCl warning
-        super().__init__(command_prefix="!", intents=intents, voice_client_class=None) # Prefix is fallback, main interaction is slash commands
+        super().__init__(command_prefix="!", intents=intents, voice_client_class=None, # Prefix is fallback, main interaction is slash commands
+                         http_trace=api_governor.trace_config()) # Feeds the rate limit headers to the API governor
 
     async def setup_hook(self):
         """Runs when the bot first connects. Loads cogs."""
         bot_logger.info("Starting setup hook...")
+        # Every Discord API call, including those of command modules, is paced by the governor
+        api_governor.install(self)
         # Create necessary directories if they don't exist
         required_dirs = [
             BASE_DIR / "temp",
@@ -155,43 +171,33 @@ class MyBot(commands.Bot):
                 bot_logger.info(f"Created directory and .gitkeep: {dir_path}")
 
         # --- Database Initialization ---
-        db_path = BASE_DIR / "market.db"
-        async with aiosqlite.connect(db_path) as db:
-            # Create market table if it doesn't exist
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS market_listings (
-                    uid TEXT PRIMARY KEY,
-                    owner_id INTEGER NOT NULL,
-                    file_name TEXT NOT NULL,
-                    description TEXT,
-                    date_listed REAL NOT NULL,
-                    saves_count INTEGER DEFAULT 0 NOT NULL,
-                    stars_count INTEGER DEFAULT 0 NOT NULL
-                )
-            ''')
-            # Create user saved market items table
-            # Stores which users saved which market items
-            await db.execute('''
-                CREATE TABLE IF NOT EXISTS user_market_saves (
-                    user_id INTEGER NOT NULL,
-                    uid TEXT NOT NULL,
-                    date_saved REAL NOT NULL,
-                    PRIMARY KEY (user_id, uid),
-                    FOREIGN KEY (uid) REFERENCES market_listings(uid) ON DELETE CASCADE
-                )
-            ''')
-            # Create user awards table (to prevent multiple stars from same user)
-            await db.execute('''
-                 CREATE TABLE IF NOT EXISTS user_market_awards (
-                    user_id INTEGER NOT NULL,
-                    uid TEXT NOT NULL,
-                    PRIMARY KEY (user_id, uid),
-                    FOREIGN KEY (uid) REFERENCES market_listings(uid) ON DELETE CASCADE
-                 )
-            ''')
-            await db.commit()
-            bot_logger.info(f"Database '{db_path}' initialized and tables ensured.")
+        # Opens the shared reader pool and writer (WAL mode) used by the market helpers
+        await market_db.start()
+        schema_version = await run_migrations(market_db)
+        bot_logger.info(f"Database '{market_db.path}' initialized (schema version {schema_version}).")
+        # Relic save/star counts are buffered in memory and written in batches
+        await market_counters.start()
+        # Folds save/star events into the precomputed trending ranking in the background
+        await trending.start()
+        # Expires temporary outputs and removes unreferenced blobs periodically
+        content_store.start()
+        # Restores /spectre cooldowns from the last snapshot
+        rate_limiter.start()
+        # Deletes the cogs' tracked messages when due, including those left over from before a restart
+        await message_scheduler.start(self)
+        # Forever-save refinements, including those interrupted by a restart
+        await refine_jobs.start()
+        # Checkpoints Spectre sessions so they can be resumed after eviction or a restart
+        session_store.start()
+
+        # Saves made before the index existed only have JSON sidecars (one-off)
+        try:
+            await saves_index.import_sidecars()
+        except Exception as e:
+            bot_logger.error(f"Failed to import save metadata into the saves index: {e}", exc_info=True)
 
+        # --- Preload prompt and text assets ---
+        await asset_cache.preload()
 
         # --- Load Cogs --- [cite: 16]
         bot_logger.info(f"Looking for cogs in: {COGS_DIR}")
@@ -221,6 +227,20 @@ class MyBot(commands.Bot):
         except Exception as e:
             bot_logger.error(f"Failed to sync slash commands: {e}")
 
+    async def close(self):
+        """Shuts down shared resources before closing the connection to Discord."""
+        await llm_backend.close()
+        # Write buffered counter updates before the database closes
+        await market_counters.close()
+        await trending.close()
+        await content_store.close()
+        await rate_limiter.close()
+        await message_scheduler.close()
+        await refine_jobs.close()
+        await session_store.close()
+        await market_db.close()
+        await super().close()
+
     async def on_ready(self):
         """Event triggered when the bot is ready and logged in."""
         bot_logger.info(f'Logged in as {self.user.name} (ID: {self.user.id})')
@@ -232,13 +252,8 @@ class MyBot(commands.Bot):
         """Helper to read text files asynchronously."""
         filepath = directory / filename
         try:
-            # Define a function to read the file in a thread
-            def read_file():
-                return filepath.read_text(encoding='utf-8')
-
-            # Use asyncio's thread to avoid blocking the event loop for file I/O
-            content = await asyncio.to_thread(read_file)
-            return content
+            # Served from the shared asset cache; only read from disk when the file changed
+            return await asset_cache.read(filepath)
         except FileNotFoundError:
             bot_logger.error(f"File not found: {filepath}")
             return f":warning: Error: `{filename}` not found. Please inform the bot owner."
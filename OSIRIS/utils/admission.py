@@ -0,0 +1,174 @@
+# utils/admission.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.Admission')
+
+# Called with the waiter's 1-based place in the queue whenever it changes
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class AdmissionRejected(Exception):
+    """Raised when the queue is full and a request is shed."""
+
+    def __init__(self, queued: int):
+        super().__init__(f"LLM admission queue is full ({queued} waiting)")
+        self.queued = queued
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'future', 'tier')
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future, tier: Optional[str]):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.tier = tier
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Global limit on concurrent model calls, with per-tier priority lanes.
+
+    At most `max_concurrent` requests hold a slot at once. Others wait in a priority
+    queue: a higher tier is always admitted before a lower one, and requests of the
+    same tier are admitted in arrival order. Once `max_queue` requests are waiting,
+    new ones are rejected with `AdmissionRejected` instead of piling up and timing
+    out together.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None,
+                 tier_priority: Optional[Sequence[str]] = None, position_interval: Optional[float] = None):
+        """
+        Initialize the AdmissionController.
+
+        Args:
+            max_concurrent (int, optional): Requests allowed to run at once. Defaults to `spectre.admission.max_concurrent`
+            max_queue (int, optional): Waiting requests before new ones are shed. Defaults to `spectre.admission.max_queue`
+            tier_priority (Sequence[str], optional): Tier names, highest priority first. Defaults to `spectre.admission.tier_priority`
+            position_interval (float, optional): Minimum seconds between queue position callbacks. Defaults to `spectre.admission.position_update_interval`
+        """
+        self.max_concurrent = max_concurrent or config.get("spectre.admission.max_concurrent", 8)
+        self.max_queue = max_queue or config.get("spectre.admission.max_queue", 50)
+        tiers = tier_priority or config.get("spectre.admission.tier_priority", ["Abysswalker", "Seeker", "Drifter"])
+        self.tier_priority: Dict[str, int] = {tier: rank for rank, tier in enumerate(tiers)}
+        self.position_interval = position_interval or config.get("spectre.admission.position_update_interval", 3.0)
+
+        self._active = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def priority_of(self, tier: Optional[str]) -> int:
+        """Get the lane of a tier (lower runs first). Unknown tiers and None go last."""
+        return self.tier_priority.get(tier, len(self.tier_priority))
+
+    def _pending(self) -> List[_Waiter]:
+        return [waiter for waiter in self._queue if not waiter.future.done()]
+
+    def position(self, waiter: _Waiter) -> int:
+        """Get a waiter's 1-based place in the queue."""
+        return 1 + sum(1 for other in self._queue if other < waiter and not other.future.done())
+
+    def _wake_next(self):
+        """Hand free slots to the highest-priority waiters."""
+        while self._active < self.max_concurrent and self._queue:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue  # Cancelled while waiting
+            self._active += 1
+            waiter.future.set_result(True)
+
+    def _release(self):
+        self._active -= 1
+        self._wake_next()
+
+    async def _acquire(self, tier: Optional[str], on_position: Optional[PositionCallback], shed: bool = True):
+        if self._active < self.max_concurrent and not self._pending():
+            self._active += 1
+            return
+
+        queued = len(self._pending())
+        if shed and queued >= self.max_queue:
+            self.rejected += 1
+            log.warning(f"Shed LLM request (tier {tier}): {queued} request(s) already waiting")
+            raise AdmissionRejected(queued)
+
+        waiter = _Waiter(self.priority_of(tier), next(self._seq), asyncio.get_running_loop().create_future(), tier)
+        heapq.heappush(self._queue, waiter)
+        last_position = None
+        try:
+            while not waiter.future.done():
+                if on_position is not None:
+                    position = self.position(waiter)
+                    if position != last_position:
+                        last_position = position
+                        try:
+                            await on_position(position)
+                        except Exception as e:
+                            log.debug(f"Queue position callback failed: {e}")
+                # A timeout only wakes us to refresh the position; it doesn't cancel the future
+                await asyncio.wait({waiter.future}, timeout=self.position_interval if on_position else None)
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Got a slot just as the caller went away; pass it on
+                self._release()
+            else:
+                waiter.future.cancel()
+            raise
+
+    @asynccontextmanager
+    async def slot(self, tier: Optional[str] = None, on_position: Optional[PositionCallback] = None, shed: bool = True):
+        """
+        Hold one model-call slot for the duration of the block.
+
+        Args:
+            tier (str, optional): The caller's tier, which decides its priority lane
+            on_position (PositionCallback, optional): Awaited with the queue position while waiting
+            shed (bool): Whether to reject the request when the queue is full. Background work passes False to wait its turn
+
+        Raises:
+            AdmissionRejected: If the queue is full and `shed` is set
+        """
+        started = time.monotonic()
+        await self._acquire(tier, on_position, shed)
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            log.info(f"LLM request (tier {tier}) admitted after waiting {waited:.1f}s")
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, float]:
+        """Get the current load and the admission counters."""
+        return {
+            'active': self._active,
+            'queued': len(self._pending()),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'avg_wait': self.total_wait / self.admitted if self.admitted else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+
+# Create a global instance for easy access
+admission = AdmissionController()
@@ -0,0 +1,263 @@
+# utils/api_governor.py
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import aiohttp
+import discord
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.APIGovernor')
+
+# Request priorities: user-facing responses first, then bulk work (command files, scheduled deletions)
+INTERACTIVE, BULK = 0, 1
+
+# Priority of the Discord API calls made in the current task
+api_priority: contextvars.ContextVar[int] = contextvars.ContextVar('api_priority', default=INTERACTIVE)
+# Route of the request in flight, read by the trace hooks to attribute the response headers
+_current_route: contextvars.ContextVar[Optional[discord.http.Route]] = contextvars.ContextVar('api_route', default=None)
+# Accumulates the waits of the calls made inside `api_governor.track()`
+_current_tracker: contextvars.ContextVar[Optional['WaitTracker']] = contextvars.ContextVar('api_tracker', default=None)
+
+
+class WaitTracker:
+    """The calls made inside a `track()` block and how long they were held back."""
+
+    __slots__ = ('calls', 'waited', 'max_wait')
+
+    def __init__(self):
+        self.calls = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+
+class _Bucket:
+    __slots__ = ('limit', 'remaining', 'reset_at', 'last_sent')
+
+    def __init__(self):
+        self.limit = 1
+        self.remaining = 1
+        self.reset_at: Optional[float] = None  # Monotonic time the window resets
+        self.last_sent = 0.0
+
+
+class APIGovernor:
+    """
+    Paces every Discord API call made by the bot.
+
+    Installed on the bot's HTTP client, so command modules calling `channel.edit`,
+    `role.edit`, `add_roles` and the like are covered without changes. The rate limit
+    headers of each response (seen through an aiohttp trace config) keep a per-route
+    bucket (shared between routes once Discord reports their bucket hash) and the
+    global limit up to date. Before a call is sent it waits until its bucket and the
+    global budget allow it, instead of running into a 429 and discord.py's retry sleep.
+
+    Calls have a priority (`api_priority`): bulk calls leave `bulk_reserve` requests of
+    each bucket and `bulk_global_reserve` of the global budget to interactive calls,
+    yield to interactive calls waiting on the same bucket, and are spread over the
+    rest of the window once half of a bucket is used.
+    """
+
+    def __init__(self, global_per_second: Optional[float] = None, bulk_reserve: Optional[int] = None,
+                 bulk_global_reserve: Optional[int] = None):
+        """
+        Initialize the APIGovernor.
+
+        Args:
+            global_per_second (float, optional): The global request budget. Defaults to `bot.api_governor.global_per_second`
+            bulk_reserve (int, optional): Requests of each bucket kept for interactive calls. Defaults to `bot.api_governor.bulk_reserve`
+            bulk_global_reserve (int, optional): Global requests kept for interactive calls. Defaults to `bot.api_governor.bulk_global_reserve`
+        """
+        self.rate = global_per_second or config.get("bot.api_governor.global_per_second", 50)
+        self.bulk_reserve = bulk_reserve if bulk_reserve is not None else config.get("bot.api_governor.bulk_reserve", 1)
+        self.bulk_global_reserve = bulk_global_reserve if bulk_global_reserve is not None else config.get("bot.api_governor.bulk_global_reserve", 10)
+
+        self._hashes: Dict[str, str] = {}  # route.key -> Discord bucket hash
+        self._buckets: Dict[str, _Bucket] = {}
+        self._tokens = float(self.rate)
+        self._refilled = time.monotonic()
+        self._global_until = 0.0
+        self._interactive_waiting: Counter = Counter()  # bucket key -> interactive calls waiting on it
+
+        self.calls = Counter()
+        self.waited = Counter()
+        self.max_wait = Counter()
+        self.rate_limited = 0
+
+    # --- Buckets ---
+
+    def _bucket_key(self, route: discord.http.Route) -> str:
+        return f"{self._hashes.get(route.key, route.key)}:{route.major_parameters}"
+
+    def _refill(self, now: float):
+        self._tokens = min(float(self.rate), self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _delay(self, key: str, bulk: bool, now: float) -> float:
+        """Seconds a call has to wait before it may be sent (0 if it may go now)."""
+        if self._global_until > now:
+            return self._global_until - now
+
+        self._refill(now)
+        floor = self.bulk_global_reserve if bulk else 0
+        if self._tokens - 1 < floor:
+            return (floor + 1 - self._tokens) / self.rate
+
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.reset_at is None:
+            return 0.0
+        if now >= bucket.reset_at:
+            # The window passed without a response telling us otherwise
+            bucket.remaining, bucket.reset_at = bucket.limit, None
+            return 0.0
+
+        if not bulk:
+            return 0.0 if bucket.remaining > 0 else bucket.reset_at - now
+        if self._interactive_waiting[key]:
+            return 0.05
+        reserve = self.bulk_reserve if bucket.limit > self.bulk_reserve + 1 else 0
+        if bucket.remaining <= reserve:
+            return bucket.reset_at - now
+        if bucket.remaining <= bucket.limit // 2:
+            # Spread what is left of the window instead of bursting into the reserve
+            gap = (bucket.reset_at - now) / (bucket.remaining - reserve)
+            return max(0.0, bucket.last_sent + gap - now)
+        return 0.0
+
+    async def acquire(self, route: discord.http.Route) -> float:
+        """
+        Wait until a call on a route may be sent, and count it against its buckets.
+
+        Returns:
+            float: Seconds the call waited
+        """
+        bulk = api_priority.get() == BULK
+        started = time.monotonic()
+        waiting_key = self._bucket_key(route)
+        if not bulk:
+            self._interactive_waiting[waiting_key] += 1
+        try:
+            while True:
+                now = time.monotonic()
+                key = self._bucket_key(route)  # The bucket hash may have been learned meanwhile
+                delay = self._delay(key, bulk, now)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(min(delay, 5.0))
+        finally:
+            if not bulk:
+                self._interactive_waiting[waiting_key] -= 1
+                if not self._interactive_waiting[waiting_key]:
+                    del self._interactive_waiting[waiting_key]
+
+        now = time.monotonic()
+        self._tokens -= 1
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket.reset_at is not None:
+            bucket.remaining -= 1
+            bucket.last_sent = now
+
+        waited = now - started
+        priority = 'bulk' if bulk else 'interactive'
+        self.calls[priority] += 1
+        self.waited[priority] += waited
+        self.max_wait[priority] = max(self.max_wait[priority], waited)
+        tracker = _current_tracker.get()
+        if tracker is not None:
+            tracker.calls += 1
+            tracker.waited += waited
+            tracker.max_wait = max(tracker.max_wait, waited)
+        if waited > 1:
+            log.debug(f"{route.method} {route.path} ({priority}) waited {waited:.2f}s for its rate limit")
+        return waited
+
+    # --- Response headers ---
+
+    async def _on_request_end(self, session, context, params: aiohttp.TraceRequestEndParams):
+        route = _current_route.get()
+        if route is None:
+            return
+        headers = params.response.headers
+        now = time.monotonic()
+
+        if params.response.status == 429:
+            self.rate_limited += 1
+            retry_after = float(headers.get('Retry-After') or headers.get('X-RateLimit-Reset-After') or 1)
+            if headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global':
+                self._global_until = now + retry_after
+            log.warning(f"Rate limited on {route.method} {route.path} (retry after {retry_after:.2f}s, scope {headers.get('X-RateLimit-Scope', 'unknown')})")
+
+        if 'X-RateLimit-Remaining' not in headers:
+            return
+        bucket_hash = headers.get('X-RateLimit-Bucket')
+        if bucket_hash:
+            self._hashes[route.key] = bucket_hash
+        key = self._bucket_key(route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 1024:
+                self._buckets = {k: b for k, b in self._buckets.items() if b.reset_at is not None and b.reset_at > now}
+            bucket = self._buckets[key] = _Bucket()
+        try:
+            bucket.limit = int(headers.get('X-RateLimit-Limit', bucket.limit))
+            bucket.remaining = int(headers['X-RateLimit-Remaining'])
+            bucket.reset_at = now + float(headers.get('X-RateLimit-Reset-After', 1))
+        except ValueError:
+            log.debug(f"Unparsable rate limit headers on {route.method} {route.path}")
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Get the trace config to pass to the bot as `http_trace`."""
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(self._on_request_end)
+        return trace
+
+    # --- Installation and reporting ---
+
+    def install(self, bot: discord.Client):
+        """Route every API call of a bot's HTTP client through the governor."""
+        http = bot.http
+        if getattr(http, '_api_governor', None) is self:
+            return
+        original = http.request
+
+        async def request(route: discord.http.Route, **kwargs):
+            await self.acquire(route)
+            token = _current_route.set(route)
+            try:
+                return await original(route, **kwargs)
+            finally:
+                _current_route.reset(token)
+
+        http.request = request
+        http._api_governor = self
+        log.info("API governor installed")
+
+    @contextmanager
+    def track(self) -> WaitTracker:
+        """Collect the calls (including those of tasks started inside the block) and their waits."""
+        tracker = WaitTracker()
+        token = _current_tracker.set(tracker)
+        try:
+            yield tracker
+        finally:
+            _current_tracker.reset(token)
+
+    def stats(self) -> Dict[str, float]:
+        """Get the call and wait counters per priority."""
+        stats = {'buckets': len(self._buckets), 'rate_limited': self.rate_limited}
+        for priority in ('interactive', 'bulk'):
+            calls = self.calls[priority]
+            stats[f'{priority}_calls'] = calls
+            stats[f'{priority}_avg_wait'] = self.waited[priority] / calls if calls else 0.0
+            stats[f'{priority}_max_wait'] = self.max_wait[priority]
+        return stats
+
+
+# Create a global instance for easy access
+api_governor = APIGovernor()
@@ -0,0 +1,174 @@
+# utils/asset_cache.py
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.AssetCache')
+
+# Project root directory (where the prompt and text files live)
+BASE_DIR = Path(__file__).parent.parent
+
+# Prompt and text files read by the cogs, loaded into the cache on startup
+DEFAULT_ASSETS = (
+    "spectre.txt",
+    "user_instructor.txt",
+    "gpt_instructor.txt",
+    "temp.txt",
+    "forever.txt",
+    "forever1.txt",
+    "undo.txt",
+    "bot.txt",
+    "credits.txt",
+    "about.txt",
+)
+
+
+class AssetCache:
+    """
+    In-memory cache for small text assets such as prompt templates.
+
+    Each file is read once and served from memory afterwards. Entries are checked
+    against the file's mtime and size (at most once per `check_interval` seconds),
+    so edits on disk are picked up without restarting the bot.
+    """
+
+    def __init__(self, check_interval: Optional[float] = None):
+        """
+        Initialize the AssetCache.
+
+        Args:
+            check_interval (float, optional): Minimum seconds between stat checks of a cached file.
+                Defaults to `assets.check_interval` from the config
+        """
+        if check_interval is None:
+            check_interval = config.get("assets.check_interval", 2.0)
+        self.check_interval = check_interval
+        self._entries: Dict[Path, Tuple[int, int, str]] = {}  # path: (mtime_ns, size, content)
+        self._checked: Dict[Path, float] = {}  # path: monotonic time of the last stat check
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def _load(path: Path) -> Tuple[int, int, str]:
+        stat = path.stat()
+        content = path.read_text(encoding='utf-8')
+        return stat.st_mtime_ns, stat.st_size, content
+
+    def _fresh_entry(self, path: Path) -> Optional[str]:
+        """Returns the cached content if it is still current, otherwise None."""
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if now - self._checked.get(path, 0.0) < self.check_interval:
+            return entry[2]
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+        if stat.st_mtime_ns != entry[0] or stat.st_size != entry[1]:
+            return None
+
+        self._checked[path] = now
+        return entry[2]
+
+    async def read(self, path: Path, cache: bool = True) -> str:
+        """
+        Read a text file through the cache.
+
+        Args:
+            path (Path): The file to read
+            cache (bool): Whether to keep the content in memory. Use False for user files
+                that are read once (the read still happens off the event loop)
+
+        Returns:
+            str: The file content
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            OSError: If the file can't be read
+        """
+        path = Path(path)
+        if not cache:
+            return await asyncio.to_thread(path.read_text, encoding='utf-8')
+
+        content = self._fresh_entry(path)
+        if content is not None:
+            self.hits += 1
+            return content
+
+        self.misses += 1
+        if path in self._entries:
+            self.reloads += 1
+            log.info(f"Asset {path.name} changed on disk, reloading")
+
+        mtime_ns, size, content = await asyncio.to_thread(self._load, path)
+        self._entries[path] = (mtime_ns, size, content)
+        self._checked[path] = time.monotonic()
+        return content
+
+    async def preload(self, paths: Optional[Iterable[Path]] = None) -> int:
+        """
+        Load files into the cache ahead of time.
+
+        Args:
+            paths (Iterable[Path], optional): Files to load. Defaults to DEFAULT_ASSETS in the project root
+
+        Returns:
+            int: Number of files loaded
+        """
+        if paths is None:
+            paths = [BASE_DIR / name for name in DEFAULT_ASSETS]
+
+        loaded = 0
+        for path in paths:
+            try:
+                await self.read(path)
+                loaded += 1
+            except FileNotFoundError:
+                log.warning(f"Asset not found during preload: {path}")
+            except Exception as e:
+                log.error(f"Error preloading asset {path}: {e}")
+
+        # Preloading shouldn't count as cache misses
+        self.misses = 0
+        self.reloads = 0
+        log.info(f"Preloaded {loaded} asset(s) into the cache ({self.stats()['bytes'] / 1024:.1f} KiB); hit/miss stats are shown by !assetcache")
+        return loaded
+
+    def invalidate(self, path: Optional[Path] = None):
+        """Drop one cached file, or all of them if no path is given."""
+        if path is None:
+            self._entries.clear()
+            self._checked.clear()
+        else:
+            self._entries.pop(Path(path), None)
+            self._checked.pop(Path(path), None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict[str, int]: Cached file count, cached bytes, hits, misses and reloads
+        """
+        return {
+            'entries': len(self._entries),
+            'bytes': sum(len(entry[2]) for entry in self._entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+        }
+
+
+# Create a global instance for easy access
+asset_cache = AssetCache()
@@ -0,0 +1,219 @@
+# utils/blob_store.py
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.BlobStore')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+# Suffix of stored blobs (zlib streams)
+BLOB_SUFFIX = ".z"
+
+
+class BlobCorruptError(Exception):
+    """Raised when a blob's content doesn't match its hash."""
+    pass
+
+
+class BlobStore:
+    """
+    Content-addressed store for text blobs.
+
+    Blobs are keyed by the SHA-256 of their UTF-8 content, so identical outputs are
+    stored once. Each blob is a zlib stream in `<root>/<first two hex digits>/<hash>.z`,
+    written to a temporary file and renamed into place, so readers never see a
+    partial blob. Reads map the file with mmap and decompress straight from it.
+    """
+
+    def __init__(self, root: Path, compression_level: Optional[int] = None, verify: bool = True):
+        """
+        Initialize the BlobStore.
+
+        Args:
+            root (Path): Directory holding the blobs
+            compression_level (int, optional): zlib level (1-9). Defaults to `vault.blob_compression_level`
+            verify (bool): Check the hash of every blob that is read
+        """
+        self.root = Path(root)
+        self.compression_level = compression_level or config.get("vault.blob_compression_level", 6)
+        self.verify = verify
+
+        self.writes = 0
+        self.dedup_hits = 0
+        self.reads = 0
+        self.bytes_in = 0
+        self.bytes_stored = 0
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """Get the blob key of a text."""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def path_for(self, digest: str) -> Path:
+        """Get the file path of a blob."""
+        return self.root / digest[:2] / f"{digest}{BLOB_SUFFIX}"
+
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob is stored (blocking stat)."""
+        return self.path_for(digest).is_file()
+
+    def _write(self, digest: str, data: bytes) -> bool:
+        path = self.path_for(digest)
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        compressed = zlib.compress(data, self.compression_level)
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(compressed)
+                f.flush()
+                os.fsync(f.fileno())
+            # Atomic on POSIX and Windows; a concurrent writer of the same blob wrote identical bytes
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        self.bytes_stored += len(compressed)
+        return True
+
+    def _read(self, digest: str) -> bytes:
+        with open(self.path_for(digest), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise BlobCorruptError(f"Blob {digest} is empty")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data = zlib.decompress(mapped)
+        if self.verify and hashlib.sha256(data).hexdigest() != digest:
+            raise BlobCorruptError(f"Blob {digest} does not match its hash")
+        return data
+
+    async def put(self, content: str) -> str:
+        """
+        Store a text.
+
+        Args:
+            content (str): The text to store
+
+        Returns:
+            str: The blob's key (hex SHA-256 of the content)
+        """
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        self.bytes_in += len(data)
+        if self.exists(digest):
+            self.dedup_hits += 1
+            return digest
+        if await asyncio.to_thread(self._write, digest, data):
+            self.writes += 1
+        else:
+            self.dedup_hits += 1
+        return digest
+
+    async def get(self, digest: str) -> str:
+        """
+        Read a stored text.
+
+        Args:
+            digest (str): The blob's key
+
+        Returns:
+            str: The text
+
+        Raises:
+            FileNotFoundError: If the blob doesn't exist
+            BlobCorruptError: If the blob can't be decoded or fails verification
+        """
+        try:
+            data = await asyncio.to_thread(self._read, digest)
+        except zlib.error as e:
+            raise BlobCorruptError(f"Blob {digest} can't be decompressed: {e}") from e
+        self.reads += 1
+        return data.decode('utf-8')
+
+    def iter_digests(self) -> Iterator[str]:
+        """Yield the keys of all stored blobs (blocking directory scan)."""
+        if not self.root.is_dir():
+            return
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(BLOB_SUFFIX) and not entry.name.startswith('.'):
+                    yield entry.name[:-len(BLOB_SUFFIX)]
+
+    def _collect(self, referenced: set, grace_seconds: float) -> Dict[str, int]:
+        cutoff = time.time() - grace_seconds
+        removed = kept = freed = 0
+        for digest in list(self.iter_digests()):
+            if digest in referenced:
+                kept += 1
+                continue
+            path = self.path_for(digest)
+            try:
+                stat = path.stat()
+                # Blobs written moments ago may not be referenced yet
+                if stat.st_mtime > cutoff:
+                    kept += 1
+                    continue
+                path.unlink()
+                removed += 1
+                freed += stat.st_size
+            except FileNotFoundError:
+                continue
+        # Temporary files left behind by interrupted writes
+        for shard in (self.root.iterdir() if self.root.is_dir() else []):
+            if shard.is_dir():
+                for temp_path in shard.glob(".*.tmp"):
+                    try:
+                        if temp_path.stat().st_mtime < cutoff:
+                            temp_path.unlink()
+                    except FileNotFoundError:
+                        pass
+        return {'removed': removed, 'kept': kept, 'bytes_freed': freed}
+
+    async def collect_garbage(self, referenced: Iterable[str], grace_seconds: float = 3600) -> Dict[str, int]:
+        """
+        Delete blobs that nothing references.
+
+        Args:
+            referenced (Iterable[str]): Keys of all blobs that are still in use
+            grace_seconds (float): Blobs newer than this are kept even if unreferenced
+
+        Returns:
+            Dict[str, int]: Number of blobs removed and kept, and bytes freed
+        """
+        result = await asyncio.to_thread(self._collect, set(referenced), grace_seconds)
+        log.info(f"Blob garbage collection: {result}")
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get store statistics.
+
+        Returns:
+            Dict[str, int]: Blobs written, deduplicated puts, reads, bytes received and bytes written (compressed)
+        """
+        return {
+            'writes': self.writes,
+            'dedup_hits': self.dedup_hits,
+            'reads': self.reads,
+            'bytes_in': self.bytes_in,
+            'bytes_stored': self.bytes_stored,
+        }
+
+
+# Create a global instance for easy access
+blob_store = BlobStore(BASE_DIR / config.get("vault.blob_dir", "blobs"))
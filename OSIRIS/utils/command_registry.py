@@ -0,0 +1,250 @@
+# utils/command_registry.py
+
+import hashlib
+import importlib
+import logging
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger('MyBot.CommandRegistry')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+# Command tiers in lookup priority order (free commands win over premium ones with the same name)
+COMMAND_TIERS = ('free', 'premium')
+COMMAND_FILE_SUFFIX = "_command.py"
+
+
+def normalize_command_name(command_name: str) -> str:
+    """
+    Normalize a command name to the form used for command module files.
+
+    Args:
+        command_name (str): The raw command name (e.g. from a command file line)
+
+    Returns:
+        str: The lowercase name with everything except letters, digits and underscores removed
+    """
+    return ''.join(c for c in command_name.lower() if c.isalnum() or c == '_')
+
+
+class CommandEntry:
+    """A single indexed command module together with the file state it was loaded from."""
+
+    __slots__ = ('name', 'tier', 'path', 'module_name', 'module', 'mtime_ns', 'size', 'digest')
+
+    def __init__(self, name: str, tier: str, path: Path):
+        self.name = name
+        self.tier = tier
+        self.path = path
+        self.module_name = f"commands.{tier}.{name}_command"
+        self.module: Optional[ModuleType] = None
+        self.mtime_ns = 0
+        self.size = 0
+        self.digest = ""
+
+
+class CommandRegistry:
+    """
+    Index of the executor's command modules in `commands/free` and `commands/premium`.
+
+    Modules are imported once when the registry is scanned and then served from memory.
+    A lookup only stats the module file; the module is re-imported when the file's
+    mtime or size changed *and* its content hash differs from the loaded version.
+    """
+
+    def __init__(self, commands_dir: Path):
+        """
+        Initialize the CommandRegistry.
+
+        Args:
+            commands_dir (Path): The directory containing the `free` and `premium` command packages
+        """
+        self.commands_dir = Path(commands_dir)
+        self._entries: Dict[str, CommandEntry] = {}
+        self._failed: Dict[str, str] = {}  # command name: error message
+        self.reload_count = 0
+
+    def _tier_dir(self, tier: str) -> Path:
+        return self.commands_dir / tier
+
+    @staticmethod
+    def _hash_file(path: Path) -> str:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+
+    def _import(self, entry: CommandEntry, reload: bool = False) -> bool:
+        """Imports (or re-imports) the module for an entry. Returns True on success."""
+        try:
+            stat = entry.path.stat()
+            digest = self._hash_file(entry.path)
+            if reload and entry.module is not None:
+                module = importlib.reload(entry.module)
+                self.reload_count += 1
+                log.info(f"Reloaded changed command module '{entry.module_name}'")
+            elif entry.module_name in sys.modules:
+                # Imported before it was indexed (e.g. by an older copy of the executor), may be stale
+                module = importlib.reload(sys.modules[entry.module_name])
+            else:
+                module = importlib.import_module(entry.module_name)
+            entry.module = module
+            entry.mtime_ns = stat.st_mtime_ns
+            entry.size = stat.st_size
+            entry.digest = digest
+            self._failed.pop(entry.name, None)
+            return True
+        except Exception as e:
+            log.error(f"Error importing command module {entry.module_name}: {e}", exc_info=True)
+            self._failed[entry.name] = str(e)
+            return False
+
+    def _refresh_if_changed(self, entry: CommandEntry) -> bool:
+        """
+        Re-imports an entry's module if its file changed on disk.
+
+        Returns:
+            bool: False if the file disappeared or the module can no longer be imported
+        """
+        try:
+            stat = entry.path.stat()
+        except FileNotFoundError:
+            log.warning(f"Command file {entry.path} was removed. Dropping '{entry.name}' from the registry.")
+            self._entries.pop(entry.name, None)
+            return False
+
+        if entry.module is not None and stat.st_mtime_ns == entry.mtime_ns and stat.st_size == entry.size:
+            return True
+
+        # The file was touched; only reload when the content actually changed
+        if entry.module is not None:
+            try:
+                digest = self._hash_file(entry.path)
+            except OSError as e:
+                log.error(f"Error hashing command file {entry.path}: {e}")
+                return True  # Keep serving the loaded version
+            if digest == entry.digest:
+                entry.mtime_ns = stat.st_mtime_ns
+                entry.size = stat.st_size
+                return True
+
+        return self._import(entry, reload=entry.module is not None)
+
+    def _find_file(self, name: str) -> Optional[Tuple[str, Path]]:
+        for tier in COMMAND_TIERS:
+            path = self._tier_dir(tier) / f"{name}{COMMAND_FILE_SUFFIX}"
+            if path.is_file():
+                return tier, path
+        return None
+
+    def scan(self) -> Dict[str, List[str]]:
+        """
+        Index every command module, importing new ones and reloading changed ones.
+
+        Returns:
+            Dict[str, List[str]]: Command names grouped under 'loaded', 'reloaded', 'removed' and 'failed'
+        """
+        report = {'loaded': [], 'reloaded': [], 'removed': [], 'failed': []}
+        seen = set()
+
+        for tier in COMMAND_TIERS:
+            tier_dir = self._tier_dir(tier)
+            if not tier_dir.is_dir():
+                continue
+            for path in sorted(tier_dir.glob(f"*{COMMAND_FILE_SUFFIX}")):
+                name = path.name[:-len(COMMAND_FILE_SUFFIX)]
+                if name in seen:
+                    log.debug(f"Command '{name}' exists in several tiers. Using the {self._entries[name].tier} version.")
+                    continue
+                seen.add(name)
+
+                entry = self._entries.get(name)
+                if entry is not None and entry.path == path:
+                    old_digest = entry.digest
+                    if self._refresh_if_changed(entry):
+                        if entry.digest != old_digest:
+                            report['reloaded'].append(name)
+                    else:
+                        report['failed'].append(name)
+                    continue
+
+                entry = CommandEntry(name, tier, path)
+                self._entries[name] = entry
+                if self._import(entry):
+                    report['loaded'].append(name)
+                else:
+                    report['failed'].append(name)
+
+        for name in list(self._entries):
+            if name not in seen:
+                del self._entries[name]
+                report['removed'].append(name)
+
+        log.info(
+            f"Command registry scan complete. Indexed: {len(self._entries)}, "
+            f"Loaded: {len(report['loaded'])}, Reloaded: {len(report['reloaded'])}, "
+            f"Removed: {len(report['removed'])}, Failed: {len(report['failed'])}"
+        )
+        return report
+
+    def get(self, command_name: str) -> Tuple[Optional[ModuleType], Optional[str]]:
+        """
+        Look up a command module by name.
+
+        Args:
+            command_name (str): The command name, with or without the `_command` suffix
+
+        Returns:
+            Tuple[Optional[ModuleType], Optional[str]]: (module, tier) if found and importable, otherwise (None, None)
+        """
+        if not command_name:
+            log.error("Attempted to get command module with empty command name")
+            return None, None
+
+        name = normalize_command_name(command_name)
+        if name.endswith('_command'):
+            name = name[:-len('_command')]
+        if name != command_name.lower():
+            log.debug(f"Command name '{command_name}' was normalized to '{name}'")
+
+        entry = self._entries.get(name)
+        if entry is None:
+            # The file may have been added after the last scan
+            found = self._find_file(name)
+            if not found:
+                log.warning(f"Command logic file not found for command: {command_name}")
+                return None, None
+            tier, path = found
+            entry = CommandEntry(name, tier, path)
+            self._entries[name] = entry
+            if not self._import(entry):
+                return None, None
+            log.info(f"Indexed new command module '{entry.module_name}'")
+        elif not self._refresh_if_changed(entry):
+            return None, None
+
+        return entry.module, entry.tier
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get registry statistics.
+
+        Returns:
+            Dict[str, int]: Counts of indexed, free, premium and failed modules, and reloads performed
+        """
+        return {
+            'indexed': len(self._entries),
+            'free': sum(1 for e in self._entries.values() if e.tier == 'free'),
+            'premium': sum(1 for e in self._entries.values() if e.tier == 'premium'),
+            'failed': len(self._failed),
+            'reloads': self.reload_count,
+        }
+
+
+# Make sure `commands.<tier>.<name>_command` is importable
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+
+# Create a global instance for easy access
+command_registry = CommandRegistry(BASE_DIR / "commands")
@@ -148,6 +148,7 @@ class ConfigManager:
             "cooldown": 600,
             "cooldown_uses": 3,
             "cooldown_window": 300,
+            "max_context_length": 4096,
             "color": "#607d8b",
             "icon": "🌑",
             "description": "Basic access"
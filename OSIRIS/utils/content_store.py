@@ -0,0 +1,294 @@
+# utils/content_store.py
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.blob_store import BlobStore, blob_store
+from utils.config_manager import config
+from utils.database import Database, market_db
+from utils.saves_index import SavesIndex, saves_index, scan_sidecars
+
+log = logging.getLogger('MyBot.ContentStore')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+
+class ContentStore:
+    """
+    Text of the users' saves and temporary outputs.
+
+    The content lives in the blob store; `user_saves.blob_sha256` and
+    `temp_outputs.blob_sha256` point to it (the save's JSON sidecar records the same
+    key as "blob"). Saves and temp files written before the blob store existed are
+    still read from `saves/<user_id>/<uid>.txt` and `temp/<user_id>.txt` until
+    `migrate_legacy_saves` moves them over. `collect_garbage` expires old temporary
+    outputs and deletes blobs nothing points to.
+    """
+
+    def __init__(self, db: Database, blobs: BlobStore, index: SavesIndex, saves_dir: Path, temp_dir: Path,
+                 temp_ttl_hours: Optional[float] = None, gc_interval_hours: Optional[float] = None,
+                 gc_grace_hours: Optional[float] = None):
+        """
+        Initialize the ContentStore.
+
+        Args:
+            db (Database): The database holding user_saves and temp_outputs
+            blobs (BlobStore): Where the content is stored
+            index (SavesIndex): The saves metadata index
+            saves_dir (Path): Directory of the legacy save files and the metadata sidecars
+            temp_dir (Path): Directory of the legacy temp files
+            temp_ttl_hours (float, optional): Hours a temporary output is kept. Defaults to `vault.temp_ttl_hours`
+            gc_interval_hours (float, optional): Hours between garbage collections. Defaults to `vault.gc_interval_hours`
+            gc_grace_hours (float, optional): Unreferenced blobs younger than this are kept. Defaults to `vault.gc_grace_hours`
+        """
+        self.db = db
+        self.blobs = blobs
+        self.index = index
+        self.saves_dir = Path(saves_dir)
+        self.temp_dir = Path(temp_dir)
+        self.temp_ttl = (temp_ttl_hours or config.get("vault.temp_ttl_hours", 72)) * 3600
+        self.gc_interval = (gc_interval_hours or config.get("vault.gc_interval_hours", 6)) * 3600
+        self.gc_grace = (gc_grace_hours or config.get("vault.gc_grace_hours", 24)) * 3600
+        self._task: Optional[asyncio.Task] = None
+
+    def legacy_save_path(self, user_id: int, uid: str) -> Path:
+        return self.saves_dir / str(user_id) / f"{uid}.txt"
+
+    def legacy_temp_path(self, user_id: int) -> Path:
+        return self.temp_dir / f"{user_id}.txt"
+
+    @staticmethod
+    def _read_legacy(path: Path) -> Optional[str]:
+        try:
+            return path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _set_sidecar_blob(self, user_id: int, uid: str, digest: str):
+        """Record the blob key in a save's metadata sidecar (blocking)."""
+        sidecar = self.saves_dir / str(user_id) / f"{uid}.json"
+        try:
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return
+        metadata['blob'] = digest
+        temp_path = sidecar.with_suffix('.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=4)
+        os.replace(temp_path, sidecar)
+
+    # --- Saves ---
+
+    async def read_save(self, user_id: int, uid: str) -> Optional[str]:
+        """
+        Read the content of a save.
+
+        Args:
+            user_id (int): The owner of the save
+            uid (str): The save's UID
+
+        Returns:
+            str | None: The content, or None if the save has no content
+        """
+        row = await self.index.get_save(user_id, uid)
+        if row and row.get('blob_sha256'):
+            try:
+                return await self.blobs.get(row['blob_sha256'])
+            except FileNotFoundError:
+                log.error(f"Blob {row['blob_sha256']} of save {uid} is missing")
+                return None
+        return await asyncio.to_thread(self._read_legacy, self.legacy_save_path(user_id, uid))
+
+    async def has_save(self, user_id: int, uid: str) -> bool:
+        """Check whether a save has content."""
+        row = await self.index.get_save(user_id, uid)
+        if row and row.get('blob_sha256'):
+            return self.blobs.exists(row['blob_sha256'])
+        return self.legacy_save_path(user_id, uid).is_file()
+
+    async def write_save(self, user_id: int, uid: str, content: str) -> str:
+        """
+        Replace the content of an existing save.
+
+        Args:
+            user_id (int): The owner of the save
+            uid (str): The save's UID
+            content (str): The new content
+
+        Returns:
+            str: The blob key of the new content
+        """
+        digest = await self.blobs.put(content)
+        await self.db.execute('UPDATE user_saves SET blob_sha256 = ? WHERE uid = ? AND user_id = ?', (digest, uid, user_id))
+        await asyncio.to_thread(self._set_sidecar_blob, user_id, uid, digest)
+        await asyncio.to_thread(self._remove, self.legacy_save_path(user_id, uid))
+        return digest
+
+    async def migrate_legacy_saves(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        Move indexed saves that still have a .txt content file into the blob store.
+
+        Args:
+            limit (int, optional): Maximum number of saves to migrate in this call
+
+        Returns:
+            Dict[str, int]: Number of saves migrated, missing a content file, and failed
+        """
+        sql = 'SELECT uid, user_id FROM user_saves WHERE blob_sha256 IS NULL ORDER BY date_created'
+        params = ()
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params = (limit,)
+
+        migrated = missing = failed = 0
+        for row in await self.db.fetchall(sql, params):
+            user_id, uid = row['user_id'], row['uid']
+            try:
+                content = await asyncio.to_thread(self._read_legacy, self.legacy_save_path(user_id, uid))
+                if content is None:
+                    missing += 1
+                    continue
+                await self.write_save(user_id, uid, content)
+                migrated += 1
+            except Exception as e:
+                failed += 1
+                log.error(f"Failed to move save {uid} of user {user_id} into the blob store: {e}")
+
+        result = {'migrated': migrated, 'missing': missing, 'failed': failed}
+        log.info(f"Legacy save migration: {result}")
+        return result
+
+    # --- Temporary outputs ---
+
+    async def write_temp(self, user_id: int, content: str) -> str:
+        """
+        Store a user's temporary output, replacing the previous one.
+
+        Returns:
+            str: The blob key of the content
+        """
+        digest = await self.blobs.put(content)
+        await self.db.execute(
+            'INSERT OR REPLACE INTO temp_outputs (user_id, blob_sha256, updated_at) VALUES (?, ?, ?)',
+            (user_id, digest, time.time())
+        )
+        # Superseded by the new output
+        await asyncio.to_thread(self._remove, self.legacy_temp_path(user_id))
+        return digest
+
+    async def read_temp(self, user_id: int) -> Optional[str]:
+        """
+        Read a user's temporary output.
+
+        Returns:
+            str | None: The content, or None if there is none (or it expired)
+        """
+        cutoff = time.time() - self.temp_ttl
+        row = await self.db.fetchone('SELECT blob_sha256, updated_at FROM temp_outputs WHERE user_id = ?', (user_id,))
+        if row:
+            if row['updated_at'] < cutoff:
+                return None
+            try:
+                return await self.blobs.get(row['blob_sha256'])
+            except FileNotFoundError:
+                log.error(f"Blob {row['blob_sha256']} of the temporary output of user {user_id} is missing")
+                return None
+
+        legacy = self.legacy_temp_path(user_id)
+        try:
+            if legacy.stat().st_mtime < cutoff:
+                return None
+        except FileNotFoundError:
+            return None
+        return await asyncio.to_thread(self._read_legacy, legacy)
+
+    async def has_temp(self, user_id: int) -> bool:
+        """Check whether a user has an unexpired temporary output."""
+        cutoff = time.time() - self.temp_ttl
+        updated_at = await self.db.fetchval('SELECT updated_at FROM temp_outputs WHERE user_id = ?', (user_id,))
+        if updated_at is not None:
+            return updated_at >= cutoff
+        try:
+            return self.legacy_temp_path(user_id).stat().st_mtime >= cutoff
+        except FileNotFoundError:
+            return False
+
+    # --- Garbage collection ---
+
+    def _expire_legacy_temp_files(self, cutoff: float) -> int:
+        removed = 0
+        if not self.temp_dir.is_dir():
+            return removed
+        for entry in os.scandir(self.temp_dir):
+            if entry.is_file() and entry.name.endswith('.txt') and entry.stat().st_mtime < cutoff:
+                self._remove(Path(entry.path))
+                removed += 1
+        return removed
+
+    async def collect_garbage(self) -> Dict[str, int]:
+        """
+        Expire old temporary outputs and delete unreferenced blobs.
+
+        Blobs referenced by a metadata sidecar are kept even if the save is missing
+        from the index, so an indexing failure can't lose content. So are the results
+        of refinement jobs that are waiting to be committed.
+
+        Returns:
+            Dict[str, int]: Expired temp outputs, expired legacy temp files, and the blob collection result
+        """
+        cutoff = time.time() - self.temp_ttl
+        expired = await self.db.execute('DELETE FROM temp_outputs WHERE updated_at < ?', (cutoff,))
+        expired_files = await asyncio.to_thread(self._expire_legacy_temp_files, cutoff)
+
+        referenced = {row['blob_sha256'] for row in await self.db.fetchall('''
+            SELECT blob_sha256 FROM user_saves WHERE blob_sha256 IS NOT NULL
+            UNION SELECT blob_sha256 FROM temp_outputs
+            UNION SELECT result_blob FROM refine_jobs WHERE result_blob IS NOT NULL
+        ''')}
+        sidecars, _ = await asyncio.to_thread(scan_sidecars, self.saves_dir)
+        referenced.update(record['blob_sha256'] for record in sidecars if record.get('blob_sha256'))
+
+        result = await self.blobs.collect_garbage(referenced, grace_seconds=self.gc_grace)
+        result.update({'expired_temp_outputs': expired, 'expired_temp_files': expired_files})
+        return result
+
+    async def _gc_loop(self):
+        while True:
+            await asyncio.sleep(self.gc_interval)
+            try:
+                await self.collect_garbage()
+            except Exception as e:
+                log.error(f"Error during content garbage collection: {e}", exc_info=True)
+
+    def start(self):
+        """Start the periodic garbage collection task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._gc_loop(), name="content-gc")
+
+    async def close(self):
+        """Stop the garbage collection task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Create a global instance for easy access
+content_store = ContentStore(market_db, blob_store, saves_index, BASE_DIR / "saves", BASE_DIR / "temp")
@@ -0,0 +1,184 @@
+# utils/conversation_history.py
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger('MyBot.ConversationHistory')
+
+# Rough characters-per-token ratio used for budgeting (no tokenizer is available for g4f models)
+CHARS_PER_TOKEN = 4
+# Fixed per-message overhead (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# How much of each evicted user turn is kept in the summary note
+SUMMARY_SNIPPET_CHARS = 160
+# Upper bound for the summary note itself
+SUMMARY_MAX_CHARS = 2000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of a text.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: The estimated number of tokens
+    """
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Estimate the token count of a list of chat messages.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat messages with 'role' and 'content' keys
+
+    Returns:
+        int: The estimated number of tokens
+    """
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class ConversationHistory:
+    """
+    Chat history for one GPT session, kept within a token budget.
+
+    - Server context is stored once and only the latest version is sent, attached to
+      the newest user message instead of being repeated in every stored turn.
+    - A turn (user + assistant) is only recorded once the model answered, so retrying
+      a failed request never duplicates the user message.
+    - When the request would exceed the budget the oldest turns are evicted and
+      replaced by a short note listing what was asked in them.
+    """
+
+    def __init__(self, system_prompt: str, max_tokens: int = 4096):
+        """
+        Initialize the ConversationHistory.
+
+        Args:
+            system_prompt (str): The system prompt that starts every request
+            max_tokens (int): Token budget for a full request (the tier's `max_context_length`)
+        """
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.turns: List[Tuple[str, str]] = []  # (user, assistant)
+        self.context: Optional[str] = None
+        self.summary = ""
+        self.evicted_turns = 0
+        self.last_request_tokens = 0
+
+    def set_context(self, context: Optional[str]):
+        """Replace the server context sent with the next request. Older versions are dropped."""
+        if context is not None:
+            self.context = context
+
+    @staticmethod
+    def _summary_message(summary: str, evicted_turns: int) -> Optional[Dict[str, str]]:
+        if not summary:
+            return None
+        return {
+            "role": "system",
+            "content": f"Summary of {evicted_turns} earlier turn(s) removed to save space. The user asked:\n{summary}"
+        }
+
+    @staticmethod
+    def _summarize(summary: str, user: str) -> str:
+        snippet = " ".join(user.split())
+        if len(snippet) > SUMMARY_SNIPPET_CHARS:
+            snippet = snippet[:SUMMARY_SNIPPET_CHARS - 3] + "..."
+        summary += f"- {snippet}\n"
+        if len(summary) > SUMMARY_MAX_CHARS:
+            # Keep the most recent part of the summary
+            summary = summary[-SUMMARY_MAX_CHARS:].split("\n", 1)[-1]
+        return summary
+
+    def _assemble(self, user_prompt: str, turns: List[Tuple[str, str]], summary: str, evicted_turns: int) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": self.system_prompt}]
+        summary_message = self._summary_message(summary, evicted_turns)
+        if summary_message:
+            messages.append(summary_message)
+        for user, assistant in turns:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": assistant})
+        content = user_prompt + self.context if self.context else user_prompt
+        messages.append({"role": "user", "content": content})
+        return messages
+
+    def _fit(self, user_prompt: str):
+        """Evict from copies of the turns and summary until the request fits the budget."""
+        turns, summary, evicted_turns = list(self.turns), self.summary, self.evicted_turns
+        messages = self._assemble(user_prompt, turns, summary, evicted_turns)
+        tokens = estimate_message_tokens(messages)
+
+        while tokens > self.max_tokens and turns:
+            user, _ = turns.pop(0)
+            evicted_turns += 1
+            summary = self._summarize(summary, user)
+            messages = self._assemble(user_prompt, turns, summary, evicted_turns)
+            tokens = estimate_message_tokens(messages)
+
+        # Out of turns to evict; shorten the summary note, oldest entries first
+        while tokens > self.max_tokens and summary:
+            summary = summary.split("\n", 1)[-1] if "\n" in summary.rstrip("\n") else ""
+            messages = self._assemble(user_prompt, turns, summary, evicted_turns)
+            tokens = estimate_message_tokens(messages)
+
+        return messages, tokens, turns, summary, evicted_turns
+
+    def build(self, user_prompt: str) -> List[Dict[str, str]]:
+        """
+        Build the message list for a request without changing the history.
+
+        Turns that don't fit the budget are left out of the messages but stay recorded;
+        `fit` evicts them for good.
+
+        Args:
+            user_prompt (str): The new user message (without server context)
+
+        Returns:
+            List[Dict[str, str]]: The messages to send, within the token budget where possible
+        """
+        return self._fit(user_prompt)[0]
+
+    def fit(self, user_prompt: str) -> List[Dict[str, str]]:
+        """
+        Build the message list for a request that is being sent, evicting the turns that don't fit.
+
+        Evicted turns are replaced by the summary note, so later requests start from the
+        trimmed history.
+
+        Args:
+            user_prompt (str): The new user message (without server context)
+
+        Returns:
+            List[Dict[str, str]]: The messages to send, within the token budget where possible
+        """
+        messages, tokens, self.turns, self.summary, self.evicted_turns = self._fit(user_prompt)
+        if tokens > self.max_tokens:
+            log.warning(f"Request still exceeds the token budget after eviction ({tokens}/{self.max_tokens} tokens)")
+        self.last_request_tokens = tokens
+        return messages
+
+    def commit(self, user_prompt: str, response: str):
+        """
+        Record a completed turn.
+
+        Args:
+            user_prompt (str): The user message that was sent (without server context)
+            response (str): The model's answer
+        """
+        self.turns.append((user_prompt, response))
+
+    def clear(self):
+        """Drop all turns, the context and the summary."""
+        self.turns.clear()
+        self.context = None
+        self.summary = ""
+        self.evicted_turns = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
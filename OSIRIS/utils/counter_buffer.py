@@ -0,0 +1,224 @@
+# utils/counter_buffer.py
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from utils.config_manager import config
+from utils.database import Database, market_db
+
+log = logging.getLogger('MyBot.CounterBuffer')
+
+# app_state key written on a clean shutdown (pending deltas were flushed)
+CLEAN_SHUTDOWN_KEY = "counter_buffer_clean_shutdown:{table}"
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for counter columns.
+
+    Increments are added to an in-memory dict (O(1), no database round trip) and
+    written in one batched transaction every `flush_interval` seconds and on
+    shutdown. Rows read from the database are passed through `apply` so the
+    displayed counts include the deltas that haven't been flushed yet.
+
+    If the process dies before a flush the pending deltas are lost; the optional
+    `reconcile` statements recompute the counters from their source tables on the
+    next start after such an unclean shutdown.
+    """
+
+    def __init__(self, db: Database, table: str, key_column: str, columns: Iterable[str],
+                 flush_interval: Optional[float] = None, reconcile: Tuple[str, ...] = ()):
+        """
+        Initialize the CounterBuffer.
+
+        Args:
+            db (Database): The database holding the table
+            table (str): The table whose counters are buffered
+            key_column (str): The column identifying a row
+            columns (Iterable[str]): The counter columns that may be incremented
+            flush_interval (float, optional): Seconds between flushes. Defaults to `database.counter_flush_interval`
+            reconcile (Tuple[str, ...]): Statements that recompute the counters, run after an unclean shutdown
+        """
+        self.db = db
+        self.table = table
+        self.key_column = key_column
+        self.columns = tuple(columns)
+        self.flush_interval = flush_interval or config.get("database.counter_flush_interval", 5.0)
+        self.reconcile_statements = reconcile
+
+        self._pending: Dict[Any, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.columns, 0))
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.increments = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failed_flushes = 0
+
+    def increment(self, key: Any, column: str, amount: int = 1):
+        """
+        Add to a counter. The change is written on the next flush.
+
+        Args:
+            key (Any): The row key
+            column (str): One of the buffered counter columns
+            amount (int): The delta to add
+        """
+        if column not in self.columns:
+            raise ValueError(f"{column} is not a buffered counter of {self.table}")
+        self._pending[key][column] += amount
+        self.increments += 1
+
+    def pending(self, key: Any) -> Dict[str, int]:
+        """Get the unflushed deltas of a row (all zero if there are none)."""
+        deltas = self._pending.get(key)
+        return dict(deltas) if deltas else dict.fromkeys(self.columns, 0)
+
+    def discard(self, key: Any):
+        """Drop the pending deltas of a row (e.g. when the row is deleted)."""
+        self._pending.pop(key, None)
+
+    def apply(self, row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Merge the pending deltas into a row read from the database.
+
+        Args:
+            row (Dict[str, Any], optional): The row, or None
+
+        Returns:
+            Dict[str, Any]: A copy of the row with current counts (the row itself if nothing is pending)
+        """
+        if row is None:
+            return None
+        deltas = self._pending.get(row.get(self.key_column))
+        if not deltas:
+            return row
+        merged = dict(row)
+        for column, delta in deltas.items():
+            if column in merged:
+                merged[column] = (merged[column] or 0) + delta
+        return merged
+
+    def apply_all(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge the pending deltas into every row of a result set."""
+        if not self._pending:
+            return rows
+        return [self.apply(row) for row in rows]
+
+    async def flush(self) -> int:
+        """
+        Write all pending deltas in a single transaction.
+
+        Returns:
+            int: The number of rows updated
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            # Swap the buffer out so increments made during the write go to the next batch
+            batch, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(self.columns, 0))
+
+            assignments = ", ".join(f"{column} = {column} + ?" for column in self.columns)
+            sql = f"UPDATE {self.table} SET {assignments} WHERE {self.key_column} = ?"
+            params = [(*(deltas[column] for column in self.columns), key) for key, deltas in batch.items()]
+
+            try:
+                await self.db.executemany(sql, params)
+            except Exception as e:
+                # Put the deltas back so they are retried with the next flush
+                for key, deltas in batch.items():
+                    for column, delta in deltas.items():
+                        self._pending[key][column] += delta
+                self.failed_flushes += 1
+                log.error(f"Failed to flush {len(batch)} counter update(s) to {self.table}: {e}")
+                return 0
+
+            self.flushes += 1
+            self.rows_flushed += len(batch)
+            log.debug(f"Flushed counter updates for {len(batch)} row(s) of {self.table}")
+            return len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Error in counter flush loop for {self.table}: {e}", exc_info=True)
+
+    async def start(self):
+        """Reconcile after an unclean shutdown if needed, then start the periodic flush task."""
+        if self._task is not None:
+            return
+
+        state_key = CLEAN_SHUTDOWN_KEY.format(table=self.table)
+        clean = await self.db.fetchval('SELECT value FROM app_state WHERE key = ?', (state_key,))
+        if not clean and self.reconcile_statements:
+            async def reconcile(conn: aiosqlite.Connection) -> int:
+                changed = 0
+                for statement in self.reconcile_statements:
+                    cursor = await conn.execute(statement)
+                    changed += max(cursor.rowcount, 0)
+                return changed
+
+            started = time.monotonic()
+            changed = await self.db.transaction(reconcile)
+            log.info(f"Reconciled {self.table} counters after an unclean shutdown: {changed} row(s) corrected in {time.monotonic() - started:.2f}s")
+        # Until the next clean shutdown, a crash may lose buffered deltas
+        await self.db.execute('DELETE FROM app_state WHERE key = ?', (state_key,))
+
+        self._task = asyncio.create_task(self._flush_loop(), name=f"counter-flush:{self.table}")
+
+    async def close(self):
+        """Stop the flush task, write the remaining deltas and record the clean shutdown."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+        if not self._pending:
+            await self.db.execute(
+                'INSERT OR REPLACE INTO app_state (key, value, updated_at) VALUES (?, ?, ?)',
+                (CLEAN_SHUTDOWN_KEY.format(table=self.table), '1', time.time())
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get buffer statistics.
+
+        Returns:
+            Dict[str, int]: Pending rows, increments received, flushes, rows flushed and failed flushes
+        """
+        return {
+            'pending_rows': len(self._pending),
+            'increments': self.increments,
+            'flushes': self.flushes,
+            'rows_flushed': self.rows_flushed,
+            'failed_flushes': self.failed_flushes,
+        }
+
+
+# Create a global instance for the market listing counters
+market_counters = CounterBuffer(
+    market_db, 'market_listings', 'uid', ('saves_count', 'stars_count'),
+    # The counters mirror the rows in user_market_saves / user_market_awards
+    reconcile=(
+        '''
+        UPDATE market_listings SET saves_count = (SELECT COUNT(*) FROM user_market_saves ums WHERE ums.uid = market_listings.uid)
+        WHERE saves_count != (SELECT COUNT(*) FROM user_market_saves ums WHERE ums.uid = market_listings.uid)
+        ''',
+        '''
+        UPDATE market_listings SET stars_count = (SELECT COUNT(*) FROM user_market_awards uma WHERE uma.uid = market_listings.uid)
+        WHERE stars_count != (SELECT COUNT(*) FROM user_market_awards uma WHERE uma.uid = market_listings.uid)
+        ''',
+    ),
+)
@@ -0,0 +1,275 @@
+# utils/database.py
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiosqlite
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.Database')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+# Applied to every connection. WAL lets the readers run while the writer commits.
+CONNECTION_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-8000",      # 8 MB page cache per connection
+    "mmap_size=67108864",    # 64 MB
+    "foreign_keys=ON",       # Needed for ON DELETE CASCADE
+)
+
+WriteOperation = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+def dict_row(cursor, row) -> Dict[str, Any]:
+    """Row factory that returns plain dicts (supports both row['key'] and row.get('key'))."""
+    return {column[0]: row[index] for index, column in enumerate(cursor.description)}
+
+
+class Database:
+    """
+    Long-lived connections to an SQLite database.
+
+    Reads are served by a small pool of read-only connections. All writes go through a
+    single writer task that runs each operation in its own `BEGIN IMMEDIATE` transaction,
+    so multi-step writes are atomic and writers never contend for the lock. The
+    connections stay open, so sqlite3's per-connection statement cache keeps the
+    prepared statements around between calls.
+    """
+
+    def __init__(self, path: Path, readers: Optional[int] = None, busy_timeout: Optional[float] = None):
+        """
+        Initialize the Database.
+
+        Args:
+            path (Path): The SQLite database file
+            readers (int, optional): Number of reader connections. Defaults to `database.pool_size`
+            busy_timeout (float, optional): Seconds to wait for a lock. Defaults to `database.connection_timeout`
+        """
+        self.path = Path(path)
+        self.reader_count = readers or config.get("database.pool_size", 5)
+        self.busy_timeout = busy_timeout or config.get("database.connection_timeout", 30)
+        self.cached_statements = config.get("database.cached_statements", 256)
+
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_connections: List[aiosqlite.Connection] = []
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+
+        self.reads = 0
+        self.writes = 0
+        self.failed_writes = 0
+        self.write_wait_total = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._writer_task is not None
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,  # Transactions are managed explicitly by the writer
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = dict_row
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(f"PRAGMA {pragma}")
+        if read_only:
+            await conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    async def start(self):
+        """Open the connections and start the writer task. Safe to call more than once."""
+        async with self._start_lock:
+            if self.started:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            # The writer is opened first so WAL mode is set before the readers attach
+            self._writer = await self._connect()
+            self._readers = asyncio.Queue()
+            for _ in range(self.reader_count):
+                conn = await self._connect(read_only=True)
+                self._reader_connections.append(conn)
+                self._readers.put_nowait(conn)
+
+            self._write_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer_loop(), name=f"db-writer:{self.path.name}")
+            log.info(f"Database '{self.path}' opened with {self.reader_count} reader(s) and 1 writer")
+
+    async def close(self):
+        """Finish queued writes, stop the writer task and close all connections."""
+        async with self._start_lock:
+            if not self.started:
+                return
+            self._write_queue.put_nowait(None)
+            try:
+                await self._writer_task
+            except Exception as e:
+                log.error(f"Database writer task ended with an error: {e}", exc_info=True)
+            self._writer_task = None
+
+            for conn in [self._writer, *self._reader_connections]:
+                try:
+                    await conn.close()
+                except Exception as e:
+                    log.error(f"Error closing database connection: {e}")
+            self._writer = None
+            self._reader_connections.clear()
+            self._readers = None
+            log.info(f"Database '{self.path}' closed")
+
+    # --- Writer ---
+
+    async def _writer_loop(self):
+        while True:
+            item = await self._write_queue.get()
+            if item is None:
+                break
+            operation, future, in_transaction, queued_at = item
+            if future.cancelled():
+                continue
+            self.write_wait_total += time.monotonic() - queued_at
+
+            try:
+                if in_transaction:
+                    await self._writer.execute("BEGIN IMMEDIATE")
+                result = await operation(self._writer)
+                if in_transaction:
+                    await self._writer.execute("COMMIT")
+                self.writes += 1
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                await self._rollback()
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                self.failed_writes += 1
+                if in_transaction:
+                    await self._rollback()
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _rollback(self):
+        try:
+            if self._writer.in_transaction:
+                await self._writer.execute("ROLLBACK")
+        except Exception as e:
+            log.error(f"Error rolling back transaction: {e}")
+
+    async def _submit(self, operation: WriteOperation, in_transaction: bool) -> Any:
+        if not self.started:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((operation, future, in_transaction, time.monotonic()))
+        return await future
+
+    async def transaction(self, operation: WriteOperation) -> Any:
+        """
+        Run a write operation in a single transaction on the writer connection.
+
+        Args:
+            operation (WriteOperation): Coroutine function taking the writer connection.
+                Everything it executes is committed together, or rolled back if it raises
+
+        Returns:
+            Any: Whatever the operation returned
+        """
+        return await self._submit(operation, in_transaction=True)
+
+    async def execute(self, sql: str, params: Iterable[Any] = ()) -> int:
+        """
+        Execute a single write statement.
+
+        Returns:
+            int: The number of affected rows
+        """
+        async def operation(conn: aiosqlite.Connection) -> int:
+            cursor = await conn.execute(sql, tuple(params))
+            return cursor.rowcount
+        return await self.transaction(operation)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable[Iterable[Any]]) -> int:
+        """
+        Execute a write statement for every parameter set, in one transaction.
+
+        Returns:
+            int: The number of affected rows
+        """
+        async def operation(conn: aiosqlite.Connection) -> int:
+            cursor = await conn.executemany(sql, [tuple(p) for p in seq_of_params])
+            return cursor.rowcount
+        return await self.transaction(operation)
+
+    async def executescript(self, script: str):
+        """Run an SQL script on the writer connection (the script manages its own transactions)."""
+        async def operation(conn: aiosqlite.Connection):
+            await conn.executescript(script)
+        await self._submit(operation, in_transaction=False)
+
+    # --- Readers ---
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection from the pool."""
+        if not self.started:
+            await self.start()
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        """Run a query and return all rows as dicts."""
+        async with self.reader() as conn:
+            self.reads += 1
+            async with conn.execute(sql, tuple(params)) as cursor:
+                return await cursor.fetchall()
+
+    async def fetchone(self, sql: str, params: Iterable[Any] = ()) -> Optional[Dict[str, Any]]:
+        """Run a query and return the first row as a dict, or None."""
+        async with self.reader() as conn:
+            self.reads += 1
+            async with conn.execute(sql, tuple(params)) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchval(self, sql: str, params: Iterable[Any] = (), default: Any = None) -> Any:
+        """Run a query and return the first column of the first row."""
+        row = await self.fetchone(sql, params)
+        if row is None:
+            return default
+        return next(iter(row.values()), default)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool statistics.
+
+        Returns:
+            Dict[str, Any]: Read/write counts, failed writes, queued writes and average write wait (ms)
+        """
+        return {
+            'reads': self.reads,
+            'writes': self.writes,
+            'failed_writes': self.failed_writes,
+            'queued_writes': self._write_queue.qsize() if self._write_queue else 0,
+            'idle_readers': self._readers.qsize() if self._readers else 0,
+            'avg_write_wait_ms': round(self.write_wait_total / self.writes * 1000, 2) if self.writes else 0.0,
+        }
+
+
+# Create a global instance for the market database
+market_db = Database(BASE_DIR / config.get("database.path", "market.db"))
@@ -0,0 +1,127 @@
+# utils/edit_coalescer.py
+
+import logging
+from typing import List, Optional, Sequence
+
+import discord
+
+from utils.execution_planner import Accesses, Step, find_runs
+
+log = logging.getLogger('MyBot.EditCoalescer')
+
+# Discord's limit for the audit log reason header
+MAX_REASON_LENGTH = 512
+
+
+class EditCoalescer:
+    """
+    Merges runs of command-file lines that edit the same role or channel into one `edit()` call.
+
+    Lines of a run don't need to be adjacent, but no line between them may conflict
+    with the object (per the execution planner's accesses), and a rename ends the run,
+    since later lines can't refer to the object by its old name any more.
+    """
+
+    @staticmethod
+    def _fields(module, args: Optional[dict]) -> Optional[dict]:
+        """
+        Get the `edit()` fields of a command-file line, through its module's hooks.
+
+        A command module takes part in merging by defining both:
+
+        - `EDIT_TARGET`: 'role' or 'channel', which is also the name of the argument
+          naming the object
+        - `edit_fields(args)`: the `edit()` keyword arguments of the line, or None when
+          the line has to run on its own. The special field `everyone_overwrite` patches
+          the @everyone permission overwrite instead of being passed to `edit()`
+        """
+        if getattr(module, 'EDIT_TARGET', None) not in ('role', 'channel') or not callable(getattr(module, 'edit_fields', None)):
+            return None
+        try:
+            return module.edit_fields(args or {})
+        except Exception as e:
+            log.debug(f"edit_fields() of {module.__name__} failed: {e}")
+            return None
+
+    def groups(self, steps: Sequence[Step], modules: Sequence, accesses: Sequence[Optional[Accesses]]) -> List[List[int]]:
+        """
+        Find the runs of lines that can be merged.
+
+        Args:
+            steps (Sequence[Step]): The parsed lines, in file order
+            modules (Sequence): The command module of each line (None for lines that don't run)
+            accesses (Sequence[Accesses | None]): The planner accesses of each line
+
+        Returns:
+            List[List[int]]: Runs of two or more line indices, in file order
+        """
+        keys, ends = [], []
+        for index, (command_name, args) in enumerate(steps):
+            module = modules[index]
+            fields = self._fields(module, args) if command_name and module else None
+            ref = (args or {}).get(module.EDIT_TARGET) if fields and accesses[index] is not None else None
+            # Lines naming the object differently (ID vs. name) stay apart; their accesses still order them
+            keys.append((module.EDIT_TARGET, ref.strip()) if ref else None)
+            ends.append(bool(ref) and 'name' in fields)
+        return find_runs(keys, accesses, ends)
+
+    @staticmethod
+    def _find(guild: discord.Guild, kind: str, ref: str):
+        """Find the object the same way the command modules do (ID, then exact name)."""
+        ref = ref.strip()
+        if ref.isdigit():
+            return guild.get_role(int(ref)) if kind == 'role' else guild.get_channel(int(ref))
+        return discord.utils.get(guild.roles if kind == 'role' else guild.channels, name=ref)
+
+    async def run(self, interaction: discord.Interaction, lines: Sequence[int], steps: Sequence[Step], modules: Sequence) -> List[Optional[str]]:
+        """
+        Apply a run of lines with a single edit.
+
+        Returns:
+            List[str | None]: For each line, None if it succeeded or the error it failed with
+        """
+        guild = interaction.guild
+        first_module = modules[lines[0]]
+        kind = first_module.EDIT_TARGET
+        ref = steps[lines[0]][1][kind]
+        if guild is None:
+            return ["Not in a guild context"] * len(lines)
+        target = self._find(guild, kind, ref)
+        if target is None:
+            return [f"{kind.capitalize()} '{ref}' not found"] * len(lines)
+        if kind == 'role' and target >= guild.me.top_role:
+            return [f"Role '{target.name}' is higher than or equal to the bot's highest role"] * len(lines)
+
+        fields, reasons = {}, []
+        for index in lines:
+            line_fields = self._fields(modules[index], steps[index][1])
+            if 'everyone_overwrite' in line_fields:
+                fields['everyone_overwrite'] = {**fields.get('everyone_overwrite', {}), **line_fields.pop('everyone_overwrite')}
+            fields.update(line_fields)
+            reason = (steps[index][1] or {}).get('reason')
+            if reason and reason not in reasons:
+                reasons.append(reason)
+
+        patch = fields.pop('everyone_overwrite', None)
+        if patch is not None:
+            overwrites = dict(target.overwrites)
+            overwrite = overwrites.get(guild.default_role, discord.PermissionOverwrite())
+            overwrite.update(**patch)
+            if overwrite.is_empty():
+                overwrites.pop(guild.default_role, None)
+            else:
+                overwrites[guild.default_role] = overwrite
+            fields['overwrites'] = overwrites
+
+        reason = "; ".join(reasons) or f"Command file edits ({len(lines)} lines)"
+        try:
+            await target.edit(**fields, reason=reason[:MAX_REASON_LENGTH])
+        except discord.HTTPException as e:
+            log.warning(f"Coalesced edit of {kind} '{ref}' (lines {', '.join(str(i + 1) for i in lines)}) failed: {e}")
+            return [str(e)] * len(lines)
+        log.info(f"Applied {len(lines)} lines to {kind} '{ref}' with one edit ({', '.join(fields)})")
+        return [None] * len(lines)
+
+
+# Create a global instance for easy access
+edit_coalescer = EditCoalescer()
@@ -0,0 +1,423 @@
+# utils/execution_planner.py
+
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+import discord
+
+from utils.command_registry import normalize_command_name
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.ExecutionPlanner')
+
+# A resource is ('role', name), ('channel', name), ('member', id) or a collection such as ('roles',)
+Resource = Tuple[str, ...]
+# Access modes. Collections additionally take intent modes: 'ir'/'iw' when one member is read/written
+READ, WRITE, INTENT_READ, INTENT_WRITE = 'r', 'w', 'ir', 'iw'
+Accesses = Dict[Resource, str]
+
+GUILD: Resource = ('guild',)
+ROLES: Resource = ('roles',)
+CHANNELS: Resource = ('channels',)
+MEMBERS: Resource = ('members',)
+EMOJIS: Resource = ('emojis',)
+_COLLECTIONS = {'role': ROLES, 'channel': CHANNELS, 'member': MEMBERS}
+
+_MENTION = re.compile(r'^<(#|@&|@!?)(\d+)>$')
+
+# Command lines with a parsed command name and args; None names are lines with nothing to run
+Step = Tuple[Optional[str], Optional[dict]]
+
+
+def _conflicts(a: str, b: str) -> bool:
+    """Whether two accesses to the same resource must keep their order."""
+    if WRITE in (a, b):
+        return True
+    # Reading a whole collection vs. writing one of its members
+    return {a, b} == {READ, INTENT_WRITE}
+
+
+def accesses_conflict(a: Optional[Accesses], b: Optional[Accesses]) -> bool:
+    """Whether two steps must keep their order (None accesses are barriers)."""
+    if a is None or b is None:
+        return True
+    return any(_conflicts(mode, b[resource]) for resource, mode in a.items() if resource in b)
+
+
+def merge_accesses(a: Accesses, b: Accesses) -> Accesses:
+    """Get the accesses of two steps run as one."""
+    merged = dict(a)
+    for resource, mode in b.items():
+        merged[resource] = _stronger(merged.get(resource), mode)
+    return merged
+
+
+def find_runs(keys: Sequence[Optional[Hashable]], accesses: Sequence[Optional[Accesses]], ends: Sequence[bool] = ()) -> List[List[int]]:
+    """
+    Find runs of steps with the same key that can be carried out as one.
+
+    The steps of a run don't need to be adjacent, but no step between them may conflict
+    with the accesses of the run so far.
+
+    Args:
+        keys (Sequence[Hashable | None]): The run key of each step; None for steps that don't join runs
+        accesses (Sequence[Accesses | None]): The accesses of each step
+        ends (Sequence[bool]): Steps that close their run after joining it
+
+    Returns:
+        List[List[int]]: Runs of two or more step indices, in file order
+    """
+    runs: Dict[Hashable, dict] = {}  # key -> {'steps', 'accesses'}
+    found: List[List[int]] = []
+
+    def close(key):
+        run = runs.pop(key)
+        if len(run['steps']) > 1:
+            found.append(run['steps'])
+
+    for index, key in enumerate(keys):
+        # This step sits between the steps of every other open run
+        for other in list(runs):
+            if other != key and accesses_conflict(accesses[index], runs[other]['accesses']):
+                close(other)
+        if key is None:
+            continue
+
+        if key in runs:
+            run = runs[key]
+            run['steps'].append(index)
+            run['accesses'] = merge_accesses(run['accesses'], accesses[index] or {})
+        else:
+            runs[key] = {'steps': [index], 'accesses': dict(accesses[index] or {})}
+        if index < len(ends) and ends[index]:
+            close(key)
+
+    for key in list(runs):
+        close(key)
+    return sorted(found)
+
+
+def _stronger(a: Optional[str], b: str) -> str:
+    if a is None or a == b:
+        return b
+    if WRITE in (a, b):
+        return WRITE
+    if {a, b} == {READ, INTENT_WRITE}:
+        return WRITE  # Holds both
+    order = (INTENT_READ, READ, INTENT_WRITE)
+    return max(a, b, key=order.index)
+
+
+class ExecutionPlan:
+    """The steps of a command file and, for each step, the earlier steps it has to wait for."""
+
+    def __init__(self, steps: Sequence[Step], accesses: List[Optional[Accesses]], deps: List[Set[int]], barriers: Set[int]):
+        self.steps = list(steps)
+        self.accesses = accesses
+        self.deps = deps
+        self.barriers = barriers
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def depth(self) -> int:
+        """Get the length of the longest dependency chain (1 when everything can run at once)."""
+        levels: List[int] = []
+        for deps in self.deps:
+            levels.append(1 + max((levels[d] for d in deps), default=0))
+        return max(levels, default=0)
+
+
+class ExecutionPlanner:
+    """
+    Runs the lines of a command file concurrently where they don't depend on each other.
+
+    Each command is mapped to the resources it reads and writes: a role, channel or
+    member by name/ID, or a whole collection (roles, channels, members, emojis, the
+    guild) when it reorders or lists them. A line depends on every earlier line with a
+    conflicting access: writes are ordered against all other accesses to the resource,
+    and reading a collection is ordered against writes to any of its members. Commands
+    the planner doesn't know act as barriers, so they keep running strictly in file
+    order. A command module can describe itself with a `resources(args)` function
+    returning a `{resource: mode}` dict.
+    """
+
+    def __init__(self, max_parallel: Optional[int] = None):
+        """
+        Initialize the ExecutionPlanner.
+
+        Args:
+            max_parallel (int, optional): Commands run at once. Defaults to `executor.max_parallel_commands`
+        """
+        self.max_parallel = max_parallel or config.get("executor.max_parallel_commands", 4)
+
+    # --- Resource inference ---
+
+    @staticmethod
+    def resolve(kind: str, ref: str, guild: Optional[discord.Guild]) -> Resource:
+        """Turn a role/channel/member reference (name, ID or mention) into a resource key."""
+        ref = ref.strip()
+        match = _MENTION.match(ref)
+        snowflake = int(match.group(2)) if match else int(ref) if ref.isdigit() else None
+        if kind == 'member':
+            if snowflake is None and guild is not None:
+                member = guild.get_member_named(ref.lstrip('@'))
+                snowflake = member.id if member else None
+            return ('member', str(snowflake) if snowflake is not None else ref.lstrip('@').lower())
+
+        if snowflake is not None and guild is not None:
+            target = guild.get_role(snowflake) if kind == 'role' else guild.get_channel_or_thread(snowflake)
+            ref = target.name if target is not None else str(snowflake)
+        name = ref.lstrip('@' if kind == 'role' else '#').lower()
+        if kind == 'channel':
+            name = name.replace(' ', '-')  # Text channel names can't contain spaces
+        return (kind, name)
+
+    def _infer(self, command_name: str, args: dict, guild: Optional[discord.Guild]) -> Optional[Accesses]:
+        """Get the accesses of a command, or None if it must run as a barrier."""
+        name = normalize_command_name(command_name)
+        if name.endswith('_command'):
+            name = name[:-len('_command')]
+        args = args or {}
+        op = (args.get('operation') or args.get('action') or '').lower()
+        accesses: Accesses = {}
+
+        def use(kind: str, arg: str, mode: str, fallback: Optional[str] = None):
+            value = args.get(arg) or (args.get(fallback) if fallback else None)
+            if value:
+                resource = self.resolve(kind, value, guild)
+                accesses[resource] = _stronger(accesses.get(resource), mode)
+
+        def collection(resource: Resource, mode: str):
+            accesses[resource] = _stronger(accesses.get(resource), mode)
+
+        # --- Roles ---
+        if name == 'role_manager' and op in ('assign', 'remove'):
+            name = 'role_assign'
+        elif name == 'role_manager' and op in ('create', 'delete', 'edit', 'info', 'list'):
+            name = f"role_{op}"
+        elif name == 'role_manager' and op in ('color', 'hoist', 'mentionable'):
+            name = 'role_edit'
+
+        if name in ('role_create', 'role_edit', 'role_color', 'role_hoist', 'role_mentionable', 'role_delete'):
+            use('role', 'role', WRITE)
+            use('role', 'name', WRITE)
+            if args.get('position'):
+                collection(ROLES, WRITE)
+        elif name == 'role_info':
+            use('role', 'role', READ)
+        elif name == 'role_list':
+            collection(ROLES, READ)
+        elif name == 'role_reorder':
+            collection(ROLES, WRITE)
+        elif name in ('role_assign', 'role_remove'):
+            use('member', 'user', WRITE)
+            use('role', 'role', READ)
+
+        # --- Channels and categories ---
+        elif name == 'channel_manager' and op in ('create', 'delete', 'edit', 'lock', 'unlock', 'slowmode', 'clone', 'move', 'sync'):
+            return self._infer(f"channel_{op}", args, guild)
+        elif name in ('channel_create', 'channel_delete', 'channel_edit', 'channel_lock', 'channel_unlock', 'channel_slowmode'):
+            use('channel', 'channel', WRITE)
+            use('channel', 'name', WRITE)
+            use('channel', 'category', READ)
+            if args.get('position') or (name == 'channel_edit' and args.get('category')):
+                collection(CHANNELS, WRITE)
+        elif name == 'channel_clone':
+            use('channel', 'channel', READ)
+            use('channel', 'name' if args.get('name') else 'channel', WRITE)
+        elif name in ('channel_move', 'channel_reorder'):
+            collection(CHANNELS, WRITE)
+        elif name == 'channel_sync':
+            use('channel', 'channel', WRITE)
+            use('channel', 'category', READ)
+        elif name == 'category_manager':
+            if op == 'create':
+                use('channel', 'name', WRITE, fallback='category')
+                if args.get('position'):
+                    collection(CHANNELS, WRITE)
+            elif op == 'rename':
+                use('channel', 'category', WRITE)
+                use('channel', 'name', WRITE)
+            elif op == 'info':
+                use('channel', 'category', READ, fallback='name')
+            elif op == 'list':
+                collection(CHANNELS, READ)
+            elif op in ('delete', 'move'):
+                collection(CHANNELS, WRITE)  # Moves or orphans the channels inside
+            else:
+                return None
+        elif name == 'thread_manager':
+            mode = READ if op in ('info', 'list') else WRITE
+            if not args.get('channel') and not args.get('thread'):
+                return None
+            use('channel', 'thread', mode)
+            use('channel', 'channel', mode if not args.get('thread') else READ)
+            use('member', 'user', READ)
+
+        # --- Permissions, members and messages ---
+        elif name == 'permission_manager':
+            if op == 'sync':
+                collection(CHANNELS, WRITE)
+            else:
+                use('channel', 'channel', READ if op == 'view' else WRITE)
+                use('channel', 'source_channel', READ)
+                use('role', 'target', READ)
+                use('member', 'target', READ)
+        elif name == 'user_manager':
+            use('member', 'user', WRITE if op == 'nickname' else READ)
+            if op == 'roles':
+                collection(ROLES, READ)
+        elif name in ('message_send', 'message_advanced', 'reaction_roles', 'webhook_manager'):
+            if not args.get('channel'):
+                return None
+            use('channel', 'channel', WRITE)  # Messages in one channel keep their order
+            if name == 'reaction_roles':
+                collection(ROLES, READ)
+        elif name == 'message_search':
+            use('channel', 'channel', READ)
+            use('channel', 'output_channel', WRITE)
+            use('member', 'user', READ)
+        elif name == 'emoji_manager':
+            collection(EMOJIS, READ if op.startswith('list') else WRITE)
+            if args.get('roles'):
+                collection(ROLES, READ)
+        elif name == 'server_info':
+            collection(GUILD, READ)
+            use('channel', 'channel', WRITE)
+        elif name == 'notice':
+            pass  # Shown by the executor itself
+        else:
+            return None
+
+        # Intent locks on the collections of the members touched
+        for resource, mode in list(accesses.items()):
+            parent = _COLLECTIONS.get(resource[0]) if len(resource) > 1 else None
+            if parent is not None:
+                collection(parent, INTENT_WRITE if mode == WRITE else INTENT_READ)
+        for resource, mode in list(accesses.items()):
+            if resource != GUILD:
+                collection(GUILD, INTENT_WRITE if mode in (WRITE, INTENT_WRITE) else INTENT_READ)
+        return accesses
+
+    def accesses_of(self, command_name: str, args: dict, module=None, guild: Optional[discord.Guild] = None) -> Optional[Accesses]:
+        """
+        Get the resources a command reads and writes.
+
+        Args:
+            command_name (str): The command name from the file
+            args (dict): The parsed arguments
+            module: The command module, whose optional `resources(args)` function takes precedence
+            guild (discord.Guild, optional): Used to resolve IDs and mentions to names
+
+        Returns:
+            Accesses | None: `{resource: mode}`, or None if the command must run as a barrier
+        """
+        describe = getattr(module, 'resources', None)
+        if callable(describe):
+            try:
+                return dict(describe(args or {}))
+            except Exception as e:
+                log.warning(f"resources() of command '{command_name}' failed, running it as a barrier: {e}")
+                return None
+        try:
+            return self._infer(command_name, args, guild)
+        except Exception as e:
+            log.warning(f"Could not infer the resources of command '{command_name}', running it as a barrier: {e}")
+            return None
+
+    # --- Planning ---
+
+    def plan(self, steps: Sequence[Step], accesses: Sequence[Optional[Accesses]], ordered: Sequence[int] = ()) -> ExecutionPlan:
+        """
+        Build the dependency graph of a command file.
+
+        Args:
+            steps (Sequence[Step]): The parsed lines, in file order
+            accesses (Sequence[Accesses | None]): The accesses of each step; None makes it a barrier, {} makes it free-standing
+            ordered (Sequence[int]): Steps that wait for every earlier step without blocking later ones (e.g. notices)
+
+        Returns:
+            ExecutionPlan: The plan
+        """
+        ordered = set(ordered)
+        deps: List[Set[int]] = []
+        barriers: Set[int] = set()
+        last_barrier: Optional[int] = None
+        holders: Dict[Resource, List[Tuple[int, str]]] = {}  # Accesses since the last barrier
+
+        for index, access in enumerate(accesses):
+            if index in ordered:
+                deps.append(set(range(index)))
+                continue
+            if access is None:
+                # Waits for everything before it; everything after waits for it
+                deps.append(set(i for i in range(index) if i not in ordered))
+                barriers.add(index)
+                last_barrier = index
+                holders = {}
+                continue
+
+            step_deps = {last_barrier} if last_barrier is not None else set()
+            for resource, mode in access.items():
+                for other, other_mode in holders.get(resource, ()):
+                    if _conflicts(mode, other_mode):
+                        step_deps.add(other)
+            for resource, mode in access.items():
+                holders.setdefault(resource, []).append((index, mode))
+            deps.append(step_deps)
+
+        return ExecutionPlan(steps, list(accesses), deps, barriers)
+
+    async def run(self, plan: ExecutionPlan, worker: Callable[[int], Awaitable[None]],
+                  max_parallel: Optional[int] = None) -> AsyncIterator[int]:
+        """
+        Run the steps of a plan, each as soon as its dependencies finished.
+
+        Yields the index of every finished step, in completion order. A failing worker
+        counts as finished (later steps still run, as they did sequentially). Closing
+        the iterator early cancels the steps still running.
+
+        Args:
+            plan (ExecutionPlan): The plan to run
+            worker (Callable[[int], Awaitable[None]]): Runs one step by index; should handle its own errors
+            max_parallel (int, optional): Steps run at once. Defaults to `max_parallel`
+        """
+        limit = max(1, max_parallel or self.max_parallel)
+        waiting = {index: set(deps) for index, deps in enumerate(plan.deps)}
+        dependents: Dict[int, List[int]] = {index: [] for index in waiting}
+        for index, deps in waiting.items():
+            for dep in deps:
+                dependents[dep].append(index)
+        ready = [index for index, deps in waiting.items() if not deps]
+        running: Dict[asyncio.Task, int] = {}
+
+        try:
+            while ready or running:
+                # Start in file order, so the progress reads roughly like the sequential run
+                ready.sort(reverse=True)
+                while ready and len(running) < limit:
+                    index = ready.pop()
+                    running[asyncio.create_task(worker(index))] = index
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=running.get):
+                    index = running.pop(task)
+                    if not task.cancelled() and task.exception() is not None:
+                        log.error(f"Step {index + 1} of the plan raised: {task.exception()}")
+                    for dependent in dependents[index]:
+                        waiting[dependent].discard(index)
+                        if not waiting[dependent]:
+                            ready.append(dependent)
+                    yield index
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+
+# Create a global instance for easy access
+execution_planner = ExecutionPlanner()
@@ -3,16 +3,20 @@
 import logging
 from g4f.client import Client
 
+from utils.llm_backend import llm_backend
+
 # Set up logging
 log = logging.getLogger('MyBot.GPTUtils')
 
-def create_gpt_client():
-    """Creates and returns a new g4f Client instance."""
-    return Client()
+def create_gpt_client() -> Client:
+    """Returns the shared g4f Client instance."""
+    return llm_backend.client
 
 def generate_response(messages, model="gpt-4o-mini"):
     """
-    Generate a response using the g4f client.
+    Generate a response using the shared g4f client.
+
+    This call blocks. Code running on the event loop should use `async_generate_response`.
 
     Args:
         messages (list): List of message dictionaries with 'role' and 'content' keys
@@ -22,21 +26,14 @@ def generate_response(messages, model="gpt-4o-mini"):
         str: The generated response text
     """
     try:
-        client = create_gpt_client()
-        # Note: g4f doesn't support most parameters like temperature, tokens, etc.
-        # Only model and messages are passed, and even model might be ignored
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
-        return response.choices[0].message.content
+        return llm_backend.complete_sync(messages, model=model)
     except Exception as e:
         log.error(f"Error generating GPT response: {e}")
         return f":x: Error communicating with the AI model: {str(e)}"
 
 async def async_generate_response(messages, model="gpt-4o-mini"):
     """
-    Asynchronous wrapper for generate_response.
+    Generate a response without blocking the event loop.
 
     Args:
         messages (list): List of message dictionaries with 'role' and 'content' keys
@@ -45,5 +42,8 @@ async def async_generate_response(messages, model="gpt-4o-mini"):
     Returns:
         str: The generated response text
     """
-    # This is a simple wrapper that can be expanded with proper async implementation if needed
-    return generate_response(messages, model)
+    try:
+        return await llm_backend.complete(messages, model=model)
+    except Exception as e:
+        log.error(f"Error generating GPT response: {e}")
+        return f":x: Error communicating with the AI model: {str(e)}"
@@ -0,0 +1,286 @@
+# utils/guild_snapshot.py
+
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+log = logging.getLogger('MyBot.GuildSnapshot')
+
+# Role permissions that affect channel access, in the order they are listed in the prompt
+KEY_ROLE_PERMISSIONS = (
+    "administrator",
+    "manage_channels",
+    "manage_roles",
+    "manage_guild",
+    "view_channel",
+    "send_messages",
+    "connect",
+    "speak",
+)
+
+
+def _role_overwrites(channel) -> List[Tuple[discord.Role, discord.PermissionOverwrite]]:
+    """Returns only the role overwrites of a channel (member overwrites are left out of the prompt)."""
+    overwrites = getattr(channel, 'overwrites', None)
+    if not overwrites:
+        return []
+    return [(target, overwrite) for target, overwrite in overwrites.items() if isinstance(target, discord.Role)]
+
+
+def _access_info(channel_type: str, overwrite: discord.PermissionOverwrite) -> List[str]:
+    """Describes the view/send/connect state of a single overwrite."""
+    # pair() resolves the overwrite once instead of scanning it per permission
+    allow, deny = overwrite.pair()
+    access_info = []
+
+    if allow.view_channel:
+        access_info.append("can view")
+    elif deny.view_channel:
+        access_info.append("cannot view")
+
+    if channel_type == 'text':
+        if allow.send_messages:
+            access_info.append("can send messages")
+        elif deny.send_messages:
+            access_info.append("cannot send messages")
+
+    if channel_type == 'voice':
+        if allow.connect:
+            access_info.append("can connect")
+        elif deny.connect:
+            access_info.append("cannot connect")
+
+    return access_info
+
+
+def render_role(role: discord.Role) -> str:
+    """Renders the prompt lines for one role."""
+    parts = [f"Role: {role.name} (Position: {role.position})\n"]
+    key_perms = [name for name in KEY_ROLE_PERMISSIONS if getattr(role.permissions, name)]
+    if key_perms:
+        parts.append(f"  Key Permissions: {', '.join(key_perms)}\n")
+    return "".join(parts)
+
+
+def render_channel(channel, categorized: bool) -> str:
+    """Renders the prompt lines for one channel, either at the top level or inside its category."""
+    indent = "  " if categorized else ""
+    channel_type = str(channel.type)
+    parts = [f"{indent}Channel: {channel.name} (Type: {channel.type}, Position: {channel.position})\n"]
+
+    role_overwrites = _role_overwrites(channel)
+    if role_overwrites:
+        parts.append(f"    Channel-specific Role Access:\n" if categorized else f"  Role Access:\n")
+        for role, overwrite in role_overwrites:
+            access_info = _access_info(channel_type, overwrite)
+            if access_info:
+                parts.append(f"{indent}    {role.name}: {', '.join(access_info)}\n")
+    return "".join(parts)
+
+
+def render_category(category: discord.CategoryChannel) -> str:
+    """Renders the heading lines for one category."""
+    parts = [f"Category: {category.name} (Position: {category.position})\n"]
+
+    role_overwrites = _role_overwrites(category)
+    if role_overwrites:
+        parts.append(f"  Category Role Access:\n")
+        for role, overwrite in role_overwrites:
+            allow, deny = overwrite.pair()
+            if allow.view_channel:
+                parts.append(f"    {role.name}: can view all channels\n")
+            elif deny.view_channel:
+                parts.append(f"    {role.name}: cannot view channels\n")
+    return "".join(parts)
+
+
+class GuildSnapshot:
+    """
+    Pre-rendered prompt fragments for one guild.
+
+    Each role, channel and category keeps its own rendered text, so a gateway event
+    only re-renders the object it touches. The assembled sections are cached until
+    a fragment changes.
+    """
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.roles: Dict[int, Tuple[int, str]] = {}  # role_id: (position, text)
+        # channel_id: (category_id, position, top-level text or None, categorized text or None)
+        self.channels: Dict[int, Tuple[Optional[int], int, Optional[str], Optional[str]]] = {}
+        self.categories: Dict[int, Tuple[int, str]] = {}  # category_id: (position, heading text)
+        self.role_refs: Dict[int, Set[int]] = {}  # role_id: channel ids with an overwrite for that role
+        self._roles_text: Optional[str] = None
+        self._channels_text: Optional[str] = None
+
+    # --- Patching ---
+
+    def set_role(self, role: discord.Role):
+        self.roles[role.id] = (role.position, render_role(role))
+        self._roles_text = None
+
+    def remove_role(self, role_id: int) -> Set[int]:
+        """Removes a role. Returns the ids of channels that referenced it in an overwrite."""
+        self.roles.pop(role_id, None)
+        self._roles_text = None
+        return self.role_refs.pop(role_id, set())
+
+    def set_channel(self, channel):
+        self._drop_channel_refs(channel.id)
+        category_id = channel.category_id
+        if category_id is None:
+            # Top-level channels (categories included) are listed under "Channels without category"
+            entry = (None, channel.position, render_channel(channel, categorized=False), None)
+        else:
+            entry = (category_id, channel.position, None, render_channel(channel, categorized=True))
+        self.channels[channel.id] = entry
+
+        if isinstance(channel, discord.CategoryChannel):
+            self.categories[channel.id] = (channel.position, render_category(channel))
+
+        for role, _ in _role_overwrites(channel):
+            self.role_refs.setdefault(role.id, set()).add(channel.id)
+        self._channels_text = None
+
+    def remove_channel(self, channel_id: int):
+        self._drop_channel_refs(channel_id)
+        self.channels.pop(channel_id, None)
+        self.categories.pop(channel_id, None)
+        self._channels_text = None
+
+    def _drop_channel_refs(self, channel_id: int):
+        for channel_ids in self.role_refs.values():
+            channel_ids.discard(channel_id)
+
+    # --- Rendering ---
+
+    def _render_roles(self) -> str:
+        if self._roles_text is None:
+            ordered = sorted(self.roles.items(), key=lambda item: item[1][0], reverse=True)
+            self._roles_text = "".join(text for _, (_, text) in ordered)
+        return self._roles_text
+
+    def _render_channels(self) -> str:
+        if self._channels_text is None:
+            top_level = []
+            by_category: Dict[int, list] = {category_id: [] for category_id in self.categories}
+            for channel_id, (category_id, position, top_text, categorized_text) in self.channels.items():
+                if category_id is None:
+                    top_level.append((position, channel_id, top_text))
+                elif category_id in by_category:
+                    by_category[category_id].append((position, channel_id, categorized_text))
+
+            parts = []
+            if top_level:
+                parts.append("Channels without category:\n")
+                parts.extend(text for _, _, text in sorted(top_level))
+
+            for category_id, (position, heading) in sorted(self.categories.items(), key=lambda item: (item[1][0], item[0])):
+                parts.append(heading)
+                parts.extend(text for _, _, text in sorted(by_category[category_id]))
+
+            self._channels_text = "".join(parts)
+        return self._channels_text
+
+    def render(self, guild: discord.Guild) -> str:
+        """Assembles the SERVER STRUCTURE block. Name and member count are read live from the guild."""
+        return (
+            f"\n\n=== SERVER STRUCTURE ===\n"
+            f"Server Name: {guild.name}\n"
+            f"Total Members: {guild.member_count}\n"
+            f"\n--- ROLES ---\n"
+            f"{self._render_roles()}"
+            f"\n--- CHANNEL STRUCTURE ---\n"
+            f"{self._render_channels()}"
+        )
+
+
+class GuildSnapshotCache:
+    """
+    Per-guild cache of the server-structure text sent with Spectre prompts.
+
+    A snapshot is built the first time a guild is requested (or prefetched) and is
+    afterwards kept current by patching it from role and channel gateway events.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[int, GuildSnapshot] = {}
+        self.builds = 0
+
+    def build(self, guild: discord.Guild) -> GuildSnapshot:
+        """Builds (or rebuilds) the snapshot for a guild from its cached state."""
+        snapshot = GuildSnapshot(guild.id)
+        for role in guild.roles:
+            snapshot.set_role(role)
+        for channel in guild.channels:
+            snapshot.set_channel(channel)
+        self._snapshots[guild.id] = snapshot
+        self.builds += 1
+        log.info(f"Built structure snapshot for guild {guild.id} ({len(snapshot.roles)} roles, {len(snapshot.channels)} channels)")
+        return snapshot
+
+    def prefetch(self, guild: Optional[discord.Guild]):
+        """Builds the snapshot for a guild ahead of the first prompt, if it isn't cached yet."""
+        if guild is not None and guild.id not in self._snapshots:
+            self.build(guild)
+
+    def get(self, guild: discord.Guild) -> str:
+        """
+        Get the SERVER STRUCTURE block for a guild.
+
+        Args:
+            guild (discord.Guild): The guild to describe
+
+        Returns:
+            str: The rendered structure text
+        """
+        snapshot = self._snapshots.get(guild.id)
+        if snapshot is None:
+            snapshot = self.build(guild)
+        return snapshot.render(guild)
+
+    def drop(self, guild_id: int):
+        """Forgets the snapshot for a guild."""
+        self._snapshots.pop(guild_id, None)
+
+    # --- Event patches (no-ops for guilds without a snapshot) ---
+
+    def patch_role(self, role: discord.Role, refresh_overwrites: bool = False):
+        snapshot = self._snapshots.get(role.guild.id)
+        if snapshot is None:
+            return
+        snapshot.set_role(role)
+        if refresh_overwrites:
+            # Role names appear in channel overwrite lines
+            self._refresh_channels(role.guild, snapshot, snapshot.role_refs.get(role.id, set()))
+
+    def remove_role(self, role: discord.Role):
+        snapshot = self._snapshots.get(role.guild.id)
+        if snapshot is None:
+            return
+        affected = snapshot.remove_role(role.id)
+        self._refresh_channels(role.guild, snapshot, affected)
+
+    def patch_channel(self, channel):
+        snapshot = self._snapshots.get(channel.guild.id)
+        if snapshot is not None:
+            snapshot.set_channel(channel)
+
+    def remove_channel(self, channel):
+        snapshot = self._snapshots.get(channel.guild.id)
+        if snapshot is not None:
+            snapshot.remove_channel(channel.id)
+
+    @staticmethod
+    def _refresh_channels(guild: discord.Guild, snapshot: GuildSnapshot, channel_ids: Set[int]):
+        for channel_id in list(channel_ids):
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                snapshot.remove_channel(channel_id)
+            else:
+                snapshot.set_channel(channel)
+
+
+# Create a global instance for easy access
+guild_snapshots = GuildSnapshotCache()
@@ -0,0 +1,136 @@
+# utils/listing_index.py
+
+import asyncio
+import heapq
+import logging
+import re
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger('MyBot.ListingIndex')
+
+
+class ListingIndex:
+    """
+    In-memory prefix index over market listing UIDs and names, for autocomplete.
+
+    Every listing is indexed under its UID, its full name and each word of its name.
+    The keys live in one sorted list, so a prefix lookup is a bisect followed by a
+    short forward scan. The index is built once from the database and then kept
+    current by the market write helpers (`add` / `remove`).
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []  # sorted (key, uid)
+        self._listings: Dict[str, Tuple[str, float]] = {}  # uid: (file_name, date_listed)
+        self._recent: Optional[List[str]] = None  # newest uids, rebuilt lazily after writes
+        self.loaded = False
+
+    @staticmethod
+    def _index_keys(uid: str, file_name: str) -> set:
+        name = file_name.lower()
+        keys = {uid.lower(), name}
+        keys.update(re.findall(r"\w+", name))
+        return keys
+
+    def load(self, rows: Iterable[dict]):
+        """Replace the index contents with the given listing rows (uid, file_name, date_listed)."""
+        listings = {row['uid']: (row['file_name'], row.get('date_listed') or 0) for row in rows}
+        keys = [(key, uid) for uid, (name, _) in listings.items() for key in self._index_keys(uid, name)]
+        keys.sort()
+        self._listings = listings
+        self._keys = keys
+        self._recent = None
+        self.loaded = True
+        log.info(f"Listing index loaded with {len(listings)} listing(s), {len(keys)} key(s)")
+
+    def add(self, uid: str, file_name: str, date_listed: float = 0):
+        """Index a new (or renamed) listing."""
+        if uid in self._listings:
+            self.remove(uid)
+        self._listings[uid] = (file_name, date_listed)
+        for key in self._index_keys(uid, file_name):
+            insort(self._keys, (key, uid))
+        self._recent = None
+
+    def remove(self, uid: str):
+        """Drop a listing from the index."""
+        listing = self._listings.pop(uid, None)
+        if listing is None:
+            return
+        for key in self._index_keys(uid, listing[0]):
+            position = bisect_left(self._keys, (key, uid))
+            if position < len(self._keys) and self._keys[position] == (key, uid):
+                del self._keys[position]
+        self._recent = None
+
+    def _newest(self, limit: int) -> List[str]:
+        if self._recent is None or len(self._recent) < min(limit, len(self._listings)):
+            self._recent = heapq.nlargest(limit, self._listings, key=lambda uid: self._listings[uid][1])
+        return self._recent[:limit]
+
+    def search(self, prefix: str, limit: int = 25) -> List[Tuple[str, str]]:
+        """
+        Find listings whose UID, name or a word of the name starts with a prefix.
+
+        Args:
+            prefix (str): The text typed so far (case-insensitive). Empty returns the newest listings
+            limit (int): Maximum number of results
+
+        Returns:
+            List[Tuple[str, str]]: (uid, file_name) pairs
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return [(uid, self._listings[uid][0]) for uid in self._newest(limit)]
+
+        results = []
+        seen = set()
+        position = bisect_left(self._keys, (prefix, ""))
+        while position < len(self._keys) and len(results) < limit:
+            key, uid = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            if uid not in seen:
+                seen.add(uid)
+                results.append((uid, self._listings[uid][0]))
+            position += 1
+        return results
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+
+class Debouncer:
+    """
+    Drops superseded requests per user.
+
+    Each call waits `delay` seconds; if the same user made a newer call in the
+    meantime, the older one reports itself as stale so it can skip its work.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._latest: Dict[int, int] = {}
+        self.dropped = 0
+
+    async def settle(self, user_id: int) -> bool:
+        """
+        Wait out the debounce window.
+
+        Returns:
+            bool: True if this is still the user's latest call, False if it is stale
+        """
+        sequence = self._latest.get(user_id, 0) + 1
+        self._latest[user_id] = sequence
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+        if self._latest.get(user_id) != sequence:
+            self.dropped += 1
+            return False
+        del self._latest[user_id]
+        return True
+
+
+# Create a global instance for easy access
+listing_index = ListingIndex()
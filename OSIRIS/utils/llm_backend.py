@@ -0,0 +1,262 @@
+# utils/llm_backend.py
+
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from g4f.client import Client
+
+try:
+    # Newer g4f releases ship a native asyncio client
+    from g4f.client import AsyncClient
+except ImportError:  # pragma: no cover - depends on the installed g4f version
+    AsyncClient = None
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.LLMBackend')
+
+
+class LLMError(Exception):
+    """Raised when the model returns no usable completion."""
+
+
+def _extract_content(response: Any) -> str:
+    """Pulls the message text out of an OpenAI-style completion response."""
+    try:
+        content = response.choices[0].message.content
+    except (AttributeError, IndexError, TypeError) as e:
+        raise LLMError(f"Malformed completion response: {e}") from e
+    if content is None:
+        raise LLMError("The model returned an empty completion.")
+    return content
+
+
+def _extract_delta(chunk: Any) -> str:
+    """Pulls the new text out of an OpenAI-style streaming chunk ('' for chunks without text)."""
+    try:
+        return chunk.choices[0].delta.content or ""
+    except (AttributeError, IndexError, TypeError):
+        return ""
+
+
+# Marks the end of a stream fed from a worker thread
+_STREAM_END = object()
+
+
+class LLMBackend:
+    """
+    Shared, non-blocking access to the chat completion API.
+
+    One client is created for the whole bot and reused by every session. When the
+    installed g4f provides `AsyncClient` requests run natively on the event loop, so
+    timeouts cancel the request itself. Otherwise the synchronous client runs on a
+    bounded thread pool, which keeps the event loop (and gateway heartbeats) free and
+    caps how many stuck requests can pile up.
+    """
+
+    def __init__(self, model: Optional[str] = None, max_workers: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Initialize the LLMBackend.
+
+        Args:
+            model (str, optional): Default model name. Defaults to `spectre.model` from the config
+            max_workers (int, optional): Size of the fallback thread pool. Defaults to `spectre.llm_worker_threads`
+            timeout (float, optional): Default request timeout in seconds. Defaults to `spectre.timeout`
+        """
+        self.model = model or config.get("spectre.model", "gpt-4o-mini")
+        self.max_workers = max_workers or config.get("spectre.llm_worker_threads", 4)
+        self.timeout = timeout or config.get("spectre.timeout", 30)
+        self._client: Optional[Client] = None
+        self._async_client = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def is_native_async(self) -> bool:
+        """Whether requests run on the native asyncio client instead of the thread pool."""
+        return AsyncClient is not None
+
+    @property
+    def client(self) -> Client:
+        """The shared synchronous client, created on first use."""
+        if self._client is None:
+            self._client = Client()
+        return self._client
+
+    def _get_async_client(self):
+        if self._async_client is None:
+            self._async_client = AsyncClient()
+        return self._async_client
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm-worker")
+        return self._executor
+
+    def complete_sync(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> str:
+        """
+        Blocking completion on the shared client. Only for code that is not running on the event loop.
+
+        Args:
+            messages (List[Dict[str, str]]): Chat messages with 'role' and 'content' keys
+            model (str, optional): Model override
+
+        Returns:
+            str: The completion text
+        """
+        # Note: g4f doesn't support most parameters like temperature, tokens, etc.
+        # Only model and messages are passed, and even model might be ignored
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="Curlm already closed! quitting from process_data")
+            warnings.filterwarnings("ignore", category=UserWarning)
+            response = self.client.chat.completions.create(model=model or self.model, messages=messages)
+        return _extract_content(response)
+
+    async def _complete_native(self, messages: List[Dict[str, str]], model: str) -> str:
+        response = await self._get_async_client().chat.completions.create(model=model, messages=messages)
+        return _extract_content(response)
+
+    async def _complete_in_pool(self, messages: List[Dict[str, str]], model: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(self.complete_sync, messages, model)
+        )
+
+    async def complete(self, messages: List[Dict[str, str]], model: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """
+        Request a completion without blocking the event loop.
+
+        Args:
+            messages (List[Dict[str, str]]): Chat messages with 'role' and 'content' keys
+            model (str, optional): Model override
+            timeout (float, optional): Timeout override in seconds
+
+        Returns:
+            str: The completion text
+
+        Raises:
+            asyncio.TimeoutError: If the model didn't answer in time (the request is cancelled)
+            LLMError: If the response contained no completion
+        """
+        model = model or self.model
+        timeout = timeout or self.timeout
+        # Snapshot the history so later appends by the caller can't race the request
+        messages = [dict(m) for m in messages]
+
+        if self.is_native_async:
+            request = self._complete_native(messages, model)
+        else:
+            request = self._complete_in_pool(messages, model)
+
+        return await asyncio.wait_for(request, timeout=timeout)
+
+    async def _stream_native(self, messages: List[Dict[str, str]], model: str) -> AsyncIterator[str]:
+        response = self._get_async_client().chat.completions.create(model=model, messages=messages, stream=True)
+        if inspect.isawaitable(response):
+            # Some g4f versions return a coroutine that resolves to the chunk iterator
+            response = await response
+        async for chunk in response:
+            delta = _extract_delta(chunk)
+            if delta:
+                yield delta
+
+    async def _stream_in_pool(self, messages: List[Dict[str, str]], model: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", message="Curlm already closed! quitting from process_data")
+                    warnings.filterwarnings("ignore", category=UserWarning)
+                    for chunk in self.client.chat.completions.create(model=model, messages=messages, stream=True):
+                        if cancelled.is_set():
+                            break
+                        delta = _extract_delta(chunk)
+                        if delta:
+                            loop.call_soon_threadsafe(queue.put_nowait, delta)
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        loop.run_in_executor(self._get_executor(), produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stops the worker at its next chunk if the consumer gave up early
+            cancelled.set()
+
+    async def stream(self, messages: List[Dict[str, str]], model: Optional[str] = None, timeout: Optional[float] = None,
+                     total_timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream a completion, yielding text as it arrives.
+
+        Args:
+            messages (List[Dict[str, str]]): Chat messages with 'role' and 'content' keys
+            model (str, optional): Model override
+            timeout (float, optional): Maximum wait in seconds for the first and for each following chunk
+            total_timeout (float, optional): Maximum duration of the whole stream in seconds. Defaults to `timeout`, the limit `complete` uses
+
+        Yields:
+            str: The next piece of the completion
+
+        Raises:
+            asyncio.TimeoutError: If no new text arrived in time, or the stream ran past its total timeout
+            LLMError: If the stream ended without any text
+        """
+        model = model or self.model
+        timeout = timeout or self.timeout
+        # A slow trickle of chunks mustn't hold its admission slot forever
+        deadline = time.monotonic() + (total_timeout or timeout)
+        messages = [dict(m) for m in messages]
+
+        if self.is_native_async:
+            chunks = self._stream_native(messages, model)
+        else:
+            chunks = self._stream_in_pool(messages, model)
+
+        received = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    delta = await asyncio.wait_for(chunks.__anext__(), timeout=min(timeout, remaining))
+                except StopAsyncIteration:
+                    break
+                received = True
+                yield delta
+        finally:
+            await chunks.aclose()
+
+        if not received:
+            raise LLMError("The model returned an empty completion.")
+
+    async def close(self):
+        """Shut down the worker pool and drop the shared clients."""
+        if self._executor is not None:
+            # Don't wait for requests that are still stuck in a worker
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._client = None
+        self._async_client = None
+        log.info("LLM backend closed")
+
+
+# Create a global instance for easy access
+llm_backend = LLMBackend()
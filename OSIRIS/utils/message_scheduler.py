@@ -0,0 +1,245 @@
+# utils/message_scheduler.py
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+from utils.api_governor import api_priority, BULK
+from utils.config_manager import config
+from utils.database import Database, market_db
+
+log = logging.getLogger('MyBot.MessageScheduler')
+
+# Discord only bulk-deletes messages younger than 14 days, at most 100 per call
+BULK_DELETE_MAX_AGE = timedelta(days=14)
+BULK_DELETE_MAX_COUNT = 100
+
+# Seconds before a deletion that failed for a transient reason is tried again
+RETRY_DELAY = 60
+
+
+class MessageScheduler:
+    """
+    Bot-wide auto-deletion of the bot's messages.
+
+    Each tracked message is a compact `(channel_id, message_id, due)` record kept in
+    a heap ordered by due time and persisted in the `scheduled_deletions` table, so
+    pending deletions survive a restart. A single task sleeps until the earliest
+    record is due; the due messages are grouped by channel and removed with bulk
+    `delete_messages` calls, falling back to single deletes where bulk deletion isn't
+    possible (DMs, missing Manage Messages, messages older than 14 days).
+    """
+
+    def __init__(self, db: Database, delete_after: Optional[float] = None):
+        """
+        Initialize the MessageScheduler.
+
+        Args:
+            db (Database): The database holding the scheduled_deletions table
+            delete_after (float, optional): Default seconds before a tracked message is deleted. Defaults to `bot.message_auto_delete_seconds`
+        """
+        self.db = db
+        self.delete_after = delete_after or config.get("bot.message_auto_delete_seconds", 5000)
+        self.bot: Optional[discord.Client] = None
+
+        self._heap: List[Tuple[float, int, int]] = []  # (due, message_id, channel_id)
+        self._due: Dict[int, float] = {}  # message_id -> current due time (older heap entries are stale)
+        self._unsaved: Dict[int, Tuple[int, float]] = {}  # message_id -> (channel_id, due) not yet in SQLite
+        self._no_bulk: Set[int] = set()  # Channels where a bulk delete was refused
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.deleted = 0
+        self.bulk_calls = 0
+        self.single_calls = 0
+
+    def schedule(self, message, delay: Optional[float] = None):
+        """
+        Schedule a message for deletion.
+
+        Args:
+            message: The message to delete (anything with `id` and `channel.id`)
+            delay (float, optional): Seconds from now. Defaults to `delete_after`
+        """
+        channel = getattr(message, 'channel', None)
+        if not message or not hasattr(message, 'id') or channel is None:
+            return
+        due = time.time() + (self.delete_after if delay is None else delay)
+        self._push(message.id, channel.id, due)
+        self._unsaved[message.id] = (channel.id, due)
+        self._wakeup.set()
+        log.debug(f"Scheduled message {message.id} for deletion in {due - time.time():.0f}s")
+
+    def _push(self, message_id: int, channel_id: int, due: float):
+        self._due[message_id] = due
+        heapq.heappush(self._heap, (due, message_id, channel_id))
+
+    def _pop_due(self, now: float) -> Dict[int, List[int]]:
+        """Pop every record that is due, grouped by channel."""
+        by_channel: Dict[int, List[int]] = defaultdict(list)
+        while self._heap and self._heap[0][0] <= now:
+            due, message_id, channel_id = heapq.heappop(self._heap)
+            if self._due.get(message_id) != due:
+                continue  # Rescheduled or already handled
+            del self._due[message_id]
+            by_channel[channel_id].append(message_id)
+        return by_channel
+
+    async def _persist(self):
+        """Write newly scheduled records to SQLite."""
+        if not self._unsaved:
+            return
+        unsaved, self._unsaved = self._unsaved, {}
+        rows = [(message_id, channel_id, due) for message_id, (channel_id, due) in unsaved.items()]
+        try:
+            await self.db.executemany(
+                'INSERT OR REPLACE INTO scheduled_deletions (message_id, channel_id, due) VALUES (?, ?, ?)', rows
+            )
+        except Exception:
+            # Keep them for the next attempt (newer schedules of the same message win)
+            self._unsaved = {**unsaved, **self._unsaved}
+            raise
+
+    @staticmethod
+    def _bulk_deletable(message_id: int) -> bool:
+        return discord.utils.utcnow() - discord.utils.snowflake_time(message_id) < BULK_DELETE_MAX_AGE - timedelta(minutes=1)
+
+    async def _delete_single(self, channel_id: int, message_id: int) -> bool:
+        """Delete one message. Returns False if it should be tried again later."""
+        self.single_calls += 1
+        try:
+            await self.bot.http.delete_message(channel_id, message_id)
+            self.deleted += 1
+        except discord.NotFound:
+            log.debug(f"Message {message_id} already deleted")
+        except discord.Forbidden:
+            log.warning(f"No permission to delete message {message_id}")
+        except discord.HTTPException as e:
+            if e.status >= 500:
+                return False
+            log.error(f"Error deleting message {message_id}: {e}")
+        return True
+
+    async def _delete_channel(self, channel_id: int, message_ids: List[int]) -> List[int]:
+        """
+        Delete a channel's due messages, in bulk where possible.
+
+        Returns:
+            List[int]: The message IDs that should be tried again later
+        """
+        singles = list(message_ids)
+        if channel_id not in self._no_bulk:
+            bulk, singles = [], []
+            for message_id in message_ids:
+                (bulk if self._bulk_deletable(message_id) else singles).append(message_id)
+            for start in range(0, len(bulk), BULK_DELETE_MAX_COUNT):
+                chunk = bulk[start:start + BULK_DELETE_MAX_COUNT]
+                if len(chunk) == 1:
+                    singles.extend(chunk)
+                    continue
+                self.bulk_calls += 1
+                try:
+                    await self.bot.http.delete_messages(channel_id, chunk)
+                    self.deleted += len(chunk)
+                except discord.HTTPException as e:
+                    if e.status < 500:
+                        # DM channel or no Manage Messages permission: delete one by one from now on
+                        log.info(f"Bulk delete refused in channel {channel_id} ({e}); falling back to single deletes")
+                        self._no_bulk.add(channel_id)
+                    singles.extend(chunk)
+
+        retry = []
+        for message_id in singles:
+            if not await self._delete_single(channel_id, message_id):
+                retry.append(message_id)
+        return retry
+
+    async def run_due(self, now: Optional[float] = None) -> int:
+        """
+        Delete every message that is due.
+
+        Returns:
+            int: The number of records handled
+        """
+        now = time.time() if now is None else now
+        by_channel = self._pop_due(now)
+        if not by_channel:
+            return 0
+
+        done: List[Tuple[int]] = []
+        for channel_id, message_ids in by_channel.items():
+            try:
+                retry = await self._delete_channel(channel_id, message_ids)
+            except Exception as e:
+                log.error(f"Error deleting messages in channel {channel_id}: {e}", exc_info=True)
+                retry = message_ids
+            for message_id in retry:
+                self._push(message_id, channel_id, now + RETRY_DELAY)
+                self._unsaved[message_id] = (channel_id, now + RETRY_DELAY)
+            retry = set(retry)
+            done.extend((message_id,) for message_id in message_ids if message_id not in retry)
+
+        await self.db.executemany('DELETE FROM scheduled_deletions WHERE message_id = ?', done)
+        log.info(f"Auto-deleted {len(done)} message(s) in {len(by_channel)} channel(s)")
+        return len(done)
+
+    async def _run(self):
+        # Deletions give way to interactive responses
+        api_priority.set(BULK)
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._persist()
+                await self.run_due()
+            except Exception as e:
+                log.error(f"Error in message deletion scheduler: {e}", exc_info=True)
+
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                # Woken early when a message is scheduled (to persist it)
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, bot: discord.Client):
+        """Load the pending deletions and start the scheduler task."""
+        if self._task is not None:
+            return
+        self.bot = bot
+        rows = await self.db.fetchall('SELECT message_id, channel_id, due FROM scheduled_deletions')
+        for row in rows:
+            self._due[row['message_id']] = row['due']
+            self._heap.append((row['due'], row['message_id'], row['channel_id']))
+        heapq.heapify(self._heap)
+        log.info(f"Loaded {len(rows)} scheduled message deletion(s)")
+        self._task = asyncio.create_task(self._run(), name="message-scheduler")
+
+    async def close(self):
+        """Stop the scheduler task and persist the records scheduled since the last run."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._persist()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the pending count and the deletion counters."""
+        return {
+            'pending': len(self._due),
+            'deleted': self.deleted,
+            'bulk_calls': self.bulk_calls,
+            'single_calls': self.single_calls,
+        }
+
+
+# Create a global instance for easy access
+message_scheduler = MessageScheduler(market_db)
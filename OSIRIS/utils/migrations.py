@@ -0,0 +1,314 @@
+# utils/migrations.py
+
+import logging
+import time
+from typing import List, NamedTuple, Tuple
+
+import aiosqlite
+
+from utils.database import Database
+
+log = logging.getLogger('MyBot.Migrations')
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+# Schema history of the market database. Append new migrations with the next version
+# number; never edit one that has already shipped.
+MARKET_MIGRATIONS: List[Migration] = [
+    Migration(1, "initial_schema", (
+        # IF NOT EXISTS so databases created before migrations existed are adopted as-is
+        '''
+        CREATE TABLE IF NOT EXISTS market_listings (
+            uid TEXT PRIMARY KEY,
+            owner_id INTEGER NOT NULL,
+            file_name TEXT NOT NULL,
+            description TEXT,
+            date_listed REAL NOT NULL,
+            saves_count INTEGER DEFAULT 0 NOT NULL,
+            stars_count INTEGER DEFAULT 0 NOT NULL
+        )
+        ''',
+        # Stores which users saved which market items
+        '''
+        CREATE TABLE IF NOT EXISTS user_market_saves (
+            user_id INTEGER NOT NULL,
+            uid TEXT NOT NULL,
+            date_saved REAL NOT NULL,
+            PRIMARY KEY (user_id, uid),
+            FOREIGN KEY (uid) REFERENCES market_listings(uid) ON DELETE CASCADE
+        )
+        ''',
+        # Prevents multiple stars from the same user
+        '''
+        CREATE TABLE IF NOT EXISTS user_market_awards (
+            user_id INTEGER NOT NULL,
+            uid TEXT NOT NULL,
+            PRIMARY KEY (user_id, uid),
+            FOREIGN KEY (uid) REFERENCES market_listings(uid) ON DELETE CASCADE
+        )
+        ''',
+    )),
+    Migration(2, "market_indexes_and_orphan_cleanup", (
+        # Rows left behind while foreign keys were off (ON DELETE CASCADE never fired)
+        'DELETE FROM user_market_saves WHERE uid NOT IN (SELECT uid FROM market_listings)',
+        'DELETE FROM user_market_awards WHERE uid NOT IN (SELECT uid FROM market_listings)',
+        # Exchange sort orders (date / saves / stars); date_listed breaks ties, and uid makes every
+        # sort key unique, so pages can be fetched by seeking past the previous page's last row
+        'CREATE INDEX IF NOT EXISTS idx_market_listings_date ON market_listings (date_listed DESC, uid DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_market_listings_saves ON market_listings (saves_count DESC, date_listed DESC, uid DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_market_listings_stars ON market_listings (stars_count DESC, date_listed DESC, uid DESC)',
+        # get_user_relics: WHERE owner_id = ? ORDER BY date_listed DESC
+        'CREATE INDEX IF NOT EXISTS idx_market_listings_owner ON market_listings (owner_id, date_listed DESC)',
+        # get_user_market_saves_info: WHERE user_id = ? ORDER BY date_saved DESC, covering the join key
+        'CREATE INDEX IF NOT EXISTS idx_user_market_saves_user_date ON user_market_saves (user_id, date_saved DESC, uid)',
+        # Child-key indexes so cascading deletes don't scan the whole table
+        'CREATE INDEX IF NOT EXISTS idx_user_market_saves_uid ON user_market_saves (uid)',
+        'CREATE INDEX IF NOT EXISTS idx_user_market_awards_uid ON user_market_awards (uid)',
+    )),
+    Migration(3, "market_fulltext_search", (
+        # Start of the relic's saved text, so searches can match the content as well
+        'ALTER TABLE market_listings ADD COLUMN content_snippet TEXT',
+        # External-content FTS5 index over market_listings (rows are joined back by rowid).
+        # prefix='2 3' keeps short prefix queries (autocomplete) on the index.
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS market_listings_fts USING fts5(
+            file_name, description, content_snippet,
+            content='market_listings', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS market_listings_fts_insert AFTER INSERT ON market_listings BEGIN
+            INSERT INTO market_listings_fts (rowid, file_name, description, content_snippet)
+            VALUES (new.rowid, new.file_name, new.description, new.content_snippet);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS market_listings_fts_delete AFTER DELETE ON market_listings BEGIN
+            INSERT INTO market_listings_fts (market_listings_fts, rowid, file_name, description, content_snippet)
+            VALUES ('delete', old.rowid, old.file_name, old.description, old.content_snippet);
+        END
+        ''',
+        # Only fires for the indexed columns, so save/star counter updates don't touch the index
+        '''
+        CREATE TRIGGER IF NOT EXISTS market_listings_fts_update
+        AFTER UPDATE OF file_name, description, content_snippet ON market_listings BEGIN
+            INSERT INTO market_listings_fts (market_listings_fts, rowid, file_name, description, content_snippet)
+            VALUES ('delete', old.rowid, old.file_name, old.description, old.content_snippet);
+            INSERT INTO market_listings_fts (rowid, file_name, description, content_snippet)
+            VALUES (new.rowid, new.file_name, new.description, new.content_snippet);
+        END
+        ''',
+        # Index the listings that already exist
+        "INSERT INTO market_listings_fts (market_listings_fts) VALUES ('rebuild')",
+    )),
+    Migration(4, "user_saves_index", (
+        # Metadata of personal saves (the saves/<user_id>/<uid>.json sidecars), so listing them is one query
+        '''
+        CREATE TABLE IF NOT EXISTS user_saves (
+            uid TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            file_name TEXT NOT NULL,
+            description TEXT,
+            tier_used TEXT,
+            saves INTEGER DEFAULT 0 NOT NULL,
+            date_created REAL NOT NULL
+        )
+        ''',
+        # Vault / commit listings: WHERE user_id = ? ORDER BY date_created DESC
+        'CREATE INDEX IF NOT EXISTS idx_user_saves_user_date ON user_saves (user_id, date_created DESC, uid DESC)',
+        # Small key/value store for one-off jobs (e.g. the sidecar import)
+        '''
+        CREATE TABLE IF NOT EXISTS app_state (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at REAL NOT NULL
+        )
+        ''',
+    )),
+    Migration(5, "market_trending", (
+        # Append-only log of save/star events, folded into market_trending by the ranking job.
+        # AUTOINCREMENT so ids are never reused after old events are pruned.
+        '''
+        CREATE TABLE IF NOT EXISTS market_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            FOREIGN KEY (uid) REFERENCES market_listings(uid) ON DELETE CASCADE
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_market_events_uid ON market_events (uid)',
+        'CREATE INDEX IF NOT EXISTS idx_market_events_created ON market_events (created_at)',
+        # Materialized hot score per listing (see utils/trending.py for the scale)
+        '''
+        CREATE TABLE IF NOT EXISTS market_trending (
+            uid TEXT PRIMARY KEY,
+            score REAL DEFAULT 0 NOT NULL,
+            updated_at REAL,
+            FOREIGN KEY (uid) REFERENCES market_listings(uid) ON DELETE CASCADE
+        )
+        ''',
+        # Trending sort + keyset seek
+        'CREATE INDEX IF NOT EXISTS idx_market_trending_score ON market_trending (score DESC, uid DESC)',
+        # Every listing has a ranking row, so the trending sort can be driven by the index above
+        '''
+        CREATE TRIGGER IF NOT EXISTS market_listings_trending_insert AFTER INSERT ON market_listings BEGIN
+            INSERT OR IGNORE INTO market_trending (uid, score, updated_at) VALUES (new.uid, 0, new.date_listed);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS user_market_saves_event AFTER INSERT ON user_market_saves BEGIN
+            INSERT INTO market_events (uid, kind, created_at) VALUES (new.uid, 'save', new.date_saved);
+        END
+        ''',
+        # user_market_awards has no timestamp column; julianday() gives the current Unix time
+        '''
+        CREATE TRIGGER IF NOT EXISTS user_market_awards_event AFTER INSERT ON user_market_awards BEGIN
+            INSERT INTO market_events (uid, kind, created_at)
+            VALUES (new.uid, 'star', (julianday('now') - 2440587.5) * 86400.0);
+        END
+        ''',
+        # Existing listings, and their save history as the initial events
+        'INSERT OR IGNORE INTO market_trending (uid, score, updated_at) SELECT uid, 0, date_listed FROM market_listings',
+        "INSERT INTO market_events (uid, kind, created_at) SELECT uid, 'save', date_saved FROM user_market_saves ORDER BY date_saved",
+    )),
+    Migration(6, "content_blobs", (
+        # Content of a save in the blob store; NULL for saves still stored as saves/<user_id>/<uid>.txt
+        'ALTER TABLE user_saves ADD COLUMN blob_sha256 TEXT',
+        # Latest temporary output per user (replaces temp/<user_id>.txt)
+        '''
+        CREATE TABLE IF NOT EXISTS temp_outputs (
+            user_id INTEGER PRIMARY KEY,
+            blob_sha256 TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''',
+        # Expiry sweep
+        'CREATE INDEX IF NOT EXISTS idx_temp_outputs_updated ON temp_outputs (updated_at)',
+    )),
+    Migration(7, "scheduled_deletions", (
+        # Bot messages waiting to be auto-deleted (see utils/message_scheduler.py)
+        '''
+        CREATE TABLE IF NOT EXISTS scheduled_deletions (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            due REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_scheduled_deletions_due ON scheduled_deletions (due)',
+    )),
+    Migration(8, "llm_response_cache", (
+        # Responses of repeatable model passes (see utils/response_cache.py)
+        '''
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            template_hash TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL,
+            hits INTEGER DEFAULT 0 NOT NULL,
+            PRIMARY KEY (template_hash, input_hash, model)
+        )
+        ''',
+        # LRU eviction
+        'CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used ON llm_response_cache (last_used)',
+    )),
+    Migration(9, "refine_jobs", (
+        # Forever-save refinements waiting for the model and/or the file details (see utils/refine_jobs.py)
+        '''
+        CREATE TABLE IF NOT EXISTS refine_jobs (
+            uid TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            tier TEXT NOT NULL,
+            status TEXT NOT NULL,
+            request TEXT,
+            fallback TEXT NOT NULL,
+            result_blob TEXT,
+            metadata TEXT,
+            attempts INTEGER DEFAULT 0 NOT NULL,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_refine_jobs_status ON refine_jobs (status, updated_at)',
+    )),
+    Migration(10, "spectre_sessions", (
+        # Checkpointed Spectre sessions (see utils/session_store.py)
+        '''
+        CREATE TABLE IF NOT EXISTS spectre_sessions (
+            user_id INTEGER PRIMARY KEY,
+            record TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        ''',
+        # TTL sweep
+        'CREATE INDEX IF NOT EXISTS idx_spectre_sessions_updated ON spectre_sessions (updated_at)',
+    )),
+]
+
+
+async def get_schema_version(db: Database) -> int:
+    """
+    Get the current schema version of a database.
+
+    Args:
+        db (Database): The database to inspect
+
+    Returns:
+        int: The highest applied migration version (0 if none)
+    """
+    exists = await db.fetchval("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'")
+    if not exists:
+        return 0
+    return await db.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_migrations", default=0)
+
+
+async def run_migrations(db: Database, migrations: List[Migration] = MARKET_MIGRATIONS) -> int:
+    """
+    Apply all pending migrations, each in its own transaction.
+
+    Args:
+        db (Database): The database to migrate
+        migrations (List[Migration]): The full migration history, in version order
+
+    Returns:
+        int: The schema version after migrating
+    """
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at REAL NOT NULL
+        )
+    ''')
+    current = await get_schema_version(db)
+    pending = [m for m in sorted(migrations, key=lambda m: m.version) if m.version > current]
+    if not pending:
+        log.info(f"Database '{db.path.name}' schema is up to date (version {current})")
+        return current
+
+    for migration in pending:
+        async def apply(conn: aiosqlite.Connection, migration: Migration = migration):
+            for statement in migration.statements:
+                await conn.execute(statement)
+            await conn.execute(
+                'INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                (migration.version, migration.name, time.time())
+            )
+
+        started = time.monotonic()
+        await db.transaction(apply)
+        log.info(f"Applied migration {migration.version} ({migration.name}) to '{db.path.name}' in {time.monotonic() - started:.2f}s")
+        current = migration.version
+
+    # Refresh the query planner statistics for the new indexes
+    await db.execute("PRAGMA optimize")
+    return current
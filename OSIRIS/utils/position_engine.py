@@ -0,0 +1,324 @@
+# utils/position_engine.py
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import discord
+
+from utils.execution_planner import Accesses, Step, find_runs
+
+log = logging.getLogger('MyBot.PositionEngine')
+
+# Discord's limit for the audit log reason header
+MAX_REASON_LENGTH = 512
+
+
+def _bucket(channel) -> str:
+    """The group a channel is sorted in: categories, voice-like or text-like channels."""
+    if isinstance(channel, discord.CategoryChannel):
+        return 'category'
+    if isinstance(channel, (discord.VoiceChannel, discord.StageChannel)):
+        return 'voice'
+    return 'text'
+
+
+class PositionLayout:
+    """
+    The channel and role order of a guild with pending moves applied.
+
+    Moves only change this copy, so several of them (from one command or several
+    command-file lines) can be checked against each other before anything is sent.
+    Channels are ordered per sorting bucket (like discord.py does), roles bottom-up
+    with @everyone left out. Invalid moves raise ValueError and leave the layout as it was.
+    """
+
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self._channels: Dict[str, List[int]] = {}  # bucket -> channel IDs, top to bottom
+        self._parents: Dict[int, Optional[int]] = {}
+        self._known: Dict[int, object] = {}  # ID -> channel/role, including ones not cached yet
+        for channel in sorted(guild.channels, key=lambda c: (c.position, c.id)):
+            self._channels.setdefault(_bucket(channel), []).append(channel.id)
+            self._parents[channel.id] = channel.category_id
+            self._known[channel.id] = channel
+        roles = sorted((r for r in guild.roles if not r.is_default()), key=lambda r: (r.position, r.id))
+        self._roles: List[int] = [r.id for r in roles]  # Bottom to top
+        self._known.update((r.id, r) for r in roles)
+        self._touched: set = set()  # Buckets (and 'roles') that were rearranged
+        self._reparented: set = set()
+
+    # --- Channels ---
+
+    def channel_position(self, channel) -> int:
+        """Get the position a channel will have."""
+        return self._channels[_bucket(channel)].index(channel.id)
+
+    def channels_in(self, category: discord.CategoryChannel) -> list:
+        """Get the channels a category will contain, in display order."""
+        ids = [cid for cid, parent in self._parents.items() if parent == category.id]
+        return sorted((self._known[cid] for cid in ids), key=lambda c: (self.channel_position(c), c.id))
+
+    def move_channel(self, channel, position: Optional[int] = None, category: Optional[discord.CategoryChannel] = None):
+        """
+        Move a channel to a position in its bucket and/or into a category.
+
+        Args:
+            channel (discord.abc.GuildChannel): The channel to move
+            position (int, optional): The new position; out of range positions go to the end
+            category (discord.CategoryChannel, optional): The new category
+        """
+        if position is not None and position < 0:
+            raise ValueError(f"Invalid position: {position}. Must be 0 or higher.")
+        if category is not None and isinstance(channel, discord.CategoryChannel):
+            raise ValueError("Categories can't be moved into a category")
+        self._known[channel.id] = channel
+        order = self._channels.setdefault(_bucket(channel), [])
+        if position is not None:
+            if channel.id in order:
+                order.remove(channel.id)
+            order.insert(min(position, len(order)), channel.id)
+            self._touched.add(_bucket(channel))
+        if category is not None and self._parents.get(channel.id) != category.id:
+            self._parents[channel.id] = category.id
+            self._reparented.add(channel.id)
+
+    def arrange_channels(self, channels: Sequence):
+        """
+        Put channels in the given order, in the positions they take up now.
+
+        Nothing else moves: within each bucket the channels swap places among themselves,
+        so reordering a category leaves the rest of the server alone.
+        """
+        by_bucket: Dict[str, list] = {}
+        for channel in dict.fromkeys(channels):
+            if channel.id not in self._parents:
+                raise ValueError(f"Channel '{channel.name}' not found")
+            by_bucket.setdefault(_bucket(channel), []).append(channel.id)
+        for bucket, ids in by_bucket.items():
+            order = self._channels[bucket]
+            for slot, cid in zip(sorted(order.index(cid) for cid in ids), ids):
+                order[slot] = cid
+            self._touched.add(bucket)
+
+    def channel_changes(self) -> List[dict]:
+        """Get the bulk channel update payload: only the channels whose position or category changes."""
+        payload = []
+        for bucket, order in self._channels.items():
+            for position, cid in enumerate(order):
+                channel = self._known[cid]
+                moved = bucket in self._touched and channel.position != position
+                if not moved and cid not in self._reparented:
+                    continue
+                entry = {'id': cid, 'position': position if bucket in self._touched else channel.position}
+                if cid in self._reparented:
+                    entry.update(parent_id=self._parents[cid], lock_permissions=False)
+                payload.append(entry)
+        return payload
+
+    # --- Roles ---
+
+    def roles(self) -> list:
+        """Get the roles (without @everyone) bottom to top, as they will be ordered."""
+        return [self._known[rid] for rid in self._roles]
+
+    def role_position(self, role: discord.Role) -> int:
+        """Get the position a role will have."""
+        return self._roles.index(role.id) + 1
+
+    def place_roles(self, placements: Dict[discord.Role, int]):
+        """
+        Put roles at the given positions (1 is right above @everyone).
+
+        Positions are capped right below the bot's highest role; roles at or above it can't be moved.
+        """
+        top = self.guild.me.top_role
+        limit = self._roles.index(top.id) if top.id in self._roles else 0
+        for role in placements:
+            if role.is_default():
+                raise ValueError("The @everyone role can't be moved")
+            if role.id in self._roles and self._roles.index(role.id) >= limit:
+                raise ValueError(f"Role '{role.name}' is higher than or equal to the bot's highest role")
+            if placements[role] < 1:
+                raise ValueError(f"Invalid position: {placements[role]}. Must be 1 or higher.")
+
+        order = [rid for rid in self._roles if rid not in {role.id for role in placements}]
+        # Moved roles end up right below the bot's highest role at most
+        limit = order.index(top.id) if top.id in order else 0
+        for role, position in sorted(placements.items(), key=lambda item: item[1]):
+            order.insert(min(position - 1, limit), role.id)
+            limit += 1
+            self._known[role.id] = role
+        self._roles = order
+        self._touched.add('roles')
+
+    def move_role(self, role: discord.Role, position: int):
+        """Move a role to a position (1 is right above @everyone)."""
+        self.place_roles({role: position})
+
+    def role_changes(self) -> Dict[discord.Object, int]:
+        """Get the role positions to send: only the roles that move, below the bot's highest role."""
+        if 'roles' not in self._touched:
+            return {}
+        top = self.guild.me.top_role
+        return {discord.Object(id=rid): position for position, rid in enumerate(self._roles, start=1)
+                if self._known[rid].position != position and self._known[rid] < top}
+
+    # --- Transactions ---
+
+    def snapshot(self) -> tuple:
+        return ({b: list(o) for b, o in self._channels.items()}, dict(self._parents), list(self._roles),
+                set(self._touched), set(self._reparented))
+
+    def restore(self, state: tuple):
+        channels, parents, roles, touched, reparented = state
+        self._channels, self._parents, self._roles = {b: list(o) for b, o in channels.items()}, dict(parents), list(roles)
+        self._touched, self._reparented = set(touched), set(reparented)
+
+
+class PositionEngine:
+    """
+    Applies channel and role moves with one bulk position request per type.
+
+    Moving a channel or role with `edit(position=...)` rewrites the positions of its
+    whole bucket, one request per move. Commands instead collect their moves in a
+    `PositionLayout`, and `apply()` sends only the entries that actually change:
+    channels through the bulk channel position endpoint, roles through
+    `Guild.edit_role_positions`.
+
+    The executor also batches command-file lines: a module takes part by defining
+    `position_target(args)`, returning 'channels' or 'roles' when the line only moves
+    things (None otherwise), and `plan_positions(layout, args)`, which applies the
+    line's moves to a layout. Runs of such lines with nothing conflicting in between
+    (per the execution planner's accesses) share one layout and one request.
+    """
+
+    def layout(self, guild: discord.Guild) -> PositionLayout:
+        """Start a layout from the guild's current order."""
+        return PositionLayout(guild)
+
+    async def apply(self, layout: PositionLayout, reason: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Send the changes of a layout.
+
+        Args:
+            layout (PositionLayout): The layout with the moves applied
+            reason (str, optional): Reason for the audit log
+
+        Returns:
+            Tuple[int, int]: The number of channels and roles updated
+        """
+        guild = layout.guild
+        reason = reason[:MAX_REASON_LENGTH] if reason else None
+        channels = layout.channel_changes()
+        roles = layout.role_changes()
+        if channels:
+            # discord.py only wraps this endpoint for single channel moves
+            await guild._state.http.bulk_channel_update(guild.id, channels, reason=reason)
+        if roles:
+            await guild.edit_role_positions(positions=roles, reason=reason)
+        if channels or roles:
+            log.info(f"Updated positions of {len(channels)} channel(s) and {len(roles)} role(s) in {guild.name}")
+        return len(channels), len(roles)
+
+    async def move_channel(self, channel, position: Optional[int] = None, category: Optional[discord.CategoryChannel] = None,
+                           reason: Optional[str] = None) -> int:
+        """Move a single channel. Returns the number of channels updated."""
+        layout = self.layout(channel.guild)
+        layout.move_channel(channel, position, category)
+        return (await self.apply(layout, reason))[0]
+
+    async def move_role(self, role: discord.Role, position: int, reason: Optional[str] = None) -> int:
+        """Move a single role. Returns the number of roles updated."""
+        layout = self.layout(role.guild)
+        layout.move_role(role, position)
+        return (await self.apply(layout, reason))[1]
+
+    # --- Command files ---
+
+    @staticmethod
+    def _target(module, args: Optional[dict]) -> Optional[str]:
+        """
+        Get the kind of objects a command-file line only moves, through its module's hooks.
+
+        A command module takes part in batching by defining both:
+
+        - `position_target(args)`: 'channels' or 'roles' when the line does nothing but
+          move objects of that kind, None when it has to run on its own
+        - `plan_positions(layout, args)`: applies the line's moves to a `PositionLayout`,
+          reading the order it needs from the layout (not the guild cache), so it sees
+          the moves of the lines before it. Raises ValueError if the line can't be applied
+
+        Modules usually call `plan_positions` from their own `execute` too, so a line run
+        on its own makes the same moves with a single request.
+        """
+        if not callable(getattr(module, 'position_target', None)) or not callable(getattr(module, 'plan_positions', None)):
+            return None
+        try:
+            return module.position_target(args or {})
+        except Exception as e:
+            log.debug(f"position_target() of {module.__name__} failed: {e}")
+            return None
+
+    def groups(self, steps: Sequence[Step], modules: Sequence, accesses: Sequence[Optional[Accesses]]) -> List[List[int]]:
+        """
+        Find the runs of lines whose moves can be sent together.
+
+        Args:
+            steps (Sequence[Step]): The parsed lines, in file order
+            modules (Sequence): The command module of each line (None for lines that don't run)
+            accesses (Sequence[Accesses | None]): The planner accesses of each line
+
+        Returns:
+            List[List[int]]: Runs of two or more line indices, in file order
+        """
+        keys = []
+        for index, (command_name, args) in enumerate(steps):
+            module = modules[index]
+            target = self._target(module, args) if command_name and module and accesses[index] is not None else None
+            keys.append(target if target in ('channels', 'roles') else None)
+        return find_runs(keys, accesses)
+
+    async def run(self, interaction: discord.Interaction, lines: Sequence[int], steps: Sequence[Step], modules: Sequence) -> List[Optional[str]]:
+        """
+        Apply a run of lines with one bulk position request.
+
+        Each line sees the order left by the lines before it, as if they ran one by one.
+        A line whose moves are invalid fails on its own; the request fails them all.
+
+        Returns:
+            List[str | None]: For each line, None if it succeeded or the error it failed with
+        """
+        guild = interaction.guild
+        if guild is None:
+            return ["Not in a guild context"] * len(lines)
+
+        layout = self.layout(guild)
+        errors: List[Optional[str]] = []
+        reasons = []
+        for index in lines:
+            args = steps[index][1] or {}
+            state = layout.snapshot()
+            try:
+                modules[index].plan_positions(layout, args)
+            except Exception as e:
+                layout.restore(state)
+                errors.append(str(e))
+                continue
+            errors.append(None)
+            if args.get('reason') and args['reason'] not in reasons:
+                reasons.append(args['reason'])
+
+        if all(error is not None for error in errors):
+            return errors
+        reason = "; ".join(reasons) or f"Command file moves ({len(lines)} lines)"
+        try:
+            channels, roles = await self.apply(layout, reason)
+        except discord.HTTPException as e:
+            log.warning(f"Bulk position update (lines {', '.join(str(i + 1) for i in lines)}) failed: {e}")
+            return [error or str(e) for error in errors]
+        log.info(f"Applied {len(lines)} lines with one position update ({channels} channel(s), {roles} role(s) moved)")
+        return errors
+
+
+# Create a global instance for easy access
+position_engine = PositionEngine()
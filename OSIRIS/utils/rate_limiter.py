@@ -0,0 +1,250 @@
+# utils/rate_limiter.py
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Hashable, Optional
+
+from utils.config_manager import config
+
+log = logging.getLogger('MyBot.RateLimiter')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+
+class _Bucket:
+    """Recent uses of one key (at most `cooldown_uses` timestamps) and when its cooldown ends."""
+
+    __slots__ = ('uses', 'cooldown_until', 'last_seen')
+
+    def __init__(self, max_uses: int):
+        self.uses: Deque[float] = deque(maxlen=max(max_uses, 1))
+        self.cooldown_until = 0.0
+        self.last_seen = 0.0
+
+
+class RateLimiter:
+    """
+    Sliding-window cooldowns per user, with the limits taken from the tier config.
+
+    A tier allows `cooldown_uses` uses within `cooldown_window` seconds; the use that
+    reaches the limit starts a cooldown of `cooldown` seconds. A tier with a
+    `cooldown` of 0 is not limited.
+
+    Each key keeps at most `cooldown_uses` timestamps, so checks and records are O(1)
+    and memory per user is bounded. Keys with no recent use and no running cooldown
+    are evicted periodically, and the state is snapshotted to a JSON file so a
+    restart doesn't reset everyone's cooldown.
+    """
+
+    def __init__(self, snapshot_path: Path, snapshot_interval: Optional[float] = None):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            snapshot_path (Path): JSON file the state is saved to and restored from
+            snapshot_interval (float, optional): Seconds between eviction + snapshot runs. Defaults to `spectre.rate_limit_snapshot_interval`
+        """
+        self.snapshot_path = Path(snapshot_path)
+        self.snapshot_interval = snapshot_interval or config.get("spectre.rate_limit_snapshot_interval", 60)
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def get_limits(tier: str) -> Dict[str, float]:
+        """Get the (uses, window, cooldown) limits of a tier."""
+        limits = config.get_tier_limits(tier)
+        return {
+            'uses': int(limits.get('cooldown_uses') or 0),
+            'window': float(limits.get('cooldown_window') or 0),
+            'cooldown': float(limits.get('cooldown') or 0),
+        }
+
+    def retry_after(self, key: Hashable, now: Optional[float] = None) -> float:
+        """
+        Get how long a key is still on cooldown.
+
+        Args:
+            key (Hashable): The rate-limited key (usually a user ID)
+            now (float, optional): The current Unix time
+
+        Returns:
+            float: Seconds until the cooldown ends (0 if not on cooldown)
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(0.0, bucket.cooldown_until - now)
+
+    def record(self, key: Hashable, tier: str, now: Optional[float] = None) -> float:
+        """
+        Record a use and start the tier's cooldown if it reached the limit.
+
+        Args:
+            key (Hashable): The rate-limited key (usually a user ID)
+            tier (str): The tier whose limits apply
+            now (float, optional): The current Unix time
+
+        Returns:
+            float: The cooldown that was started, in seconds (0 if none)
+        """
+        limits = self.get_limits(tier)
+        if limits['cooldown'] <= 0:
+            return 0.0
+
+        now = time.time() if now is None else now
+        uses = max(limits['uses'], 1)
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.uses.maxlen != uses:
+            # New key, or the tier's limit changed: keep the most recent uses that still fit
+            previous = bucket.uses if bucket is not None else ()
+            replacement = _Bucket(uses)
+            replacement.uses.extend(previous)
+            if bucket is not None:
+                replacement.cooldown_until = bucket.cooldown_until
+            bucket = self._buckets[key] = replacement
+
+        bucket.uses.append(now)
+        bucket.last_seen = now
+        self._dirty = True
+
+        # The deque holds the last `uses` uses; the limit is hit when the oldest of them is inside the window
+        if len(bucket.uses) == uses and now - bucket.uses[0] <= limits['window']:
+            bucket.cooldown_until = max(bucket.cooldown_until, now + limits['cooldown'])
+            bucket.uses.clear()
+            return limits['cooldown']
+        return 0.0
+
+    def reset(self, key: Hashable):
+        """Clear a key's uses and cooldown."""
+        if self._buckets.pop(key, None) is not None:
+            self._dirty = True
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Drop keys that have no running cooldown and no use inside the longest window.
+
+        Returns:
+            int: The number of keys evicted
+        """
+        now = time.time() if now is None else now
+        # The longest window of any tier; older uses can no longer trigger a cooldown
+        max_window = max((float(t.get('cooldown_window') or 0) for t in config.get("tiers", {}).values()), default=0)
+        idle = [
+            key for key, bucket in self._buckets.items()
+            if bucket.cooldown_until <= now and now - bucket.last_seen > max_window
+        ]
+        for key in idle:
+            del self._buckets[key]
+        if idle:
+            self._dirty = True
+        return len(idle)
+
+    # --- Snapshots ---
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            str(key): {
+                'uses': list(bucket.uses),
+                'max_uses': bucket.uses.maxlen,
+                'cooldown_until': bucket.cooldown_until,
+                'last_seen': bucket.last_seen,
+            }
+            for key, bucket in self._buckets.items()
+        }
+
+    def _write_snapshot(self, data: Dict[str, Any]):
+        """Write the snapshot atomically (blocking)."""
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.snapshot_path.with_suffix('.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.snapshot_path)
+
+    async def save(self):
+        """Save the state to the snapshot file if it changed."""
+        if not self._dirty:
+            return
+        data = self._snapshot()
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write_snapshot, data)
+        except Exception as e:
+            self._dirty = True
+            log.error(f"Failed to write rate limit snapshot {self.snapshot_path}: {e}", exc_info=True)
+
+    def load(self) -> int:
+        """
+        Restore the state from the snapshot file.
+
+        Returns:
+            int: The number of keys restored
+        """
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, json.JSONDecodeError) as e:
+            log.error(f"Invalid rate limit snapshot {self.snapshot_path}: {e}")
+            return 0
+
+        for key, entry in data.items():
+            try:
+                bucket = _Bucket(int(entry.get('max_uses') or 1))
+                bucket.uses.extend(float(ts) for ts in entry.get('uses', []))
+                bucket.cooldown_until = float(entry.get('cooldown_until') or 0)
+                bucket.last_seen = float(entry.get('last_seen') or 0)
+            except (AttributeError, TypeError, ValueError):
+                continue
+            # Keys are user IDs; anything else is kept as a string
+            self._buckets[int(key) if key.isdigit() else key] = bucket
+
+        evicted = self.evict_idle()
+        log.info(f"Restored rate limits for {len(self._buckets)} key(s) ({evicted} expired)")
+        return len(self._buckets)
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                self.evict_idle()
+                await self.save()
+            except Exception as e:
+                log.error(f"Error during rate limiter maintenance: {e}", exc_info=True)
+
+    def start(self):
+        """Restore the snapshot and start the periodic eviction + snapshot task."""
+        if self._task is None:
+            self.load()
+            self._task = asyncio.create_task(self._maintenance_loop(), name="rate-limiter")
+
+    async def close(self):
+        """Stop the background task and write a final snapshot."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the number of tracked keys and of keys on cooldown."""
+        now = time.time()
+        return {
+            'keys': len(self._buckets),
+            'on_cooldown': sum(1 for bucket in self._buckets.values() if bucket.cooldown_until > now),
+        }
+
+
+# Create a global instance for easy access
+rate_limiter = RateLimiter(BASE_DIR / config.get("spectre.rate_limit_snapshot_file", "rate_limits.json"))
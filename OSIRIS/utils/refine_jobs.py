@@ -0,0 +1,374 @@
+# utils/refine_jobs.py
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.admission import admission
+from utils.asset_cache import asset_cache
+from utils.blob_store import BlobStore, blob_store
+from utils.config_manager import config
+from utils.database import Database, market_db
+from utils.llm_backend import llm_backend
+from utils.response_cache import response_cache
+from utils.saves_index import SavesIndex, saves_index
+
+log = logging.getLogger('MyBot.RefineJobs')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+# Responses shorter than this are treated as failed (same rule as the Spectre queries)
+MIN_RESPONSE_LENGTH = 5
+
+# Timeouts of a refinement pass are retried this many times, with exponential backoff
+MAX_TIMEOUT_RETRIES = 2
+
+# Seconds between retries of commits that failed (e.g. the sidecar couldn't be written)
+COMMIT_RETRY_SECONDS = 300
+
+# Job states. A job is deleted once its save is committed.
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+COMMITTED = 'committed'
+
+Messages = List[Dict[str, str]]
+
+
+class RefineJobQueue:
+    """
+    Persistent queue of Forever-save refinements.
+
+    The Forever button submits a job as soon as it is clicked: the forever.txt pass
+    over the session's conversation, then the forever1.txt pass over its result. The
+    job runs while the user fills in the file details, and the save is committed
+    (blob, metadata sidecar, saves index) once both the refinement and the details are
+    in, whichever comes last. Jobs are stored in the `refine_jobs` table, so work that
+    was queued or running when the bot stopped is picked up again on the next start.
+    """
+
+    def __init__(self, db: Database, blobs: BlobStore, index: SavesIndex, saves_dir: Path,
+                 workers: Optional[int] = None, expire_hours: Optional[float] = None, max_attempts: int = 3):
+        """
+        Initialize the RefineJobQueue.
+
+        Args:
+            db (Database): The database holding the refine_jobs table
+            blobs (BlobStore): Where the refined content is stored
+            index (SavesIndex): The saves metadata index
+            saves_dir (Path): The saves directory (the metadata sidecars are written here)
+            workers (int, optional): Jobs refined at once. Defaults to `spectre.refine_workers`
+            expire_hours (float, optional): Hours a refined job waits for its file details. Defaults to `spectre.refine_job_expire_hours`
+            max_attempts (int): Runs of a job before it is marked failed
+        """
+        self.db = db
+        self.blobs = blobs
+        self.index = index
+        self.saves_dir = Path(saves_dir)
+        self.worker_count = workers or config.get("spectre.refine_workers", 2)
+        self.expire = (expire_hours or config.get("spectre.refine_job_expire_hours", 1)) * 3600
+        self.max_attempts = max_attempts
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self._commit_lock = asyncio.Lock()
+        self._waiters: Dict[str, asyncio.Future] = {}
+
+    # --- Submitting ---
+
+    async def submit(self, uid: str, user_id: int, tier: str, fallback: str, messages: Optional[Messages]):
+        """
+        Queue the refinement of a Forever save.
+
+        Args:
+            uid (str): The UID the save will get
+            user_id (int): The owner of the save
+            tier (str): The session's tier (admission lane and `tier_used`)
+            fallback (str): Content used if the refinement passes fail (the last AI reply)
+            messages (Messages, optional): The forever.txt request over the session's conversation; None skips that pass
+        """
+        now = time.time()
+        await self.db.execute(
+            'INSERT INTO refine_jobs (uid, user_id, tier, status, request, fallback, attempts, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)',
+            (uid, user_id, tier, QUEUED, json.dumps(messages) if messages else None, fallback, now, now)
+        )
+        self._queue.put_nowait(uid)
+        log.info(f"Queued refinement job {uid} for user {user_id} (Tier: {tier})")
+
+    async def attach_metadata(self, uid: str, metadata: Dict[str, Any]):
+        """
+        Record the file details of a save and commit it if the refinement already finished.
+
+        Args:
+            uid (str): The job's UID
+            metadata (Dict[str, Any]): file_name, description and date_created
+        """
+        updated = await self.db.execute(
+            'UPDATE refine_jobs SET metadata = ?, updated_at = ? WHERE uid = ?',
+            (json.dumps(metadata), time.time(), uid)
+        )
+        if not updated:
+            raise KeyError(f"Unknown refinement job {uid}")
+        await self._maybe_commit(uid)
+
+    async def wait(self, uid: str, timeout: float) -> str:
+        """
+        Wait until a job's save is committed or the job failed.
+
+        Returns:
+            str: 'committed', 'failed', or the job's current state if the timeout ran out
+        """
+        row = await self.db.fetchone('SELECT status FROM refine_jobs WHERE uid = ?', (uid,))
+        if row is None:
+            return COMMITTED  # Committed (and removed) already
+        if row['status'] == FAILED:
+            return FAILED
+
+        future = self._waiters.setdefault(uid, asyncio.get_running_loop().create_future())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return await self.db.fetchval('SELECT status FROM refine_jobs WHERE uid = ?', (uid,), default=COMMITTED)
+
+    def _notify(self, uid: str, status: str):
+        future = self._waiters.pop(uid, None)
+        if future is not None and not future.done():
+            future.set_result(status)
+
+    # --- Refinement ---
+
+    async def _complete(self, messages: Messages, tier: str) -> Optional[str]:
+        """Run one refinement pass. Returns None if the model gave no usable answer."""
+        cached = await response_cache.get(messages, llm_backend.model)
+        if cached is not None:
+            return cached
+        backoff_time = 2
+        for attempt in range(MAX_TIMEOUT_RETRIES + 1):
+            try:
+                # Background work waits for a slot instead of being shed
+                async with admission.slot(tier, shed=False):
+                    response = await llm_backend.complete(messages, timeout=config.get("spectre.timeout", 30))
+                break
+            except asyncio.TimeoutError:
+                if attempt == MAX_TIMEOUT_RETRIES:
+                    log.warning(f"Refinement pass timed out after {MAX_TIMEOUT_RETRIES} retries")
+                    return None
+                log.warning(f"Refinement pass timed out (attempt {attempt + 1}/{MAX_TIMEOUT_RETRIES}). Retrying...")
+                await asyncio.sleep(backoff_time)
+                backoff_time *= 2  # Exponential backoff
+            except Exception as e:
+                log.warning(f"Refinement pass failed: {e}")
+                return None
+        if len(response.strip()) < MIN_RESPONSE_LENGTH:
+            return None
+        await response_cache.put(messages, llm_backend.model, response)
+        return response
+
+    async def _refine(self, job: Dict[str, Any]) -> str:
+        """Run both passes, falling back to the previous version when a pass fails."""
+        content = job['fallback']
+        if job['request']:
+            refined = await self._complete(json.loads(job['request']), job['tier'])
+            if refined is not None:
+                content = refined
+                log.info(f"Refined job {job['uid']} using forever.txt")
+            else:
+                log.warning(f"Failed to refine job {job['uid']} using forever.txt. Using last reply.")
+
+        try:
+            forever1_prompt = await asset_cache.read(BASE_DIR / "forever1.txt")
+        except FileNotFoundError:
+            forever1_prompt = None
+        if forever1_prompt:
+            refined = await self._complete(
+                [{"role": "system", "content": forever1_prompt}, {"role": "user", "content": content}], job['tier']
+            )
+            if refined is not None:
+                content = refined
+                log.info(f"Refined job {job['uid']} using forever1.txt")
+            else:
+                log.warning(f"Failed to refine job {job['uid']} using forever1.txt. Using previous version.")
+        else:
+            log.warning("Could not read forever1.txt. Skipping final refinement.")
+        return content
+
+    async def _run_job(self, uid: str):
+        job = await self.db.fetchone('SELECT * FROM refine_jobs WHERE uid = ?', (uid,))
+        if job is None or job['status'] not in (QUEUED, RUNNING):
+            return
+
+        await self.db.execute(
+            'UPDATE refine_jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE uid = ?',
+            (RUNNING, time.time(), uid)
+        )
+        try:
+            content = await self._refine(job)
+            blob_key = await self.blobs.put(content)
+        except Exception as e:
+            attempts = job['attempts'] + 1
+            status = FAILED if attempts >= self.max_attempts else QUEUED
+            await self.db.execute(
+                'UPDATE refine_jobs SET status = ?, error = ?, updated_at = ? WHERE uid = ?',
+                (status, str(e), time.time(), uid)
+            )
+            log.error(f"Refinement job {uid} failed (attempt {attempts}/{self.max_attempts}): {e}", exc_info=True)
+            if status == QUEUED:
+                self._queue.put_nowait(uid)
+            else:
+                self._notify(uid, FAILED)
+            return
+
+        await self.db.execute(
+            'UPDATE refine_jobs SET status = ?, result_blob = ?, error = NULL, updated_at = ? WHERE uid = ?',
+            (DONE, blob_key, time.time(), uid)
+        )
+        log.info(f"Refinement job {uid} finished (blob {blob_key})")
+        await self._maybe_commit(uid)
+
+    # --- Committing ---
+
+    def _write_sidecar(self, user_id: int, uid: str, metadata: Dict[str, Any]):
+        """Write a save's metadata sidecar atomically (blocking)."""
+        user_dir = self.saves_dir / str(user_id)
+        user_dir.mkdir(parents=True, exist_ok=True)
+        path = user_dir / f"{uid}.json"
+        temp_path = path.with_suffix('.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=4)
+        os.replace(temp_path, path)
+
+    async def _maybe_commit(self, uid: str):
+        """Commit the save if the job is refined and its file details are in."""
+        async with self._commit_lock:
+            job = await self.db.fetchone('SELECT * FROM refine_jobs WHERE uid = ?', (uid,))
+            if job is None or job['status'] != DONE or not job['metadata']:
+                return
+
+            details = json.loads(job['metadata'])
+            metadata = {
+                "file_name": details.get('file_name'),
+                "description": details.get('description'),
+                "saves": 0,
+                "tier_used": job['tier'],
+                "date_created": details.get('date_created') or time.time(),
+                "uid": uid,
+                "blob": job['result_blob'],
+            }
+            try:
+                await asyncio.to_thread(self._write_sidecar, job['user_id'], uid, metadata)
+                log.info(f"Saved metadata for UID {uid} (User: {job['user_id']})")
+            except Exception as e:
+                # Left as done with its details, so the sweep loop tries the commit again
+                log.error(f"Failed to save metadata for UID {uid}, will retry: {e}", exc_info=True)
+                self._notify(uid, DONE)
+                return
+
+            # The sidecar is already on disk, so a failure here is repaired by the saves index consistency check
+            try:
+                await self.index.index_save(job['user_id'], metadata)
+            except Exception as e:
+                log.error(f"Failed to index metadata for UID {uid}: {e}", exc_info=True)
+
+            await self.db.execute('DELETE FROM refine_jobs WHERE uid = ?', (uid,))
+            self._notify(uid, COMMITTED)
+
+    # --- Lifecycle ---
+
+    async def _worker(self):
+        while True:
+            uid = await self._queue.get()
+            try:
+                await self._run_job(uid)
+            except Exception as e:
+                log.error(f"Error running refinement job {uid}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def sweep(self) -> int:
+        """
+        Drop jobs whose file details never arrived, and failed jobs nobody is waiting for.
+
+        Refined jobs that have their details are kept whatever their age: their commit
+        failed and is retried by `retry_commits()`.
+
+        Returns:
+            int: The number of jobs removed
+        """
+        removed = await self.db.execute(
+            'DELETE FROM refine_jobs WHERE ((status = ? AND metadata IS NULL) OR status = ?) AND updated_at < ?',
+            (DONE, FAILED, time.time() - self.expire)
+        )
+        if removed:
+            log.info(f"Removed {removed} abandoned refinement job(s)")
+        return removed
+
+    async def retry_commits(self) -> int:
+        """
+        Commit the jobs that are refined and have their details but weren't committed.
+
+        Returns:
+            int: The number of jobs tried
+        """
+        rows = await self.db.fetchall('SELECT uid FROM refine_jobs WHERE status = ? AND metadata IS NOT NULL', (DONE,))
+        for row in rows:
+            await self._maybe_commit(row['uid'])
+        return len(rows)
+
+    async def _sweep_loop(self):
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(min(self.expire, COMMIT_RETRY_SECONDS))
+            try:
+                await self.retry_commits()
+                if time.monotonic() - last_sweep >= self.expire:
+                    last_sweep = time.monotonic()
+                    await self.sweep()
+            except Exception as e:
+                log.error(f"Error sweeping refinement jobs: {e}", exc_info=True)
+
+    async def start(self):
+        """Resume the unfinished jobs and start the workers."""
+        if self._workers:
+            return
+        await self.sweep()
+        resumed = await self.db.fetchall(
+            'SELECT uid FROM refine_jobs WHERE status IN (?, ?) ORDER BY created_at', (QUEUED, RUNNING)
+        )
+        for row in resumed:
+            self._queue.put_nowait(row['uid'])
+        # Refined before the restart and the details were already in
+        await self.retry_commits()
+        if resumed:
+            log.info(f"Resumed {len(resumed)} refinement job(s)")
+
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"refine-worker-{i}") for i in range(self.worker_count)
+        ]
+        self._sweeper = asyncio.create_task(self._sweep_loop(), name="refine-sweeper")
+
+    async def close(self):
+        """Stop the workers. Jobs that were running are resumed on the next start."""
+        tasks = self._workers + ([self._sweeper] if self._sweeper else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._sweeper = None
+
+    async def stats(self) -> Dict[str, int]:
+        """Get the number of jobs per state."""
+        rows = await self.db.fetchall('SELECT status, COUNT(*) AS count FROM refine_jobs GROUP BY status')
+        return {row['status']: row['count'] for row in rows}
+
+
+# Create a global instance for easy access
+refine_jobs = RefineJobQueue(market_db, blob_store, saves_index, BASE_DIR / "saves")
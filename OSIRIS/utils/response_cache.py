@@ -0,0 +1,140 @@
+# utils/response_cache.py
+
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from utils.config_manager import config
+from utils.database import Database, market_db
+
+log = logging.getLogger('MyBot.ResponseCache')
+
+Messages = List[Dict[str, str]]
+
+
+def _digest(value) -> str:
+    data = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of model responses for repeatable passes.
+
+    Entries are keyed by (template hash, input hash, model): the template is the
+    system prompt (e.g. forever1.txt or undo.txt) and the input is every message
+    after it, so a hit means the model would have seen exactly the same request.
+    Entries expire after `ttl_hours`, and the least recently used ones are evicted
+    once the table holds more than `max_entries`.
+    """
+
+    def __init__(self, db: Database, max_entries: Optional[int] = None, ttl_hours: Optional[float] = None):
+        """
+        Initialize the ResponseCache.
+
+        Args:
+            db (Database): The database holding the llm_response_cache table
+            max_entries (int, optional): Entries kept before LRU eviction. Defaults to `spectre.response_cache.max_entries`
+            ttl_hours (float, optional): Hours an entry is served. Defaults to `spectre.response_cache.ttl_hours`
+        """
+        self.db = db
+        self.enabled = config.get("spectre.response_cache.enabled", True)
+        self.max_entries = max_entries or config.get("spectre.response_cache.max_entries", 2000)
+        self.ttl = (ttl_hours or config.get("spectre.response_cache.ttl_hours", 168)) * 3600
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(messages: Messages, model: str) -> Tuple[str, str, str]:
+        """
+        Get the cache key of a request.
+
+        Args:
+            messages (Messages): The full message list sent to the model
+            model (str): The model name
+
+        Returns:
+            Tuple[str, str, str]: (template hash, input hash, model)
+        """
+        has_template = bool(messages) and messages[0].get('role') == 'system'
+        template = messages[0]['content'] if has_template else ''
+        inputs = messages[1:] if has_template else messages
+        return _digest(template), _digest(inputs), model
+
+    async def get(self, messages: Messages, model: str) -> Optional[str]:
+        """
+        Look up the response to a request.
+
+        Returns:
+            str | None: The cached response, or None on a miss (or if the cache is disabled)
+        """
+        if not self.enabled:
+            return None
+        key = self.make_key(messages, model)
+        row = await self.db.fetchone(
+            'SELECT response, created_at FROM llm_response_cache WHERE template_hash = ? AND input_hash = ? AND model = ?', key
+        )
+        now = time.time()
+        if row is None or row['created_at'] < now - self.ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        await self.db.execute(
+            'UPDATE llm_response_cache SET last_used = ?, hits = hits + 1 WHERE template_hash = ? AND input_hash = ? AND model = ?',
+            (now,) + key
+        )
+        return row['response']
+
+    async def put(self, messages: Messages, model: str, response: str):
+        """Store the response to a request, evicting expired and least recently used entries."""
+        if not self.enabled:
+            return
+        key = self.make_key(messages, model)
+        now = time.time()
+
+        async def operation(conn: aiosqlite.Connection) -> int:
+            await conn.execute(
+                'INSERT OR REPLACE INTO llm_response_cache (template_hash, input_hash, model, response, created_at, last_used, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                key + (response, now, now)
+            )
+            cursor = await conn.execute('DELETE FROM llm_response_cache WHERE created_at < ?', (now - self.ttl,))
+            evicted = cursor.rowcount
+            cursor = await conn.execute('''
+                DELETE FROM llm_response_cache WHERE rowid IN (
+                    SELECT rowid FROM llm_response_cache ORDER BY last_used
+                    LIMIT max((SELECT COUNT(*) FROM llm_response_cache) - ?, 0)
+                )
+            ''', (self.max_entries,))
+            return evicted + cursor.rowcount
+
+        self.evictions += await self.db.transaction(operation)
+        self.stores += 1
+
+    async def clear(self) -> int:
+        """Remove every entry. Returns the number removed."""
+        return await self.db.execute('DELETE FROM llm_response_cache')
+
+    async def stats(self) -> Dict[str, float]:
+        """Get the entry count and the hit/miss counters since startup."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': await self.db.fetchval('SELECT COUNT(*) FROM llm_response_cache', default=0),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+        }
+
+
+# Create a global instance for easy access
+response_cache = ResponseCache(market_db)
@@ -0,0 +1,272 @@
+# utils/saves_index.py
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from utils.blob_store import blob_store
+from utils.database import Database, market_db
+
+log = logging.getLogger('MyBot.SavesIndex')
+
+# Project root directory
+BASE_DIR = Path(__file__).parent.parent
+
+# app_state key recording that the JSON sidecars were imported
+IMPORT_STATE_KEY = "user_saves_sidecars_imported"
+
+# Columns of user_saves, in insert order
+SAVE_COLUMNS = ('uid', 'user_id', 'file_name', 'description', 'tier_used', 'saves', 'date_created', 'blob_sha256')
+
+# Fields compared by the consistency check
+COMPARED_FIELDS = ('file_name', 'description', 'tier_used', 'date_created', 'blob_sha256')
+
+UPSERT_SAVE_SQL = f'INSERT OR REPLACE INTO user_saves ({", ".join(SAVE_COLUMNS)}) VALUES ({", ".join("?" * len(SAVE_COLUMNS))})'
+INSERT_NEW_SAVE_SQL = UPSERT_SAVE_SQL.replace('OR REPLACE', 'OR IGNORE', 1)
+
+SaveRecord = Dict[str, Any]
+
+
+def normalize_metadata(user_id: int, uid: str, data: Dict[str, Any], fallback_date: float = 0.0) -> SaveRecord:
+    """
+    Turn the contents of a metadata sidecar into a user_saves row.
+
+    Args:
+        user_id (int): The owner of the save (its directory name)
+        uid (str): The save's UID (its file stem)
+        data (Dict[str, Any]): The parsed JSON sidecar
+        fallback_date (float): date_created to use when the sidecar has none
+
+    Returns:
+        SaveRecord: A dict with one key per user_saves column
+    """
+    try:
+        saves = int(data.get('saves') or 0)
+    except (TypeError, ValueError):
+        saves = 0
+    try:
+        date_created = float(data.get('date_created') or fallback_date)
+    except (TypeError, ValueError):
+        date_created = fallback_date
+    return {
+        'uid': uid,
+        'user_id': user_id,
+        'file_name': str(data.get('file_name') or uid),
+        'description': data.get('description'),
+        'tier_used': data.get('tier_used'),
+        'saves': saves,
+        'date_created': date_created,
+        # Key of the content in the blob store (missing for saves with a .txt content file)
+        'blob_sha256': data.get('blob'),
+    }
+
+
+def scan_sidecars(saves_dir: Path) -> Tuple[List[SaveRecord], set]:
+    """
+    Read every metadata sidecar under the saves directory (blocking, run it in a thread).
+
+    Args:
+        saves_dir (Path): The saves directory (one sub-directory per user ID)
+
+    Returns:
+        Tuple[List[SaveRecord], set]: The parsed sidecars, and the (user_id, uid) pairs that have a legacy .txt content file
+    """
+    records: List[SaveRecord] = []
+    content_files = set()
+    if not saves_dir.is_dir():
+        return records, content_files
+
+    for user_dir in os.scandir(saves_dir):
+        if not user_dir.is_dir() or not user_dir.name.isdigit():
+            continue
+        user_id = int(user_dir.name)
+        for entry in os.scandir(user_dir.path):
+            if not entry.is_file():
+                continue
+            uid, suffix = os.path.splitext(entry.name)
+            if suffix == '.txt':
+                content_files.add((user_id, uid))
+            elif suffix == '.json':
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if not isinstance(data, dict):
+                        raise ValueError("metadata is not a JSON object")
+                except (json.JSONDecodeError, ValueError) as e:
+                    log.error(f"Invalid metadata file {entry.path}: {e}")
+                    continue
+                except OSError as e:
+                    log.error(f"Error reading metadata file {entry.path}: {e}")
+                    continue
+                records.append(normalize_metadata(user_id, uid, data, fallback_date=entry.stat().st_mtime))
+    return records, content_files
+
+
+class SavesIndex:
+    """
+    SQLite index of the personal saves' metadata.
+
+    The JSON sidecars next to each save stay the on-disk record; this table mirrors
+    them so the vault, commit and listing menus are a single indexed query instead
+    of one file read per save. New saves are indexed when their metadata is written,
+    older ones are imported once on startup, and `check_consistency` finds (and can
+    repair) drift between the two.
+    """
+
+    def __init__(self, db: Database, saves_dir: Path):
+        """
+        Initialize the SavesIndex.
+
+        Args:
+            db (Database): The database holding the user_saves table
+            saves_dir (Path): The saves directory (one sub-directory per user ID)
+        """
+        self.db = db
+        self.saves_dir = Path(saves_dir)
+
+    @staticmethod
+    def _row(record: SaveRecord) -> Tuple:
+        return tuple(record[column] for column in SAVE_COLUMNS)
+
+    async def index_save(self, user_id: int, metadata: Dict[str, Any]):
+        """
+        Add or update the index row of a save.
+
+        Args:
+            user_id (int): The owner of the save
+            metadata (Dict[str, Any]): The metadata written to the sidecar (must contain 'uid')
+        """
+        record = normalize_metadata(user_id, metadata['uid'], metadata, fallback_date=time.time())
+        await self.db.execute(UPSERT_SAVE_SQL, self._row(record))
+
+    async def get_user_saves(self, user_id: int, limit: Optional[int] = None, unlisted_only: bool = False) -> List[SaveRecord]:
+        """
+        Get a user's saves, newest first.
+
+        Args:
+            user_id (int): The Discord user ID
+            limit (int, optional): Maximum number of saves to return
+            unlisted_only (bool): Skip saves that are listed on the market
+
+        Returns:
+            List[SaveRecord]: Save metadata dicts (same keys as the JSON sidecars, plus user_id)
+        """
+        sql = 'SELECT * FROM user_saves us WHERE us.user_id = ?'
+        if unlisted_only:
+            sql += ' AND NOT EXISTS (SELECT 1 FROM market_listings ml WHERE ml.uid = us.uid)'
+        sql += ' ORDER BY us.date_created DESC, us.uid DESC'
+        params: Tuple = (user_id,)
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params += (limit,)
+        return await self.db.fetchall(sql, params)
+
+    async def get_save(self, user_id: int, uid: str) -> Optional[SaveRecord]:
+        """Get the metadata of one of a user's saves, or None if it isn't indexed."""
+        return await self.db.fetchone('SELECT * FROM user_saves WHERE uid = ? AND user_id = ?', (uid, user_id))
+
+    async def count_user_saves(self, user_id: int) -> int:
+        """Get the number of saves a user has."""
+        return await self.db.fetchval('SELECT COUNT(*) FROM user_saves WHERE user_id = ?', (user_id,), default=0)
+
+    async def import_sidecars(self, force: bool = False) -> int:
+        """
+        Import the existing JSON sidecars into the index. Runs once unless forced.
+
+        Rows that are already indexed are left untouched.
+
+        Args:
+            force (bool): Import again even if it already ran
+
+        Returns:
+            int: The number of saves that were added to the index
+        """
+        if not force:
+            done = await self.db.fetchval('SELECT value FROM app_state WHERE key = ?', (IMPORT_STATE_KEY,))
+            if done:
+                return 0
+
+        started = time.monotonic()
+        records, _ = await asyncio.to_thread(scan_sidecars, self.saves_dir)
+        rows = [self._row(record) for record in records]
+
+        async def operation(conn: aiosqlite.Connection) -> int:
+            before = conn.total_changes
+            await conn.executemany(INSERT_NEW_SAVE_SQL, rows)
+            imported = conn.total_changes - before
+            await conn.execute(
+                'INSERT OR REPLACE INTO app_state (key, value, updated_at) VALUES (?, ?, ?)',
+                (IMPORT_STATE_KEY, str(len(rows)), time.time())
+            )
+            return imported
+
+        imported = await self.db.transaction(operation)
+        log.info(f"Imported {imported} of {len(rows)} save sidecar(s) into the saves index in {time.monotonic() - started:.2f}s")
+        return imported
+
+    async def check_consistency(self, repair: bool = False) -> Dict[str, int]:
+        """
+        Compare the index with the sidecars and content files on disk.
+
+        - unindexed: a sidecar exists but the save isn't in the index
+        - mismatched: the indexed metadata differs from the sidecar
+        - orphaned: the index has a save whose content (blob or .txt file) is gone
+
+        Args:
+            repair (bool): Re-index unindexed and mismatched saves from their sidecars and drop orphaned rows
+
+        Returns:
+            Dict[str, int]: Counts per problem, plus the number of indexed and on-disk saves
+        """
+        records, content_files = await asyncio.to_thread(scan_sidecars, self.saves_dir)
+        indexed = {row['uid']: row for row in await self.db.fetchall('SELECT * FROM user_saves')}
+
+        unindexed, mismatched = [], []
+        for record in records:
+            row = indexed.get(record['uid'])
+            if row is None:
+                unindexed.append(record)
+            elif row['user_id'] != record['user_id'] or any(row[field] != record[field] for field in COMPARED_FIELDS):
+                mismatched.append(record)
+        def has_content(uid: str, row: SaveRecord) -> bool:
+            if row.get('blob_sha256'):
+                return blob_store.exists(row['blob_sha256'])
+            return (row['user_id'], uid) in content_files
+
+        orphaned = await asyncio.to_thread(lambda: [uid for uid, row in indexed.items() if not has_content(uid, row)])
+
+        report = {
+            'indexed': len(indexed),
+            'sidecars': len(records),
+            'unindexed': len(unindexed),
+            'mismatched': len(mismatched),
+            'orphaned': len(orphaned),
+        }
+
+        if repair and (unindexed or mismatched or orphaned):
+            upserts = [self._row(record) for record in unindexed + mismatched]
+
+            async def operation(conn: aiosqlite.Connection):
+                if upserts:
+                    await conn.executemany(UPSERT_SAVE_SQL, upserts)
+                if orphaned:
+                    await conn.executemany('DELETE FROM user_saves WHERE uid = ?', [(uid,) for uid in orphaned])
+
+            await self.db.transaction(operation)
+            log.info(f"Repaired saves index: {len(upserts)} save(s) re-indexed, {len(orphaned)} orphaned row(s) removed")
+
+        if report['unindexed'] or report['mismatched'] or report['orphaned']:
+            log.warning(f"Saves index consistency check: {report}")
+        else:
+            log.info(f"Saves index consistency check: {report}")
+        return report
+
+
+# Create a global instance for easy access
+saves_index = SavesIndex(market_db, BASE_DIR / "saves")
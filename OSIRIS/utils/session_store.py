@@ -0,0 +1,398 @@
+# utils/session_store.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+import aiosqlite
+
+from utils.config_manager import config
+from utils.conversation_history import ConversationHistory
+from utils.database import Database, market_db
+
+log = logging.getLogger('MyBot.SessionStore')
+
+Session = Dict[str, Any]
+
+# Called with (user_id, session) after an idle or over-cap session was checkpointed and dropped from memory
+EvictCallback = Callable[[int, Session], Awaitable[None]]
+
+
+class SessionStore:
+    """
+    Live Spectre sessions, checkpointed to SQLite.
+
+    Behaves like the `user_id -> session dict` mapping the Spectre cog used before,
+    so views can keep mutating their session dict in place. Each session is reduced
+    to a compact record (tier, counters, last reply, conversation turns and the ID of
+    its message; no live objects) and written to `spectre_sessions` whenever it
+    was touched, on a short interval and on shutdown. A session that is no longer in
+    memory (crash, restart, eviction) is rehydrated with `restore` on the user's
+    next interaction.
+
+    Sessions idle for longer than `idle_timeout` are evicted from memory, least
+    recently used first once `max_live` sessions or `max_bytes` of records are
+    held. Dormant records expire after `ttl`. A session can be `pinned` while work
+    that still needs it (e.g. committing a save) is in flight; pinned sessions are
+    never suspended or evicted.
+    """
+
+    def __init__(self, db: Database, idle_timeout: Optional[float] = None, max_live: Optional[int] = None,
+                 max_bytes: Optional[int] = None, checkpoint_interval: Optional[float] = None,
+                 ttl_hours: Optional[float] = None):
+        """
+        Initialize the SessionStore.
+
+        Args:
+            db (Database): The database holding the spectre_sessions table
+            idle_timeout (float, optional): Seconds without access before a session leaves memory. Defaults to `spectre.sessions.idle_timeout`
+            max_live (int, optional): Sessions kept in memory. Defaults to `spectre.sessions.max_live`
+            max_bytes (int, optional): Total record size kept in memory. Defaults to `spectre.sessions.max_bytes`
+            checkpoint_interval (float, optional): Seconds between checkpoints. Defaults to `spectre.sessions.checkpoint_interval`
+            ttl_hours (float, optional): Hours a dormant record can be resumed. Defaults to `spectre.sessions.ttl_hours`
+        """
+        self.db = db
+        self.idle_timeout = idle_timeout or config.get("spectre.sessions.idle_timeout", 900)
+        self.max_live = max_live or config.get("spectre.sessions.max_live", 500)
+        self.max_bytes = max_bytes or config.get("spectre.sessions.max_bytes", 32 * 1024 * 1024)
+        self.checkpoint_interval = checkpoint_interval or config.get("spectre.sessions.checkpoint_interval", 10)
+        self.ttl = (ttl_hours or config.get("spectre.sessions.ttl_hours", 24)) * 3600
+        self.on_evict: Optional[EvictCallback] = None
+
+        self._live: "OrderedDict[int, Session]" = OrderedDict()  # Least recently used first
+        self._last_access: Dict[int, float] = {}
+        self._written: Dict[int, str] = {}  # user_id -> digest of the last checkpointed record
+        self._sizes: Dict[int, int] = {}  # user_id -> size of the last serialized record
+        self._dirty: set = set()  # Sessions touched since they were last serialized
+        self._deleted: set = set()
+        self._pins: Counter = Counter()  # user_id -> open pinned() blocks
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.checkpoints = 0
+        self.evictions = 0
+        self.restores = 0
+
+    # --- Mapping interface ---
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._live
+
+    def __getitem__(self, user_id: int) -> Session:
+        session = self._live[user_id]
+        self.touch(user_id)
+        return session
+
+    def get(self, user_id: int, default: Any = None) -> Any:
+        return self[user_id] if user_id in self._live else default
+
+    def __setitem__(self, user_id: int, session: Session):
+        self._live[user_id] = session
+        self._deleted.discard(user_id)
+        self._written.pop(user_id, None)
+        self._dirty.add(user_id)
+        self.touch(user_id)
+
+    def __delitem__(self, user_id: int):
+        del self._live[user_id]
+        self._forget(user_id)
+
+    def pop(self, user_id: int, *default) -> Session:
+        if user_id not in self._live:
+            if default:
+                return default[0]
+            raise KeyError(user_id)
+        session = self._live.pop(user_id)
+        self._forget(user_id)
+        return session
+
+    def keys(self) -> List[int]:
+        return list(self._live.keys())
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._live))
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def _forget(self, user_id: int):
+        """The session ended: drop its bookkeeping and delete its record on the next checkpoint."""
+        self._last_access.pop(user_id, None)
+        self._written.pop(user_id, None)
+        self._sizes.pop(user_id, None)
+        self._dirty.discard(user_id)
+        self._deleted.add(user_id)
+        self._wakeup.set()
+
+    def touch(self, user_id: int):
+        """Mark a session as used and have it checkpointed soon."""
+        if user_id in self._live:
+            self._live.move_to_end(user_id)
+            self._last_access[user_id] = time.time()
+            self._dirty.add(user_id)
+            self._wakeup.set()
+
+    @contextmanager
+    def pinned(self, user_id: int):
+        """Keep a session in memory for the duration of the block."""
+        self._pins[user_id] += 1
+        try:
+            yield
+        finally:
+            self._pins[user_id] -= 1
+            if not self._pins[user_id]:
+                del self._pins[user_id]
+
+    # --- Records ---
+
+    @staticmethod
+    def serialize(session: Session) -> Dict[str, Any]:
+        """Reduce a live session to a JSON-serializable record."""
+        gpt_instance = session.get('gpt_instance')
+        history: Optional[ConversationHistory] = getattr(gpt_instance, 'history', None)
+        message = session.get('interaction_message')
+        channel = getattr(message, 'channel', None)
+        return {
+            'tier': session.get('tier'),
+            'replies_left': session.get('replies_left'),
+            'saves_left': session.get('saves_left'),
+            'last_gpt_reply': session.get('last_gpt_reply'),
+            'channel_id': getattr(channel, 'id', None),
+            'message_id': getattr(message, 'id', None),
+            # The server context is resent with every prompt, so it isn't kept
+            'history': {
+                'max_tokens': history.max_tokens,
+                'turns': [list(turn) for turn in history.turns],
+                'summary': history.summary,
+                'evicted_turns': history.evicted_turns,
+            } if history is not None else None,
+        }
+
+    @staticmethod
+    def restore_history(record: Dict[str, Any], system_prompt: str) -> ConversationHistory:
+        """Rebuild the conversation history of a record."""
+        data = record.get('history') or {}
+        history = ConversationHistory(system_prompt, max_tokens=data.get('max_tokens') or 4096)
+        history.turns = [tuple(turn) for turn in data.get('turns', [])]
+        history.summary = data.get('summary') or ""
+        history.evicted_turns = data.get('evicted_turns') or 0
+        return history
+
+    async def restore(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Load the checkpointed record of a session that isn't in memory.
+
+        Returns:
+            Dict[str, Any] | None: The record (see `serialize`), or None if there is none or it expired
+        """
+        if user_id in self._live or user_id in self._deleted:
+            return None
+        row = await self.db.fetchone('SELECT record, updated_at FROM spectre_sessions WHERE user_id = ?', (user_id,))
+        if row is None or row['updated_at'] < time.time() - self.ttl:
+            return None
+        self.restores += 1
+        return json.loads(row['record'])
+
+    async def discard(self, user_id: int) -> bool:
+        """Delete a session's record (and the live session, if any). Returns True if something was removed."""
+        live = self.pop(user_id, None) is not None
+        self._deleted.discard(user_id)
+        removed = await self.db.execute('DELETE FROM spectre_sessions WHERE user_id = ?', (user_id,))
+        return live or removed > 0
+
+    async def clear(self) -> int:
+        """Delete every live session and record. Returns the number of records removed."""
+        for user_id in list(self._live):
+            self.pop(user_id)
+        self._deleted.clear()
+        return await self.db.execute('DELETE FROM spectre_sessions')
+
+    # --- Checkpointing and eviction ---
+
+    async def checkpoint(self) -> int:
+        """
+        Write the sessions that changed since the last checkpoint and delete ended ones.
+
+        Only sessions touched since their last checkpoint are serialized; of those,
+        only the ones whose record actually changed are written.
+
+        Returns:
+            int: The number of records written
+        """
+        now = time.time()
+        upserts = []
+        dirty, self._dirty = self._dirty, set()
+        for user_id in dirty:
+            session = self._live.get(user_id)
+            if session is None:
+                continue
+            try:
+                data = json.dumps(self.serialize(session), separators=(',', ':'))
+            except Exception as e:
+                log.error(f"Could not serialize the session of user {user_id}: {e}")
+                continue
+            self._sizes[user_id] = len(data)
+            digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+            if self._written.get(user_id) != digest:
+                upserts.append((user_id, data, now, digest))
+        deletes = [(user_id,) for user_id in self._deleted]
+        self._deleted = set()
+        if not upserts and not deletes:
+            return 0
+
+        async def operation(conn: aiosqlite.Connection):
+            if upserts:
+                await conn.executemany(
+                    'INSERT OR REPLACE INTO spectre_sessions (user_id, record, updated_at) VALUES (?, ?, ?)',
+                    [row[:3] for row in upserts]
+                )
+            if deletes:
+                await conn.executemany('DELETE FROM spectre_sessions WHERE user_id = ?', deletes)
+
+        try:
+            await self.db.transaction(operation)
+        except Exception:
+            # Retried on the next checkpoint
+            self._deleted.update(user_id for (user_id,) in deletes)
+            self._dirty.update(user_id for user_id, _, _, _ in upserts)
+            raise
+        for user_id, _, _, digest in upserts:
+            if user_id in self._live:
+                self._written[user_id] = digest
+        self.checkpoints += len(upserts)
+        return len(upserts)
+
+    def _drop(self, user_id: int) -> Optional[Session]:
+        """Remove a checkpointed session from memory, keeping its record."""
+        session = self._live.pop(user_id, None)
+        self._last_access.pop(user_id, None)
+        self._written.pop(user_id, None)
+        self._sizes.pop(user_id, None)
+        self._dirty.discard(user_id)
+        return session
+
+    async def suspend(self, user_id: int) -> Optional[Session]:
+        """
+        Checkpoint a session and remove it from memory, so it can be resumed later.
+
+        Returns:
+            Session | None: The suspended session, or None if it wasn't live or is pinned
+        """
+        if user_id not in self._live or user_id in self._pins:
+            return None
+        if user_id not in self._written:
+            self._dirty.add(user_id)
+        await self.checkpoint()
+        return self._drop(user_id)
+
+    def _evictable(self, now: float) -> List[int]:
+        """Idle sessions, then the least recently used ones until the caps are met."""
+        victims = [user_id for user_id in self._live
+                   if user_id not in self._pins and now - self._last_access.get(user_id, now) > self.idle_timeout]
+        live = len(self._live) - len(victims)
+        held = sum(size for user_id, size in self._sizes.items() if user_id not in victims)
+        for user_id in self._live:
+            if live <= self.max_live and held <= self.max_bytes:
+                break
+            if user_id in victims or user_id in self._pins:
+                continue
+            victims.append(user_id)
+            live -= 1
+            held -= self._sizes.get(user_id, 0)
+        return victims
+
+    async def evict(self, now: Optional[float] = None) -> int:
+        """
+        Move idle and over-cap sessions out of memory (their records stay resumable).
+
+        Returns:
+            int: The number of sessions evicted
+        """
+        victims = self._evictable(time.time() if now is None else now)
+        if not victims:
+            return 0
+        # Everything evicted must be on disk first
+        self._dirty.update(user_id for user_id in victims if user_id not in self._written)
+        await self.checkpoint()
+        for user_id in victims:
+            session = self._drop(user_id)
+            if session is None:
+                continue
+            self.evictions += 1
+            if self.on_evict is not None:
+                try:
+                    await self.on_evict(user_id, session)
+                except Exception as e:
+                    log.error(f"Error in the eviction callback for user {user_id}: {e}", exc_info=True)
+        log.info(f"Evicted {len(victims)} Spectre session(s) from memory")
+        return len(victims)
+
+    async def expire(self) -> int:
+        """Delete dormant records older than the TTL. Returns the number removed."""
+        cutoff = time.time() - self.ttl
+        stale = [row['user_id'] for row in await self.db.fetchall(
+            'SELECT user_id FROM spectre_sessions WHERE updated_at < ?', (cutoff,)
+        ) if row['user_id'] not in self._live]
+        if stale:
+            await self.db.executemany('DELETE FROM spectre_sessions WHERE user_id = ?', [(user_id,) for user_id in stale])
+        return len(stale)
+
+    async def _run(self):
+        last_expire = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.checkpoint_interval)
+                # Batch the changes of a burst of interactions into one checkpoint
+                await asyncio.sleep(1)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.checkpoint()
+                await self.evict()
+                if time.time() - last_expire > 3600:
+                    last_expire = time.time()
+                    await self.expire()
+            except Exception as e:
+                log.error(f"Error checkpointing Spectre sessions: {e}", exc_info=True)
+
+    def start(self):
+        """Start the checkpoint and eviction task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="session-store")
+
+    async def close(self):
+        """Stop the task and checkpoint every live session, so they can be resumed after a restart."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._dirty.update(self._live)
+        await self.checkpoint()
+
+    async def stats(self) -> Dict[str, int]:
+        """Get the number of live and dormant sessions and the bytes their records take."""
+        dormant = await self.db.fetchval(
+            'SELECT COUNT(*) FROM spectre_sessions WHERE user_id NOT IN ({})'.format(','.join('?' * len(self._live))),
+            tuple(self._live), default=0
+        ) if self._live else await self.db.fetchval('SELECT COUNT(*) FROM spectre_sessions', default=0)
+        return {
+            'live': len(self._live),
+            'dormant': dormant,
+            'bytes': sum(self._sizes.values()),
+            'checkpoints': self.checkpoints,
+            'evictions': self.evictions,
+            'restores': self.restores,
+        }
+
+
+# Create a global instance for easy access
+session_store = SessionStore(market_db)
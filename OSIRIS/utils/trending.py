@@ -0,0 +1,196 @@
+# utils/trending.py
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+import aiosqlite
+
+from utils.config_manager import config
+from utils.database import Database, market_db
+
+log = logging.getLogger('MyBot.Trending')
+
+# app_state keys of the ranking job
+EPOCH_KEY = "trending_epoch"
+LAST_EVENT_KEY = "trending_last_event_id"
+
+# Rescale the stored scores once the epoch is this many half-lives old (keeps the floats far from overflow)
+REBASE_HALF_LIVES = 64
+
+
+class TrendingRanker:
+    """
+    Background job that keeps the `market_trending` table up to date.
+
+    A listing's hot score is the sum of its save/star events, each weighted by kind
+    and halved every `half_life` seconds. Decaying every score on every refresh
+    would rewrite the whole table, so scores are stored on a growing scale instead:
+    an event at time t adds `weight * 2 ** ((t - epoch) / half_life)`. Every stored
+    score is off from the real decayed score by the same factor, so the ordering is
+    the same and only the listings with new events have to be updated. When the
+    epoch gets too old all scores are rescaled once and the epoch moves forward.
+    """
+
+    def __init__(self, db: Database, half_life_hours: Optional[float] = None, refresh_interval: Optional[float] = None,
+                 weights: Optional[Dict[str, float]] = None, retention_days: Optional[float] = None, batch_size: int = 5000):
+        """
+        Initialize the TrendingRanker.
+
+        Args:
+            db (Database): The market database
+            half_life_hours (float, optional): Hours for an event's weight to halve. Defaults to `market.trending_half_life_hours`
+            refresh_interval (float, optional): Seconds between refreshes. Defaults to `market.trending_refresh_interval`
+            weights (Dict[str, float], optional): Weight per event kind. Defaults to `market.trending_weights`
+            retention_days (float, optional): Days to keep processed events. Defaults to `market.trending_event_retention_days`
+            batch_size (int): Maximum events folded in per transaction
+        """
+        self.db = db
+        self.half_life = (half_life_hours or config.get("market.trending_half_life_hours", 24)) * 3600
+        self.refresh_interval = refresh_interval or config.get("market.trending_refresh_interval", 60)
+        self.weights = weights or config.get("market.trending_weights", {"save": 1.0, "star": 2.0})
+        self.retention = (retention_days or config.get("market.trending_event_retention_days", 7)) * 86400
+        self.batch_size = batch_size
+
+        self.epoch: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+        self.refreshes = 0
+        self.events_processed = 0
+        self.last_refresh_ms = 0.0
+
+    def current_score(self, stored_score: float, now: Optional[float] = None) -> float:
+        """
+        Convert a stored score into the decayed hot score at the current time.
+
+        Args:
+            stored_score (float): The `market_trending.score` value
+            now (float, optional): Unix time to evaluate at. Defaults to now
+
+        Returns:
+            float: The sum of the decayed event weights
+        """
+        if not stored_score or self.epoch is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return stored_score * 2 ** ((self.epoch - now) / self.half_life)
+
+    @staticmethod
+    async def _get_state(conn: aiosqlite.Connection, key: str) -> Optional[str]:
+        async with conn.execute('SELECT value FROM app_state WHERE key = ?', (key,)) as cursor:
+            row = await cursor.fetchone()
+        return row['value'] if row else None
+
+    @staticmethod
+    async def _set_state(conn: aiosqlite.Connection, key: str, value):
+        await conn.execute(
+            'INSERT OR REPLACE INTO app_state (key, value, updated_at) VALUES (?, ?, ?)',
+            (key, str(value), time.time())
+        )
+
+    async def _refresh_batch(self) -> int:
+        now = time.time()
+
+        async def operation(conn: aiosqlite.Connection) -> int:
+            epoch = float(await self._get_state(conn, EPOCH_KEY) or now)
+            last_id = int(await self._get_state(conn, LAST_EVENT_KEY) or 0)
+
+            if (now - epoch) / self.half_life > REBASE_HALF_LIVES:
+                await conn.execute('UPDATE market_trending SET score = score * ? WHERE score != 0',
+                                   (2 ** ((epoch - now) / self.half_life),))
+                log.info(f"Rebased trending scores ({(now - epoch) / 3600:.0f}h since the previous epoch)")
+                epoch = now
+
+            async with conn.execute(
+                'SELECT id, uid, kind, created_at FROM market_events WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, self.batch_size)
+            ) as cursor:
+                events = await cursor.fetchall()
+
+            deltas: Dict[str, float] = defaultdict(float)
+            for event in events:
+                weight = self.weights.get(event['kind'], 1.0)
+                deltas[event['uid']] += weight * 2 ** ((event['created_at'] - epoch) / self.half_life)
+            if deltas:
+                await conn.executemany(
+                    'UPDATE market_trending SET score = score + ?, updated_at = ? WHERE uid = ?',
+                    [(delta, now, uid) for uid, delta in deltas.items()]
+                )
+                last_id = events[-1]['id']
+
+            await self._set_state(conn, EPOCH_KEY, epoch)
+            await self._set_state(conn, LAST_EVENT_KEY, last_id)
+            # Processed events are already part of the scores; old ones are only kept for inspection
+            await conn.execute('DELETE FROM market_events WHERE id <= ? AND created_at < ?', (last_id, now - self.retention))
+            self.epoch = epoch
+            return len(events)
+
+        return await self.db.transaction(operation)
+
+    async def refresh(self) -> int:
+        """
+        Fold all new events into the ranking table.
+
+        Returns:
+            int: The number of events processed
+        """
+        async with self._refresh_lock:
+            started = time.monotonic()
+            processed = 0
+            while True:
+                count = await self._refresh_batch()
+                processed += count
+                if count < self.batch_size:
+                    break
+            self.refreshes += 1
+            self.events_processed += processed
+            self.last_refresh_ms = round((time.monotonic() - started) * 1000, 2)
+            if processed:
+                log.debug(f"Trending refresh folded in {processed} event(s) in {self.last_refresh_ms}ms")
+            return processed
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.error(f"Error refreshing trending scores: {e}", exc_info=True)
+
+    async def start(self):
+        """Catch up on pending events, then start the periodic refresh task."""
+        if self._task is not None:
+            return
+        processed = await self.refresh()
+        log.info(f"Trending ranking ready ({processed} pending event(s) processed)")
+        self._task = asyncio.create_task(self._refresh_loop(), name="trending-refresh")
+
+    async def close(self):
+        """Stop the refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get job statistics.
+
+        Returns:
+            Dict[str, float]: Refresh count, events processed and duration of the last refresh (ms)
+        """
+        return {
+            'refreshes': self.refreshes,
+            'events_processed': self.events_processed,
+            'last_refresh_ms': self.last_refresh_ms,
+        }
+
+
+# Create a global instance for the market database
+trending = TrendingRanker(market_db)